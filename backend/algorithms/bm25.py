@@ -0,0 +1,135 @@
+"""
+BM25 Sentence Index - Query relevance for the Sentence-Level Pruner
+
+This module builds an inverted index from normalized terms to the sentences
+that contain them, and scores sentences against a query with Okapi BM25.
+Each sentence is treated as a document, so rare query terms that appear in
+few sentences weigh most.
+
+Terms are the document's interned term ids with surrounding punctuation
+stripped, so "code." in the text matches "code?" in the question. Query
+words that carry no information (stopwords such as "the" or "what", and
+terms found in most sentences) are ignored, so only sentences that share a
+meaningful word with the question count as matches.
+"""
+
+import math
+import string
+from array import array
+from collections import Counter
+from typing import Dict, List
+from backend.algorithms.vocabulary import SentenceTerms, tokenize
+
+
+# Function words ignored in queries: they occur in nearly every sentence,
+# so matching them would make nearly every sentence relevant
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below between
+both but by can could did do does doing down during each few for from further had has have having he her
+here hers herself him himself his how i if in into is it its itself just me more most my myself no nor not
+now of off on once only or other our ours ourselves out over own same she should so some such than that the
+their theirs them themselves then there these they this those through to too under until up very was we
+were what when where which while who whom why will with would you your yours yourself yourselves
+""".split())
+
+
+def normalize(word: str) -> str:
+    """
+    Strip surrounding punctuation from a normalized word.
+    
+    Args:
+        word: Lowercase word as produced by tokenize()
+    
+    Returns:
+        The word without leading or trailing punctuation
+    """
+    return word.strip(string.punctuation)
+
+
+class BM25Index:
+    """
+    Inverted index over the sentences of one document, scored with BM25.
+    """
+    
+    # Term frequency saturation
+    K1 = 1.5
+    
+    # Sentence length normalization
+    B = 0.75
+    
+    # Query terms below this inverse sentence frequency are ignored; log(2)
+    # drops terms found in more than about half of the sentences
+    MIN_IDF = math.log(2.0)
+    
+    def __init__(self, terms: SentenceTerms):
+        """
+        Index every sentence of a document.
+        
+        Args:
+            terms: Term ids of the document's sentences; must carry their
+                vocabulary, which maps ids back to words
+        """
+        # Map each term id to the id of its punctuation-stripped form
+        self.keys: Dict[str, int] = {}
+        key_of = [self.keys.setdefault(normalize(word), len(self.keys)) for word in terms.vocabulary.ids]
+        
+        # Postings: for each key, the sentences containing it and the
+        # term frequency in each
+        self.sentences: List[array] = [array('I') for _ in self.keys]
+        self.frequencies: List[array] = [array('I') for _ in self.keys]
+        offsets = terms.offsets
+        self.lengths = array('q', [offsets[i + 1] - offsets[i] for i in range(len(terms))])
+        
+        for i in range(len(terms)):
+            for key, frequency in Counter([key_of[term] for term in terms.sentence(i)]).items():
+                self.sentences[key].append(i)
+                self.frequencies[key].append(frequency)
+        
+        self.num_sentences = len(terms)
+        self.average_length = sum(self.lengths) / len(terms) if len(terms) else 0.0
+    
+    def score(self, query: str) -> Dict[int, float]:
+        """
+        BM25 score of every sentence that contains a query term.
+        
+        Args:
+            query: The user's question
+        
+        Returns:
+            Sentence number -> BM25 score (sentences without informative
+            query terms are omitted)
+        """
+        scores: Dict[int, float] = {}
+        lengths = self.lengths
+        
+        for word in dict.fromkeys(normalize(word) for word in tokenize(query)):
+            key = self.keys.get(word)
+            if not word or key is None or word in STOPWORDS:
+                continue
+            
+            sentences = self.sentences[key]
+            idf = math.log(1.0 + (self.num_sentences - len(sentences) + 0.5) / (len(sentences) + 0.5))
+            if idf < self.MIN_IDF:
+                continue
+            for i, frequency in zip(sentences, self.frequencies[key]):
+                length_norm = 1.0 - self.B + self.B * lengths[i] / self.average_length
+                scores[i] = scores.get(i, 0.0) + idf * frequency * (self.K1 + 1) / (frequency + self.K1 * length_norm)
+        
+        return scores
+    
+    def relevance(self, query: str) -> Dict[int, float]:
+        """
+        BM25 scores scaled so the best matching sentence scores 1.0.
+        
+        Args:
+            query: The user's question
+        
+        Returns:
+            Sentence number -> relevance in (0, 1] (sentences without query
+            terms are omitted)
+        """
+        scores = self.score(query)
+        top = max(scores.values(), default=0.0)
+        if top <= 0.0:
+            return {}
+        return {i: score / top for i, score in scores.items()}
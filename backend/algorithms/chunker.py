@@ -6,8 +6,19 @@ that splits documents into semantically coherent chunks while respecting
 size constraints.
 """
 
-import re
-from typing import List
+import codecs
+import mmap
+import os
+from typing import IO, Iterable, Iterator, List, Tuple, Union
+from backend.algorithms.sentences import SentenceIndex, iter_sentences, sentence_list, split_sentences
+
+
+# A document source for streaming: a file path, a text or binary file object,
+# or a memory-mapped file
+Source = Union[str, os.PathLike, IO, mmap.mmap]
+
+# Characters (or bytes) read from a streaming source per read call
+READ_BUFFER_SIZE = 1 << 20
 
 
 class SemanticChunker:
@@ -15,14 +26,25 @@ class SemanticChunker:
     Splits long documents into chunks at sentence boundaries using a greedy
     sentence grouping algorithm.
     
-    The chunker respects MIN_CHUNK_SIZE and MAX_CHUNK_SIZE constraints to
+    The chunker respects min_chunk_size and max_chunk_size constraints to
     avoid the "Lost in the Middle" problem while preserving semantic integrity.
     """
     
-    # Hard-coded parameters for MVP
+    # Default parameters
     MIN_CHUNK_SIZE = 200  # words
     MAX_CHUNK_SIZE = 1000  # words
     
+    def __init__(self, min_chunk_size: int = None, max_chunk_size: int = None):
+        """
+        Args:
+            min_chunk_size: Words a chunk needs before it may be closed
+                (defaults to MIN_CHUNK_SIZE)
+            max_chunk_size: Words a chunk may hold (defaults to
+                MAX_CHUNK_SIZE)
+        """
+        self.min_chunk_size = min_chunk_size if min_chunk_size is not None else self.MIN_CHUNK_SIZE
+        self.max_chunk_size = max_chunk_size if max_chunk_size is not None else self.MAX_CHUNK_SIZE
+    
     def chunk(self, text: str) -> List[str]:
         """
         Split text into semantically coherent chunks.
@@ -33,43 +55,102 @@ class SemanticChunker:
         Returns:
             List of text chunks with preserved semantic boundaries
         """
-        # Step 1: Tokenize into sentences using regex pattern
-        sentences = self._tokenize_sentences(text)
+        # Step 1: Tokenize into sentences
+        index = split_sentences(text)
+        
+        # Step 2: Greedy sentence grouping, then build chunks from slices
+        return [index.join(range(lo, hi)) for lo, hi in self.chunk_spans(index)]
+    
+    def iter_chunks(self, source: Source, encoding: str = 'utf-8') -> Iterator[str]:
+        """
+        Streaming version of chunk() over a file path, file object or mmap.
+        
+        Chunks are yielded as soon as the greedy rule closes them, and only
+        the sentences of the open chunk are held in memory.
+        
+        Args:
+            source: File path, text/binary file object or mmap to read from
+            encoding: Encoding used to decode paths, binary files and mmaps
+        
+        Yields:
+            Text chunks, identical to chunk() on the full text
+        """
+        for index in self.iter_chunk_indexes(source, encoding):
+            yield index.text
+    
+    def iter_chunk_indexes(self, source: Source, encoding: str = 'utf-8') -> Iterator[SentenceIndex]:
+        """
+        Stream chunks as sentence indexes, so they can be pruned without
+        being split into sentences again.
+        
+        Args:
+            source: File path, text/binary file object or mmap to read from
+            encoding: Encoding used to decode paths, binary files and mmaps
+        
+        Yields:
+            One SentenceIndex per chunk, whose text is the chunk
+        """
+        pending = []
+        base = 0
         
-        if not sentences:
-            return []
+        def word_counts() -> Iterator[int]:
+            for sentence in iter_sentences(_read_pieces(source, encoding)):
+                pending.append(sentence)
+                yield len(sentence.split())
+        
+        for lo, hi in self._group(word_counts()):
+            yield SentenceIndex.from_sentences(pending[lo - base:hi - base])
+            del pending[:hi - base]
+            base = hi
+    
+    def chunk_spans(self, index: SentenceIndex) -> List[Tuple[int, int]]:
+        """
+        Group the sentences of an index into chunks.
         
-        # Step 2: Greedy sentence grouping
-        chunks = []
-        current_chunk = []
+        Args:
+            index: Sentence index of the document
+            
+        Returns:
+            List of (lo, hi) sentence ranges, one per chunk
+        """
+        return list(self._group(index.word_counts))
+    
+    def _group(self, word_counts: Iterable[int]) -> Iterator[Tuple[int, int]]:
+        """
+        Greedy sentence grouping over per-sentence word counts.
+        
+        Args:
+            word_counts: Word count of each sentence, in document order
+            
+        Yields:
+            (lo, hi) sentence ranges as soon as each chunk is closed
+        """
+        chunk_start = 0
         current_word_count = 0
+        num_sentences = 0
         
-        for sentence in sentences:
-            sentence_words = len(sentence.split())
+        for i, sentence_words in enumerate(word_counts):
+            num_sentences = i + 1
             
-            # Check if adding this sentence would exceed MAX_CHUNK_SIZE
-            if current_word_count + sentence_words > self.MAX_CHUNK_SIZE:
+            # Check if adding this sentence would exceed max_chunk_size
+            if current_word_count + sentence_words > self.max_chunk_size:
                 # If current chunk meets minimum size, save it and start new chunk
-                if current_word_count >= self.MIN_CHUNK_SIZE:
-                    chunks.append(' '.join(current_chunk))
-                    current_chunk = [sentence]
+                if current_word_count >= self.min_chunk_size:
+                    yield chunk_start, i
+                    chunk_start = i
                     current_word_count = sentence_words
                 else:
                     # Chunk too small, add sentence anyway to meet minimum
-                    current_chunk.append(sentence)
-                    chunks.append(' '.join(current_chunk))
-                    current_chunk = []
+                    yield chunk_start, i + 1
+                    chunk_start = i + 1
                     current_word_count = 0
             else:
                 # Add sentence to current chunk
-                current_chunk.append(sentence)
                 current_word_count += sentence_words
         
         # Don't forget the last chunk
-        if current_chunk:
-            chunks.append(' '.join(current_chunk))
-        
-        return chunks
+        if chunk_start < num_sentences:
+            yield chunk_start, num_sentences
     
     def _tokenize_sentences(self, text: str) -> List[str]:
         """
@@ -81,22 +162,37 @@ class SemanticChunker:
         Returns:
             List of sentences
         """
-        # Split on sentence-ending punctuation followed by whitespace
-        # Keep the punctuation with the sentence
-        sentences = re.split(r'([.!?])\s+', text)
-        
-        # Reconstruct sentences with their punctuation
-        result = []
-        i = 0
-        while i < len(sentences):
-            if i + 1 < len(sentences) and sentences[i + 1] in '.!?':
-                # Combine text with its punctuation
-                result.append(sentences[i] + sentences[i + 1])
-                i += 2
-            else:
-                # Last sentence or sentence without punctuation
-                if sentences[i].strip():
-                    result.append(sentences[i])
-                i += 1
-        
-        return result
+        return sentence_list(text)
+
+
+def _read_pieces(source: Source, encoding: str) -> Iterator[str]:
+    """
+    Read a streaming source as consecutive decoded text pieces.
+    
+    Args:
+        source: File path, text/binary file object or mmap to read from
+        encoding: Encoding used to decode paths, binary files and mmaps
+    
+    Yields:
+        Pieces of text of up to READ_BUFFER_SIZE characters
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'r', encoding=encoding) as f:
+            yield from _read_pieces(f, encoding)
+        return
+    
+    decoder = codecs.getincrementaldecoder(encoding)()
+    
+    if isinstance(source, mmap.mmap):
+        # Slice the map instead of read() so the caller's position is untouched
+        for position in range(0, len(source), READ_BUFFER_SIZE):
+            yield decoder.decode(source[position:position + READ_BUFFER_SIZE])
+        yield decoder.decode(b'', final=True)
+        return
+    
+    while True:
+        data = source.read(READ_BUFFER_SIZE)
+        if not data:
+            break
+        yield decoder.decode(data) if isinstance(data, bytes) else data
+    yield decoder.decode(b'', final=True)
@@ -0,0 +1,232 @@
+"""
+Near-Duplicate Sentence Filter - MinHash/LSH deduplication for SignalCore
+
+The pruner ranks sentences by rarity within their own chunk, so two copies
+of the same (or a lightly reworded) sentence in different chunks both
+survive. This module finds such near-duplicates across a whole document.
+
+Every sentence becomes a set of word shingles (runs of SHINGLE_SIZE term
+ids), summarized by a MinHash signature: the fraction of signature slots two
+sentences share estimates the Jaccard similarity of their shingle sets.
+Signatures are cut into bands, and sentences whose band hashes collide
+become candidates; only candidates are compared, so the whole pass is
+roughly linear in document length. Each cluster of near-duplicates keeps its
+first sentence.
+"""
+
+from typing import List, Tuple
+import numpy as np
+from backend.algorithms.vocabulary import SentenceTerms
+
+
+class NearDuplicateFilter:
+    """
+    Finds near-duplicate sentences with MinHash signatures and LSH banding.
+    """
+    
+    # Words per shingle; sentences shorter than this form a single shingle
+    SHINGLE_SIZE = 2
+    
+    # Hash functions per signature
+    NUM_PERM = 128
+    
+    # Fixed seed so the same document always deduplicates the same way
+    SEED = 1729
+    
+    def __init__(self, threshold: float = 0.8, num_perm: int = NUM_PERM, shingle_size: int = SHINGLE_SIZE):
+        """
+        Initialize the filter.
+        
+        Args:
+            threshold: Estimated Jaccard similarity of shingle sets at or
+                above which two sentences count as duplicates (0.0 to 1.0)
+            num_perm: Hash functions per MinHash signature
+            shingle_size: Words per shingle
+        """
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError(f"Duplicate threshold must be in (0, 1], got {threshold}")
+        
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = self._band_layout(threshold, num_perm)
+        
+        # Hash family h_j(x) = a_j * x + b_j (mod 2**64) over mixed shingle hashes
+        generator = np.random.default_rng(self.SEED)
+        self._a = generator.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = generator.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+    
+    def keep(self, terms: SentenceTerms) -> List[int]:
+        """
+        Sentences to keep: all but the later members of each duplicate cluster.
+        
+        Args:
+            terms: Term ids of the document's sentences
+        
+        Returns:
+            Sentence numbers to keep, in original order
+        """
+        parent = list(range(len(terms)))
+        for i, j in self.candidate_pairs(terms):
+            root_i = _find(parent, i)
+            root_j = _find(parent, j)
+            # The lower sentence number becomes the root, so each cluster
+            # is represented by its first occurrence
+            if root_i < root_j:
+                parent[root_j] = root_i
+            elif root_j < root_i:
+                parent[root_i] = root_j
+        
+        return [i for i in range(len(parent)) if _find(parent, i) == i]
+    
+    def candidate_pairs(self, terms: SentenceTerms) -> List[Tuple[int, int]]:
+        """
+        Pairs of sentences whose estimated similarity reaches the threshold.
+        
+        Within each LSH bucket every member is compared with the bucket's
+        first sentence only, which keeps the number of comparisons linear;
+        clusters are completed transitively by keep().
+        
+        Args:
+            terms: Term ids of the document's sentences
+        
+        Returns:
+            (sentence, sentence) pairs of near-duplicates
+        """
+        if len(terms) < 2:
+            return []
+        
+        signatures = self.signatures(terms)
+        pairs = []
+        for band in range(self.bands):
+            band_hash = self._band_hash(signatures[:, band * self.rows:(band + 1) * self.rows])
+            
+            # Group sentences with equal band hashes; each group's first
+            # sentence (in document order) is its leader
+            order = np.argsort(band_hash, kind='stable')
+            sorted_hash = band_hash[order]
+            new_group = np.concatenate(([True], sorted_hash[1:] != sorted_hash[:-1]))
+            leader = order[np.flatnonzero(new_group)[np.cumsum(new_group) - 1]]
+            
+            members = np.flatnonzero(~new_group)
+            if not len(members):
+                continue
+            first = leader[members]
+            second = order[members]
+            
+            similarity = (signatures[first] == signatures[second]).mean(axis=1)
+            matched = similarity >= self.threshold
+            pairs.extend(zip(first[matched].tolist(), second[matched].tolist()))
+        
+        return pairs
+    
+    def signatures(self, terms: SentenceTerms) -> np.ndarray:
+        """
+        MinHash signature of every sentence's shingle set.
+        
+        Args:
+            terms: Term ids of the document's sentences
+        
+        Returns:
+            uint64 array of shape (len(terms), num_perm)
+        """
+        ids = np.frombuffer(terms.ids, dtype=np.uint32).astype(np.uint64) if len(terms.ids) else np.zeros(0, np.uint64)
+        offsets = np.frombuffer(terms.offsets, dtype=np.int64)
+        num_sentences = len(offsets) - 1
+        lengths = np.diff(offsets)
+        
+        # Shingles start at every word that leaves a full shingle in the
+        # sentence, or at the first word of a shorter sentence
+        shingle_counts = np.maximum(lengths - self.shingle_size + 1, 1)
+        shingle_counts[lengths == 0] = 0
+        shingle_sentence = np.repeat(np.arange(num_sentences), shingle_counts)
+        first_shingle = np.concatenate(([0], np.cumsum(shingle_counts)[:-1]))
+        starts = offsets[shingle_sentence] + np.arange(len(shingle_sentence)) - first_shingle[shingle_sentence]
+        ends = offsets[shingle_sentence + 1]
+        
+        # Hash each shingle's term ids, ignoring positions past the sentence
+        shingles = np.zeros(len(starts), dtype=np.uint64)
+        padded = np.concatenate((ids, np.zeros(self.shingle_size, np.uint64)))
+        for position in range(self.shingle_size):
+            word = np.where(starts + position < ends, padded[starts + position] + np.uint64(1), np.uint64(0))
+            shingles = _mix(shingles ^ word)
+        
+        signatures = np.full((num_sentences, self.num_perm), np.iinfo(np.uint64).max, dtype=np.uint64)
+        present = shingle_counts > 0
+        if len(shingles):
+            reduce_at = first_shingle[present]
+            for j in range(self.num_perm):
+                signatures[present, j] = np.minimum.reduceat(self._a[j] * shingles + self._b[j], reduce_at)
+        return signatures
+    
+    def _band_hash(self, band: np.ndarray) -> np.ndarray:
+        """
+        Hash each row of one signature band to a single value.
+        
+        Args:
+            band: uint64 array of shape (sentences, rows)
+        
+        Returns:
+            uint64 hash per sentence
+        """
+        value = np.zeros(len(band), dtype=np.uint64)
+        for column in range(band.shape[1]):
+            value = _mix(value ^ band[:, column])
+        return value
+    
+    @staticmethod
+    def _band_layout(threshold: float, num_perm: int) -> Tuple[int, int]:
+        """
+        Choose bands x rows = num_perm so candidates appear near the threshold.
+        
+        Two sentences of similarity s share at least one band with
+        probability 1 - (1 - s**rows)**bands, which rises steeply around
+        (1 / bands) ** (1 / rows). The layout whose midpoint is closest to,
+        but not above, the threshold favours recall; verification against
+        the full signature removes the extra candidates.
+        
+        Args:
+            threshold: Duplicate similarity threshold
+            num_perm: Signature length
+        
+        Returns:
+            (bands, rows)
+        """
+        layouts = [(bands, num_perm // bands) for bands in range(1, num_perm + 1) if num_perm % bands == 0]
+        midpoint = lambda layout: (1.0 / layout[0]) ** (1.0 / layout[1])
+        below = [layout for layout in layouts if midpoint(layout) <= threshold]
+        if not below:
+            return min(layouts, key=midpoint)
+        return max(below, key=midpoint)
+
+
+def _mix(values: np.ndarray) -> np.ndarray:
+    """
+    SplitMix64 finalizer: scramble 64-bit values (wrapping arithmetic).
+    
+    Args:
+        values: uint64 array
+    
+    Returns:
+        Scrambled uint64 array
+    """
+    values = (values ^ (values >> np.uint64(30))) * np.uint64(0xbf58476d1ce4e5b9)
+    values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94d049bb133111eb)
+    return values ^ (values >> np.uint64(31))
+
+
+def _find(parent: List[int], i: int) -> int:
+    """
+    Union-find root of i, halving the path on the way.
+    
+    Args:
+        parent: Parent of each element
+        i: Element
+    
+    Returns:
+        Root of i's set
+    """
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
@@ -6,10 +6,13 @@ extracts the most important sentences from each chunk by ranking them
 based on their similarity to the chunk's overall topic.
 """
 
-import re
-from typing import List, Counter as CounterType
+from typing import Dict, Iterable, List, Sequence, Tuple
 from collections import Counter
+import heapq
 import math
+from backend.algorithms.sentences import SentenceIndex, sentence_list, split_sentences
+from backend.algorithms.vocabulary import SentenceTerms, TermStatistics
+from backend.profiling import NULL_PROFILER, StageProfiler
 
 
 class SentencePruner:
@@ -25,59 +28,581 @@ class SentencePruner:
     # Hard-coded parameter for MVP
     EXTRACTION_RATIO = 0.30  # Keep top 30% of sentences (aggressive optimization)
     
+    # Weight of centroid similarity in the combined score. Uniqueness alone
+    # preserves sentences with unique information (like the needle), so the
+    # similarity is only computed when this is non-zero.
+    SIMILARITY_WEIGHT = 0.0
+    
+    # Weight of query relevance (BM25 scaled to 0..1) in query-aware mode.
+    # Uniqueness never exceeds 1.0, so a strong query match outranks any
+    # sentence that has no query terms.
+    QUERY_WEIGHT = 1.5
+    
+    # Default share of document-wide rarity in each word's inverse
+    # frequency. A word that is rare in its chunk but occurs in most chunks
+    # of the document is boilerplate-like, so blending in 1/sqrt(number of
+    # chunks containing it) damps it; the blend never exceeds 1.0.
+    GLOBAL_WEIGHT = 0.0
+    
+    # Available scoring backends
+    SCORERS = ('counter', 'vectorized')
+    
+    def __init__(self, scorer: str = 'counter', extraction_ratio: float = None, global_weight: float = None):
+        """
+        Initialize the pruner.
+        
+        Args:
+            scorer: Scoring backend. 'counter' scores chunk by chunk on term
+                id arrays; 'vectorized' scores whole documents at once with
+                NumPy and keeps exactly the same sentences.
+            extraction_ratio: Fraction of each chunk's sentences to keep
+                (defaults to EXTRACTION_RATIO)
+            global_weight: Share of document-wide rarity in the inverse
+                frequency, 0.0 to 1.0 (defaults to GLOBAL_WEIGHT); only
+                applied when statistics are passed in
+        """
+        if scorer not in self.SCORERS:
+            raise ValueError(f"Unknown scorer '{scorer}', expected one of {self.SCORERS}")
+        
+        self.scorer = scorer
+        self.extraction_ratio = extraction_ratio if extraction_ratio is not None else self.EXTRACTION_RATIO
+        self.global_weight = global_weight if global_weight is not None else self.GLOBAL_WEIGHT
+        if not 0.0 <= self.global_weight <= 1.0:
+            raise ValueError(f"Global weight must be in [0, 1], got {self.global_weight}")
+        self._inverse = [0.0]
+        self._vectorized = None
+        if scorer == 'vectorized':
+            # Imported lazily so NumPy is only required for this backend
+            from backend.algorithms.vectorized import VectorizedScorer
+            self._vectorized = VectorizedScorer(self.extraction_ratio, self.SIMILARITY_WEIGHT, self.QUERY_WEIGHT,
+                                                self.global_weight)
+    
     def prune(self, chunk: str) -> str:
         """
         Extract most important sentences from chunk.
         
         Args:
             chunk: A single text chunk from Stage 1
-            
+        
         Returns:
             The chunk with only high-importance sentences, in original order
         """
         # Step 1: Tokenize into sentences
-        sentences = self._tokenize_sentences(chunk)
+        index = split_sentences(chunk)
         
-        if not sentences:
+        if not len(index):
             return ""
         
         # If only one sentence, return it
-        if len(sentences) == 1:
+        if len(index) == 1:
             return chunk
         
-        # Step 2: Calculate chunk centroid (word frequency for entire chunk)
-        centroid = self._calculate_centroid(chunk)
+        return self.prune_span(index, 0, len(index))
+    
+    def prune_span(self, index: SentenceIndex, lo: int, hi: int, terms: SentenceTerms = None) -> str:
+        """
+        Prune the chunk made of sentences lo..hi-1 of a shared sentence index.
+        
+        The output is built from slices of the indexed document, so the
+        chunk text itself is never materialized.
+        
+        Args:
+            index: Sentence index of the whole document
+            lo: First sentence of the chunk
+            hi: One past the last sentence of the chunk
+            terms: Term ids of the indexed sentences (encoded if None)
+        
+        Returns:
+            The chunk with only high-importance sentences, in original order
+        """
+        # If only one sentence, return it
+        if hi - lo == 1:
+            return index.sentence(lo)
+        
+        return index.join(self.select(index, lo, hi, terms))
+    
+    def prune_spans(self, index: SentenceIndex, spans: Sequence[Tuple[int, int]],
+                    terms: SentenceTerms = None) -> List[str]:
+        """
+        Prune every chunk of a document.
+        
+        Args:
+            index: Sentence index of the whole document
+            spans: (lo, hi) sentence range of each chunk
+            terms: Term ids of the indexed sentences (encoded if None)
+        
+        Returns:
+            One pruned chunk per span
+        """
+        return [index.join(selected) for selected in self.select_spans(index, spans, terms)]
+    
+    def select_spans(self, index: SentenceIndex, spans: Sequence[Tuple[int, int]],
+                     terms: SentenceTerms = None) -> List[List[int]]:
+        """
+        Choose which sentences to keep in every chunk of a document.
+        
+        The vectorized scorer handles all chunks in one pass; the Counter
+        scorer goes chunk by chunk, reusing one count array.
+        
+        Args:
+            index: Sentence index of the whole document
+            spans: (lo, hi) sentence range of each chunk
+            terms: Term ids of the indexed sentences (encoded if None)
+        
+        Returns:
+            For each chunk, the sentence numbers to keep in original order
+        """
+        if terms is None:
+            terms = SentenceTerms.from_index(index)
+        
+        return self.select_terms(terms, spans)
+    
+    def select_terms(self, terms: SentenceTerms, spans: Sequence[Tuple[int, int]],
+                     profiler: StageProfiler = NULL_PROFILER, relevance: Dict[int, float] = None,
+                     statistics: TermStatistics = None) -> List[List[int]]:
+        """
+        Choose which sentences to keep in every chunk, from term ids alone.
+        
+        Scoring never needs the sentence text, so this is what parallel
+        workers run against a shared-memory view of the term ids.
+        
+        Args:
+            terms: Term ids of the document's sentences
+            spans: (lo, hi) sentence range of each chunk
+            profiler: Records the prune.* sub-steps when profiling is on
+            relevance: Query relevance (0..1) of the sentences that match
+                the query, by sentence number; blended in with QUERY_WEIGHT
+            statistics: Document-wide chunk frequencies of the same term
+                ids; blended into rarity with global_weight
+        
+        Returns:
+            For each chunk, the sentence numbers to keep in original order
+        """
+        statistics = self._statistics(statistics)
+        if self._vectorized is not None:
+            return self._vectorized.select_spans(terms, spans, profiler, relevance, statistics)
+        
+        counts = [0] * terms.num_terms
+        selected = []
+        for lo, hi in spans:
+            keep = self._keep_count(hi - lo) if relevance else 0
+            sentence_scores = self._score(terms, lo, hi, counts, profiler, relevance, keep, statistics)
+            with profiler.stage('prune.select'):
+                selected.append(self._select(lo, hi, sentence_scores))
+        return selected
+    
+    def score_terms(self, terms: SentenceTerms, spans: Sequence[Tuple[int, int]],
+                    profiler: StageProfiler = NULL_PROFILER, relevance: Dict[int, float] = None,
+                    statistics: TermStatistics = None) -> List[float]:
+        """
+        Score the sentences of every chunk, from term ids alone.
+        
+        Args:
+            terms: Term ids of the document's sentences
+            spans: (lo, hi) sentence range of each chunk
+            profiler: Records the prune.* sub-steps when profiling is on
+            relevance: Query relevance of matching sentences, as for
+                select_terms()
+            statistics: Document-wide chunk frequencies, as for
+                select_terms()
+        
+        Returns:
+            One score per sentence, chunk after chunk
+        """
+        statistics = self._statistics(statistics)
+        if self._vectorized is not None:
+            with profiler.stage('prune.score'):
+                return self._vectorized.score_spans(terms, spans, relevance, statistics).tolist()
+        
+        counts = [0] * terms.num_terms
+        scores = []
+        for lo, hi in spans:
+            scores.extend(self._score(terms, lo, hi, counts, profiler, relevance, statistics=statistics))
+        return scores
+    
+    def add_relevance(self, scores: Sequence[float], spans: Sequence[Tuple[int, int]],
+                      relevance: Dict[int, float]) -> List[float]:
+        """
+        Blend query relevance into scores computed without a query.
+        
+        Gives the same scores as score_terms() with the relevance passed
+        in, so the query-independent scores of a document can be reused
+        for every question about it.
+        
+        Args:
+            scores: One score per sentence, chunk after chunk (as returned
+                by score_terms without relevance)
+            spans: (lo, hi) sentence range of each chunk
+            relevance: Query relevance of matching sentences, by sentence number
+        
+        Returns:
+            One score per sentence, chunk after chunk
+        """
+        blended = list(scores)
+        if not relevance:
+            return blended
+        
+        start = 0
+        for lo, hi in spans:
+            for i in range(lo, hi):
+                weight = relevance.get(i)
+                if weight is not None:
+                    blended[start + i - lo] += self.QUERY_WEIGHT * weight
+            start += hi - lo
+        return blended
+    
+    def select_scores(self, scores: Sequence[float], spans: Sequence[Tuple[int, int]],
+                      profiler: StageProfiler = NULL_PROFILER) -> List[List[int]]:
+        """
+        Keep the top extraction_ratio of every chunk by precomputed scores.
+        
+        Args:
+            scores: One score per sentence, chunk after chunk
+            spans: (lo, hi) sentence range of each chunk
+            profiler: Records the prune.select sub-step
+        
+        Returns:
+            For each chunk, the sentence numbers to keep in original order
+        """
+        with profiler.stage('prune.select'):
+            selected = []
+            start = 0
+            for lo, hi in spans:
+                selected.append(self._select(lo, hi, scores[start:start + hi - lo]))
+                start += hi - lo
+            return selected
+    
+    def select_budget(self, scores: Sequence[float], spans: Sequence[Tuple[int, int]], costs: Sequence[int],
+                      budget: int, min_per_chunk: int = 1,
+                      profiler: StageProfiler = NULL_PROFILER) -> List[List[int]]:
+        """
+        Choose the highest-scoring sentences of the whole document that fit a budget.
+        
+        Each chunk's best min_per_chunk sentences are taken first, so no
+        region of the document is dropped entirely; the rest of the budget
+        goes to the best remaining sentences document-wide. Candidates come
+        off a heap in score order (ties in original order) and a sentence
+        that does not fit is skipped, so the budget is never exceeded. The
+        per-chunk minimum gives way to the budget when both cannot be met.
+        
+        Args:
+            scores: One score per sentence, chunk after chunk (as returned
+                by score_terms)
+            spans: (lo, hi) sentence range of each chunk
+            costs: Cost of each sentence (e.g. its word count), indexed by
+                sentence number
+            budget: Maximum total cost of the kept sentences
+            min_per_chunk: Sentences kept from every chunk before the rest
+                of the budget is shared out
+            profiler: Records the prune.select sub-step
+        
+        Returns:
+            For each chunk, the sentence numbers to keep in original order
+            (empty for chunks that got nothing)
+        """
+        with profiler.stage('prune.select'):
+            sentences = [i for lo, hi in spans for i in range(lo, hi)]
+            keep = bytearray(len(sentences))
+            remaining = budget
+            
+            # Per-chunk minimum: every chunk's best sentences, best overall first
+            if min_per_chunk > 0:
+                required = []
+                start = 0
+                for lo, hi in spans:
+                    required.extend(heapq.nlargest(min_per_chunk, range(start, start + hi - lo), key=scores.__getitem__))
+                    start += hi - lo
+                required.sort(key=lambda k: (-scores[k], k))
+                for k in required:
+                    cost = costs[sentences[k]]
+                    if cost <= remaining:
+                        keep[k] = 1
+                        remaining -= cost
+            
+            # Global top-k: pop only as many candidates as the budget allows
+            heap = [(-scores[k], k) for k in range(len(sentences)) if not keep[k]]
+            heapq.heapify(heap)
+            min_cost = min([costs[i] for i in sentences], default=0)
+            while heap and remaining >= min_cost:
+                _, k = heapq.heappop(heap)
+                cost = costs[sentences[k]]
+                if cost <= remaining:
+                    keep[k] = 1
+                    remaining -= cost
+            
+            # Preserve original order within each chunk
+            selected = []
+            start = 0
+            for lo, hi in spans:
+                selected.append([lo + k for k in range(hi - lo) if keep[start + k]])
+                start += hi - lo
+            return selected
+    
+    def select(self, index: SentenceIndex, lo: int, hi: int, terms: SentenceTerms = None) -> List[int]:
+        """
+        Choose which sentences of a chunk to keep.
+        
+        Args:
+            index: Sentence index of the whole document
+            lo: First sentence of the chunk
+            hi: One past the last sentence of the chunk
+            terms: Term ids of the indexed sentences (encoded if None)
+        
+        Returns:
+            Sentence numbers to keep, in original order
+        """
+        return self.select_spans(index, [(lo, hi)], terms)[0]
+    
+    def score(self, index: SentenceIndex, lo: int, hi: int, terms: SentenceTerms = None) -> List[float]:
+        """
+        Score sentences lo..hi-1 by uniqueness + similarity to centroid.
+        
+        Args:
+            index: Sentence index of the whole document
+            lo: First sentence of the chunk
+            hi: One past the last sentence of the chunk
+            terms: Term ids of the indexed sentences (encoded if None)
+        
+        Returns:
+            One score per sentence, in chunk order
+        """
+        if terms is None:
+            terms = SentenceTerms.from_index(index)
+        
+        if self._vectorized is not None:
+            return self._vectorized.score_spans(terms, [(lo, hi)]).tolist()
+        
+        return self._score(terms, lo, hi, [0] * terms.num_terms)
+    
+    def _select(self, lo: int, hi: int, sentence_scores: List[float]) -> List[int]:
+        """
+        Keep the top extraction_ratio of a chunk's sentences by score.
+        
+        Args:
+            lo: First sentence of the chunk
+            hi: One past the last sentence of the chunk
+            sentence_scores: One score per sentence, in chunk order
+        
+        Returns:
+            Sentence numbers to keep, in original order
+        """
+        if hi <= lo:
+            return []
+        
+        num_sentences_to_keep = self._keep_count(hi - lo)
+        
+        # Take the top N by score (descending); nlargest is a partial sort
+        # with the same tie order as sorted(..., reverse=True)[:N]
+        top_sentences = heapq.nlargest(num_sentences_to_keep, range(hi - lo), key=sentence_scores.__getitem__)
+        
+        # Preserve original order
+        return [lo + k for k in sorted(top_sentences)]
+    
+    def _keep_count(self, num_sentences: int) -> int:
+        """
+        Number of sentences kept from a chunk.
+        
+        Args:
+            num_sentences: Sentences in the chunk
+        
+        Returns:
+            extraction_ratio of them, and at least one
+        """
+        return max(1, int(num_sentences * self.extraction_ratio))
+    
+    def _statistics(self, statistics: TermStatistics) -> TermStatistics:
+        """
+        Document-wide statistics to score with, if global rarity is weighted in.
+        
+        Args:
+            statistics: Statistics passed by the caller, or None
+        
+        Returns:
+            statistics, or None when global_weight is 0.0
+        """
+        return statistics if self.global_weight else None
+    
+    def _score(self, terms: SentenceTerms, lo: int, hi: int, counts: List[int],
+               profiler: StageProfiler = NULL_PROFILER, relevance: Dict[int, float] = None,
+               keep: int = 0, statistics: TermStatistics = None) -> List[float]:
+        """
+        Counter-path scoring of sentences lo..hi-1 on term id arrays.
+        
+        With a query, when keep is given and at least keep query-matching
+        sentences outscore anything a non-matching sentence can reach, the
+        non-matching sentences are not scored; they get 0.0, which keeps
+        them out of the top keep either way.
+        
+        Args:
+            terms: Term ids of the indexed sentences
+            lo: First sentence of the chunk
+            hi: One past the last sentence of the chunk
+            counts: Id-indexed count array of len(vocabulary), all zeros;
+                used as the chunk centroid and reset before returning
+            profiler: Records the prune.centroid and prune.score sub-steps
+            relevance: Query relevance of matching sentences, by sentence number
+            keep: Sentences the caller will keep from the chunk, for skipping
+            statistics: Document-wide chunk frequencies, blended into rarity
+        
+        Returns:
+            One score per sentence, in chunk order
+        """
+        with profiler.stage('prune.centroid'):
+            # Chunk centroid: count of each term id in the chunk
+            centroid = Counter(terms.span(lo, hi))
+            for term, count in centroid.items():
+                counts[term] = count
+            
+            max_count = max(centroid.values()) if centroid else 0
+            if statistics is not None:
+                max_count = max(max_count, statistics.max_frequency)
+            inverse = self._inverse_frequencies(max_count)
+            centroid_norm = 0.0
+            if self.SIMILARITY_WEIGHT:
+                centroid_norm = math.sqrt(sum([count ** 2 for count in centroid.values()]))
+        
+        with profiler.stage('prune.score'):
+            sentence_scores = None
+            if keep and relevance:
+                sentence_scores = self._score_matching(terms, lo, hi, counts, inverse, centroid_norm, relevance, keep,
+                                                       statistics)
+            if sentence_scores is None:
+                sentence_scores = self._score_sentences(terms, range(lo, hi), counts, inverse, centroid_norm,
+                                                        relevance, statistics)
+        
+        # Reset the shared count array for the next chunk
+        for term in centroid:
+            counts[term] = 0
+        
+        return sentence_scores
+    
+    def _score_matching(self, terms: SentenceTerms, lo: int, hi: int, counts: List[int], inverse: List[float],
+                        centroid_norm: float, relevance: Dict[int, float], keep: int,
+                        statistics: TermStatistics = None) -> List[float]:
+        """
+        Score only the query-matching sentences of a chunk, if that is enough.
+        
+        A sentence without query terms scores at most 1.0 (uniqueness) plus
+        SIMILARITY_WEIGHT. If the keep-th best matching sentence scores
+        higher, the top keep are all matching sentences.
+        
+        Args:
+            terms: Term ids of the indexed sentences
+            lo: First sentence of the chunk
+            hi: One past the last sentence of the chunk
+            counts: Id-indexed chunk centroid counts
+            inverse: Inverse frequency by count
+            centroid_norm: Euclidean norm of the chunk centroid
+            relevance: Query relevance of matching sentences, by sentence number
+            keep: Sentences that will be kept from the chunk
+            statistics: Document-wide chunk frequencies, blended into rarity
+        
+        Returns:
+            One score per sentence in chunk order (0.0 for skipped ones), or
+            None if every sentence has to be scored
+        """
+        matching = [i for i in range(lo, hi) if i in relevance]
+        if len(matching) < keep:
+            return None
+        
+        matching_scores = self._score_sentences(terms, matching, counts, inverse, centroid_norm, relevance, statistics)
+        if heapq.nlargest(keep, matching_scores)[-1] <= 1.0 + self.SIMILARITY_WEIGHT:
+            return None
+        
+        sentence_scores = [0.0] * (hi - lo)
+        for i, score in zip(matching, matching_scores):
+            sentence_scores[i - lo] = score
+        return sentence_scores
+    
+    def _score_sentences(self, terms: SentenceTerms, sentences: Iterable[int], counts: List[int],
+                         inverse: List[float], centroid_norm: float,
+                         relevance: Dict[int, float] = None, statistics: TermStatistics = None) -> List[float]:
+        """
+        Score sentences against a chunk centroid held in counts.
+        
+        Args:
+            terms: Term ids of the indexed sentences
+            sentences: Sentence numbers to score
+            counts: Id-indexed chunk centroid counts
+            inverse: Inverse frequency by count
+            centroid_norm: Euclidean norm of the chunk centroid
+            relevance: Query relevance of matching sentences, by sentence number
+            statistics: Document-wide chunk frequencies, blended into rarity
+        
+        Returns:
+            One score per sentence, in the order given
+        """
+        if statistics is not None:
+            chunk_frequencies = statistics.chunk_frequencies
+            local_weight = 1.0 - self.global_weight
+            global_weight = self.global_weight
         
-        # Step 3: Score each sentence by similarity to centroid + uniqueness bonus
         sentence_scores = []
-        for idx, sentence in enumerate(sentences):
-            sentence_vector = self._calculate_word_frequency(sentence)
+        for i in sentences:
+            sentence_ids = terms.sentence(i)
             
-            # Base score: similarity to centroid
-            similarity_score = self._cosine_similarity(sentence_vector, centroid)
+            # Uniqueness: average of the top 3 inverse frequencies of the
+            # sentence's distinct words (rare words get higher scores);
+            # with statistics, rarity in the chunk is blended with rarity
+            # across the document's chunks
+            if statistics is None:
+                rarity = [inverse[counts[term]] for term in set(sentence_ids)]
+            else:
+                rarity = [local_weight * inverse[counts[term]] + global_weight * inverse[chunk_frequencies[term]]
+                          for term in set(sentence_ids)]
+            uniqueness_scores = sorted(rarity, reverse=True)[:3]
+            combined_score = sum(uniqueness_scores) / len(uniqueness_scores) if uniqueness_scores else 0.0
             
-            # Uniqueness bonus: boost sentences with rare/unique words
-            uniqueness_score = self._calculate_uniqueness(sentence_vector, centroid)
+            # Similarity bonus: closeness to centroid, when weighted in
+            if self.SIMILARITY_WEIGHT:
+                combined_score += self.SIMILARITY_WEIGHT * self._id_cosine_similarity(sentence_ids, counts, centroid_norm)
             
-            # Combined score: Use uniqueness only for now
-            # This preserves sentences with unique information (like the needle)
-            combined_score = uniqueness_score
+            # Query bonus: BM25 relevance to the user's question
+            if relevance:
+                combined_score += self.QUERY_WEIGHT * relevance.get(i, 0.0)
             
-            sentence_scores.append((idx, sentence, combined_score))
+            sentence_scores.append(combined_score)
         
-        # Step 4: Extract top sentences by score
-        num_sentences_to_keep = max(1, int(len(sentences) * self.EXTRACTION_RATIO))
+        return sentence_scores
+    
+    def _inverse_frequencies(self, max_count: int) -> List[float]:
+        """
+        Inverse frequency 1/sqrt(count) for every count up to max_count.
         
-        # Sort by score (descending) and take top N
-        top_sentences = sorted(sentence_scores, key=lambda x: x[2], reverse=True)[:num_sentences_to_keep]
+        Args:
+            max_count: Largest count needed
         
-        # Step 5: Preserve original order
-        top_sentences_sorted = sorted(top_sentences, key=lambda x: x[0])
+        Returns:
+            List indexed by count (index 0 unused)
+        """
+        inverse = self._inverse
+        if len(inverse) <= max_count:
+            # Replace rather than extend the table, so concurrent readers in
+            # other threads never see it half-built
+            inverse = inverse + [1.0 / (count ** 0.5) for count in range(len(inverse), max_count + 1)]
+            self._inverse = inverse
+        return inverse
+    
+    def _id_cosine_similarity(self, sentence_ids: Sequence[int], counts: List[int], centroid_norm: float) -> float:
+        """
+        Cosine similarity between a sentence and the chunk centroid.
         
-        # Reconstruct text with preserved order
-        pruned_text = ' '.join([sentence for _, sentence, _ in top_sentences_sorted])
+        Args:
+            sentence_ids: Term ids of the sentence
+            counts: Id-indexed chunk centroid counts
+            centroid_norm: Euclidean norm of the chunk centroid
+        
+        Returns:
+            Cosine similarity score (0.0 to 1.0)
+        """
+        sentence_vector = Counter(sentence_ids)
+        numerator = sum([tf * counts[term] for term, tf in sentence_vector.items()])
+        denominator = math.sqrt(sum([tf ** 2 for tf in sentence_vector.values()])) * centroid_norm
         
-        return pruned_text
+        if denominator == 0:
+            return 0.0
+        
+        return numerator / denominator
     
     def _tokenize_sentences(self, text: str) -> List[str]:
         """
@@ -85,26 +610,11 @@ class SentencePruner:
         
         Args:
             text: The text to tokenize
-            
+        
         Returns:
             List of sentences
         """
-        # Split on sentence-ending punctuation followed by whitespace
-        sentences = re.split(r'([.!?])\s+', text)
-        
-        # Reconstruct sentences with their punctuation
-        result = []
-        i = 0
-        while i < len(sentences):
-            if i + 1 < len(sentences) and sentences[i + 1] in '.!?':
-                result.append(sentences[i] + sentences[i + 1])
-                i += 2
-            else:
-                if sentences[i].strip():
-                    result.append(sentences[i])
-                i += 1
-        
-        return result
+        return sentence_list(text)
     
     def _calculate_centroid(self, text: str) -> Counter:
         """
@@ -112,7 +622,7 @@ class SentencePruner:
         
         Args:
             text: The chunk text
-            
+        
         Returns:
             Counter object with word frequencies
         """
@@ -124,7 +634,7 @@ class SentencePruner:
         
         Args:
             text: The text to analyze
-            
+        
         Returns:
             Counter object with word frequencies
         """
@@ -139,7 +649,7 @@ class SentencePruner:
         Args:
             vec1: First word frequency vector
             vec2: Second word frequency vector
-            
+        
         Returns:
             Cosine similarity score (0.0 to 1.0)
         """
@@ -172,7 +682,7 @@ class SentencePruner:
         Args:
             sentence_vector: Word frequency vector for the sentence
             centroid: Word frequency vector for the entire chunk
-            
+        
         Returns:
             Uniqueness score (0.0 to 1.0)
         """
@@ -0,0 +1,283 @@
+"""
+Sentence Index - Shared sentence segmentation for the SignalCore Pipeline
+
+This module splits a document into sentences exactly once and records each
+sentence as a (start, end) span into the original text plus its word count
+and, given a tokenizer, its token cost. The chunker, pruner and needle
+injector all work from this index, so the document is never re-split or
+re-tokenized, and sentence text is only materialized as slices of the
+original buffer when output is built.
+"""
+
+import re
+from array import array
+from typing import Iterable, Iterator, List
+from backend.algorithms.tokens import Tokenizer
+
+
+# Sentence-ending punctuation followed by whitespace. The punctuation stays
+# with the sentence; the whitespace run between sentences is dropped.
+SENTENCE_BOUNDARY = re.compile(r'[.!?]\s+')
+
+
+class SentenceIndex:
+    """
+    Compact span index over the sentences of a document.
+
+    Offsets, word counts and token costs are stored in typed arrays rather
+    than lists of strings, so the index costs a few bytes per sentence
+    regardless of the sentence length.
+    """
+
+    __slots__ = ('text', 'starts', 'ends', 'word_counts', 'tokenizer', 'token_costs')
+
+    def __init__(self, text: str, tokenizer: Tokenizer = None):
+        """
+        Create an empty index over text.
+
+        Args:
+            text: The document the spans refer to
+            tokenizer: If given, each sentence's token cost is computed as
+                it is added and kept in token_costs
+        """
+        self.text = text
+        self.starts = array('q')
+        self.ends = array('q')
+        self.word_counts = array('q')
+        self.tokenizer = tokenizer
+        self.token_costs = array('q')
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def add(self, start: int, end: int) -> None:
+        """
+        Append the sentence text[start:end] to the index.
+
+        Args:
+            start: Offset of the first character of the sentence
+            end: Offset one past the last character of the sentence
+        """
+        sentence = self.text[start:end]
+        words = len(sentence.split())
+        self.starts.append(start)
+        self.ends.append(end)
+        self.word_counts.append(words)
+        if self.tokenizer is not None:
+            self.token_costs.append(self.tokenizer.sentence_cost(sentence, words))
+
+    def sentence(self, i: int) -> str:
+        """
+        Return the text of sentence i as a slice of the original buffer.
+
+        Args:
+            i: Sentence number
+
+        Returns:
+            The sentence text
+        """
+        return self.text[self.starts[i]:self.ends[i]]
+
+    def join(self, indices: Iterable[int], separator: str = ' ') -> str:
+        """
+        Join the given sentences into one string.
+
+        Args:
+            indices: Sentence numbers, in the order they should appear
+            separator: String placed between sentences
+
+        Returns:
+            The joined text
+        """
+        text = self.text
+        starts = self.starts
+        ends = self.ends
+        return separator.join([text[starts[i]:ends[i]] for i in indices])
+
+    def word_count(self, lo: int = 0, hi: int = None) -> int:
+        """
+        Total number of words in sentences lo..hi-1.
+
+        Args:
+            lo: First sentence number
+            hi: One past the last sentence number (defaults to the end)
+
+        Returns:
+            Word count of the range
+        """
+        if hi is None:
+            hi = len(self)
+        return sum(self.word_counts[lo:hi])
+    
+    def token_count(self, indices: Iterable[int] = None) -> int:
+        """
+        Token count of the given sentences, summed from the stored costs.
+        
+        Separators between sentences are not counted; with the heuristic
+        tokenizer they hold no words, so the total equals the count of the
+        joined text.
+        
+        Args:
+            indices: Sentence numbers (defaults to all sentences)
+        
+        Returns:
+            Token count of the sentences
+        """
+        if self.tokenizer is None:
+            raise ValueError("The index was built without a tokenizer")
+        costs = self.token_costs
+        total = sum(costs) if indices is None else sum(map(costs.__getitem__, indices))
+        return self.tokenizer.tokens(total)
+    
+    def view(self, lo: int, hi: int) -> 'SentenceIndex':
+        """
+        Index of sentences lo..hi-1 only, over the same text (not copied).
+        
+        Args:
+            lo: First sentence number
+            hi: One past the last sentence number
+        
+        Returns:
+            SentenceIndex whose sentence i is sentence lo + i of this index
+        """
+        view = SentenceIndex(self.text, self.tokenizer)
+        view.starts = self.starts[lo:hi]
+        view.ends = self.ends[lo:hi]
+        view.word_counts = self.word_counts[lo:hi]
+        view.token_costs = self.token_costs[lo:hi]
+        return view
+    
+    def subset(self, indices: Iterable[int]) -> 'SentenceIndex':
+        """
+        Index of the given sentences only, over the same text (not copied).
+        
+        Args:
+            indices: Sentence numbers to keep, in order
+        
+        Returns:
+            SentenceIndex whose sentence i is the i-th kept sentence
+        """
+        indices = list(indices)
+        subset = SentenceIndex(self.text, self.tokenizer)
+        subset.starts = array('q', map(self.starts.__getitem__, indices))
+        subset.ends = array('q', map(self.ends.__getitem__, indices))
+        subset.word_counts = array('q', map(self.word_counts.__getitem__, indices))
+        if self.tokenizer is not None:
+            subset.token_costs = array('q', map(self.token_costs.__getitem__, indices))
+        return subset
+    
+    @classmethod
+    def from_sentences(cls, sentences: List[str], separator: str = ' ',
+                       tokenizer: Tokenizer = None) -> 'SentenceIndex':
+        """
+        Join already-split sentences into one text and index them.
+        
+        Args:
+            sentences: Sentence strings, in order
+            separator: String placed between sentences
+            tokenizer: Optional tokenizer for per-sentence token costs
+        
+        Returns:
+            SentenceIndex whose text is the joined sentences
+        """
+        index = cls(separator.join(sentences), tokenizer)
+        position = 0
+        for sentence in sentences:
+            end = position + len(sentence)
+            words = len(sentence.split())
+            index.starts.append(position)
+            index.ends.append(end)
+            index.word_counts.append(words)
+            if tokenizer is not None:
+                index.token_costs.append(tokenizer.sentence_cost(sentence, words))
+            position = end + len(separator)
+        return index
+
+
+def split_sentences(text: str, tokenizer: Tokenizer = None) -> SentenceIndex:
+    """
+    Split text into sentences using regex pattern [.!?]\\s+
+
+    Produces the same sentences as splitting with re.split(r'([.!?])\\s+')
+    and re-attaching the punctuation, but records offsets instead of copies.
+
+    Args:
+        text: The text to segment
+        tokenizer: Optional tokenizer; each sentence's token cost is then
+            computed once, here, and stored in the index
+
+    Returns:
+        SentenceIndex over text
+    """
+    index = SentenceIndex(text, tokenizer)
+    start = 0
+    for match in SENTENCE_BOUNDARY.finditer(text):
+        # Keep the punctuation with the sentence, drop the whitespace
+        index.add(start, match.start() + 1)
+        start = match.end()
+
+    # Last sentence or sentence without punctuation
+    if text[start:].strip():
+        index.add(start, len(text))
+
+    return index
+
+
+def iter_sentences(pieces: Iterable[str]) -> Iterator[str]:
+    """
+    Split a stream of text pieces into sentences.
+    
+    Yields the same sentences as split_sentences() on the concatenated
+    pieces. Only the unfinished sentence at the end of each piece is carried
+    over, so sentences and whitespace runs that cross piece boundaries are
+    handled without holding the whole text.
+    
+    Args:
+        pieces: Consecutive pieces of the text, e.g. file read buffers
+    
+    Yields:
+        Sentences, in order
+    """
+    carry = ''
+    # Position in the carry where the next boundary search must resume
+    resume = 0
+    for piece in pieces:
+        if not piece:
+            continue
+        
+        buffer = carry + piece
+        start = 0
+        for match in SENTENCE_BOUNDARY.finditer(buffer, resume):
+            if match.end() == len(buffer):
+                # The whitespace run may continue in the next piece
+                resume = match.start() - start
+                break
+            yield buffer[start:match.start() + 1]
+            start = match.end()
+        else:
+            # Only the last character can begin a boundary not seen yet
+            resume = max(len(buffer) - start - 1, 0)
+        carry = buffer[start:]
+    
+    # End of input: flush the carried text like split_sentences() would
+    start = 0
+    for match in SENTENCE_BOUNDARY.finditer(carry):
+        yield carry[start:match.start() + 1]
+        start = match.end()
+    
+    if carry[start:].strip():
+        yield carry[start:]
+
+
+def sentence_list(text: str) -> List[str]:
+    """
+    Split text into a list of sentence strings.
+
+    Args:
+        text: The text to tokenize
+
+    Returns:
+        List of sentences
+    """
+    index = split_sentences(text)
+    return [index.sentence(i) for i in range(len(index))]
@@ -0,0 +1,379 @@
+"""
+Token Counting for the SignalCore Pipeline
+
+Token metrics and token budgets are computed with a Tokenizer, chosen by
+name with get_tokenizer():
+
+- heuristic (default): The rule of thumb of 1 token per 0.75 words. It is
+  an estimate, not a model's count.
+- A path to a vocabulary in tiktoken's rank-file format: byte-level BPE
+  with that vocabulary, e.g. the one of the model being billed. The
+  pre-tokenizer only approximates the model's own, so counts can still
+  differ slightly from the provider's.
+
+No vocabulary is bundled. BPETokenizer.train() can build one, but a
+vocabulary trained locally does not match any model's tokenizer, and one
+trained on the benchmark's test data would skew its results.
+
+Everything runs offline. A tokenizer reports the size of a text as an
+additive cost (BPE tokens, or words for the heuristic) and converts a total
+cost to tokens, so the cost of each sentence can be computed once when the
+document is segmented and summed for any selection of sentences afterwards.
+"""
+
+import base64
+import heapq
+import os
+import re
+import threading
+from abc import ABC, abstractmethod
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List
+
+
+# Pre-tokenizer: contractions, words with their leading space, numbers of up
+# to three digits, punctuation runs and whitespace. BPE merges never cross
+# these pieces. It follows the GPT-2/cl100k split as closely as the standard
+# re module allows.
+PRETOKENIZE = re.compile(r"""'(?:[sdmt]|ll|ve|re)| ?[^\W\d_]+| ?\d{1,3}| ?(?:[^\s\w]|_)+|\s+(?!\S)|\s+""")
+
+
+class Tokenizer(ABC):
+    """
+    Interface of a token counter.
+    
+    cost() of a text is additive over pieces of text split at whitespace,
+    and tokens() converts a summed cost to a token count.
+    """
+    
+    # Name used by get_tokenizer() and in cache keys
+    name = ''
+    
+    @abstractmethod
+    def cost(self, text: str) -> int:
+        """
+        Additive size of a text.
+        
+        Args:
+            text: The text to measure
+        
+        Returns:
+            Cost of the text in this tokenizer's units
+        """
+    
+    def sentence_cost(self, text: str, words: int) -> int:
+        """
+        Cost of a sentence whose word count is already known.
+        
+        Args:
+            text: The sentence
+            words: Number of whitespace-separated words in text
+        
+        Returns:
+            Cost of the sentence in this tokenizer's units
+        """
+        return self.cost(text)
+    
+    def tokens(self, cost: int) -> int:
+        """
+        Convert a total cost to a token count.
+        
+        Args:
+            cost: Summed cost of some texts
+        
+        Returns:
+            Token count
+        """
+        return cost
+    
+    def max_cost(self, tokens: int) -> int:
+        """
+        Largest total cost whose token count fits in tokens.
+        
+        Args:
+            tokens: Token budget
+        
+        Returns:
+            Cost budget
+        """
+        return tokens
+    
+    def count(self, text: str) -> int:
+        """
+        Count the tokens of a text.
+        
+        Args:
+            text: The text to count tokens for
+        
+        Returns:
+            Token count
+        """
+        return self.tokens(self.cost(text))
+
+
+class HeuristicTokenizer(Tokenizer):
+    """
+    Word-based estimate. Rule of thumb: 1 token ≈ 0.75 words
+    """
+    
+    name = 'heuristic'
+    
+    WORDS_PER_TOKEN = 0.75
+    
+    def cost(self, text: str) -> int:
+        return len(text.split())
+    
+    def sentence_cost(self, text: str, words: int) -> int:
+        return words
+    
+    def tokens(self, cost: int) -> int:
+        return int(cost / self.WORDS_PER_TOKEN)
+    
+    def max_cost(self, tokens: int) -> int:
+        words = int(tokens * self.WORDS_PER_TOKEN)
+        while self.tokens(words + 1) <= tokens:
+            words += 1
+        return words
+
+
+class BPETokenizer(Tokenizer):
+    """
+    Byte-level BPE tokenizer over a rank table (token bytes -> rank).
+    
+    Text is pre-tokenized with PRETOKENIZE, and each piece's UTF-8 bytes
+    are merged pairwise, lowest rank first, as tiktoken does. Token counts
+    are memoized per piece, so counting mostly costs one dictionary lookup
+    per word. The memo is shared by all threads; lookups take no lock, and
+    adding to or clearing it is serialized.
+    """
+    
+    name = 'bpe'
+    
+    # Pieces whose token count is memoized before the memo is cleared
+    MAX_MEMO = 1 << 18
+    
+    def __init__(self, ranks: Dict[bytes, int], name: str = 'bpe'):
+        """
+        Args:
+            ranks: Merge rank of every token; all 256 single bytes must be
+                present
+            name: Name of the vocabulary, for cache keys
+        """
+        missing = [b for b in range(256) if bytes([b]) not in ranks]
+        if missing:
+            raise ValueError(f"Vocabulary lacks {len(missing)} single-byte tokens")
+        
+        self.ranks = ranks
+        self.name = name
+        self._memo: Dict[str, int] = {}
+        self._memo_lock = threading.Lock()
+    
+    @classmethod
+    def from_file(cls, path: str, name: str = None) -> 'BPETokenizer':
+        """
+        Load a vocabulary in tiktoken's format: one "base64-token rank" per line.
+        
+        Args:
+            path: Rank file
+            name: Name of the vocabulary (defaults to the path)
+        
+        Returns:
+            The tokenizer
+        """
+        ranks = {}
+        with open(path, 'rb') as f:
+            for line in f:
+                if line.strip():
+                    token, rank = line.split()
+                    ranks[base64.b64decode(token)] = int(rank)
+        return cls(ranks, name or path)
+    
+    def save(self, path: str) -> None:
+        """
+        Write the vocabulary in tiktoken's format.
+        
+        Args:
+            path: Rank file to write
+        """
+        with open(path, 'wb') as f:
+            for token, rank in sorted(self.ranks.items(), key=lambda item: item[1]):
+                f.write(base64.b64encode(token) + b' ' + str(rank).encode() + b'\n')
+    
+    @classmethod
+    def train(cls, texts: Iterable[str], vocab_size: int, name: str = 'bpe') -> 'BPETokenizer':
+        """
+        Learn a vocabulary: repeatedly merge the most frequent adjacent pair.
+        
+        Pair counts are updated only for the words that contain the merged
+        pair, so training on a few MB takes seconds.
+        
+        Args:
+            texts: Training texts
+            vocab_size: Number of tokens, including the 256 single bytes
+            name: Name of the vocabulary
+        
+        Returns:
+            The trained tokenizer
+        """
+        word_counts = Counter(piece for text in texts for piece in PRETOKENIZE.findall(text))
+        words = [[bytes([b]) for b in word.encode('utf-8')] for word in word_counts]
+        frequencies = list(word_counts.values())
+        
+        pairs = Counter()
+        containing = defaultdict(set)
+        for w, symbols in enumerate(words):
+            for pair in zip(symbols, symbols[1:]):
+                pairs[pair] += frequencies[w]
+                containing[pair].add(w)
+        
+        # Max-heap of (count, pair); entries whose count changed are stale
+        # and skipped. Equal counts merge the smaller pair first.
+        heap = [(-count, pair) for pair, count in pairs.items()]
+        heapq.heapify(heap)
+        
+        ranks = {bytes([b]): b for b in range(256)}
+        while len(ranks) < vocab_size and heap:
+            count, pair = heapq.heappop(heap)
+            if pairs.get(pair) != -count:
+                continue
+            if -count < 2:
+                break
+            
+            merged = pair[0] + pair[1]
+            if merged not in ranks:
+                ranks[merged] = len(ranks)
+            
+            changed = set()
+            for w in containing.pop(pair):
+                symbols = words[w]
+                frequency = frequencies[w]
+                for old in zip(symbols, symbols[1:]):
+                    pairs[old] -= frequency
+                    changed.add(old)
+                
+                new_symbols = []
+                i = 0
+                while i < len(symbols):
+                    if i + 1 < len(symbols) and symbols[i] == pair[0] and symbols[i + 1] == pair[1]:
+                        new_symbols.append(merged)
+                        i += 2
+                    else:
+                        new_symbols.append(symbols[i])
+                        i += 1
+                words[w] = new_symbols
+                
+                for new in zip(new_symbols, new_symbols[1:]):
+                    pairs[new] += frequency
+                    containing[new].add(w)
+                    changed.add(new)
+            
+            for changed_pair in changed:
+                if pairs[changed_pair] > 0:
+                    heapq.heappush(heap, (-pairs[changed_pair], changed_pair))
+                else:
+                    del pairs[changed_pair]
+                    containing.pop(changed_pair, None)
+        
+        return cls(ranks, name)
+    
+    def encode(self, text: str) -> List[int]:
+        """
+        Encode a text to token ranks.
+        
+        Args:
+            text: The text to encode
+        
+        Returns:
+            Token ranks, in order
+        """
+        ranks = self.ranks
+        return [ranks[part] for piece in PRETOKENIZE.findall(text) for part in self._merge(piece.encode('utf-8'))]
+    
+    def cost(self, text: str) -> int:
+        pieces = PRETOKENIZE.findall(text)
+        memo = self._memo
+        try:
+            return sum(map(memo.__getitem__, pieces))
+        except KeyError:
+            pass
+        
+        # Some pieces are new (or the memo was just cleared by another
+        # thread): count them under the lock, summing from a local copy so
+        # a later clear cannot lose them
+        counts = {}
+        with self._memo_lock:
+            if len(memo) + len(pieces) > self.MAX_MEMO:
+                memo.clear()
+            for piece in pieces:
+                if piece not in counts:
+                    count = memo.get(piece)
+                    if count is None:
+                        count = memo[piece] = len(self._merge(piece.encode('utf-8')))
+                    counts[piece] = count
+        return sum(map(counts.__getitem__, pieces))
+    
+    def __getstate__(self) -> Dict[str, Any]:
+        # Locks cannot be pickled; the memo is rebuilt in each process
+        return {'ranks': self.ranks, 'name': self.name}
+    
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(state['ranks'], state['name'])
+    
+    def _merge(self, piece: bytes) -> List[bytes]:
+        """
+        Apply BPE merges to one pre-tokenized piece.
+        
+        Args:
+            piece: UTF-8 bytes of the piece
+        
+        Returns:
+            The piece's tokens
+        """
+        ranks = self.ranks
+        if piece in ranks:
+            return [piece]
+        
+        parts = [piece[i:i + 1] for i in range(len(piece))]
+        while len(parts) > 1:
+            best = -1
+            best_rank = None
+            for i in range(len(parts) - 1):
+                rank = ranks.get(parts[i] + parts[i + 1])
+                if rank is not None and (best_rank is None or rank < best_rank):
+                    best, best_rank = i, rank
+            if best < 0:
+                break
+            parts[best:best + 2] = [parts[best] + parts[best + 1]]
+        return parts
+
+
+# Tokenizers by name, loaded once per process
+_tokenizers: Dict[str, Tokenizer] = {}
+_lock = threading.Lock()
+
+
+def get_tokenizer(name: str = 'heuristic') -> Tokenizer:
+    """
+    Get a tokenizer by name; each is loaded once per process and shared.
+    
+    Args:
+        name: 'heuristic', or the path of a tiktoken-format rank file
+    
+    Returns:
+        The tokenizer
+    """
+    tokenizer = _tokenizers.get(name)
+    if tokenizer is not None:
+        return tokenizer
+    
+    with _lock:
+        tokenizer = _tokenizers.get(name)
+        if tokenizer is None:
+            if name == 'heuristic':
+                tokenizer = HeuristicTokenizer()
+            elif os.path.isfile(name):
+                tokenizer = BPETokenizer.from_file(name)
+            else:
+                raise ValueError(f"Unknown tokenizer '{name}', expected 'heuristic' or a rank file path")
+            _tokenizers[name] = tokenizer
+    return tokenizer
@@ -0,0 +1,314 @@
+"""
+Vectorized Scoring Engine - NumPy backend for the Sentence-Level Pruner
+
+This module scores every sentence of a document in a handful of array
+operations instead of one Python loop per sentence. From the interned term
+ids it builds a sparse sentence-by-term matrix (as sorted COO pairs) for all
+chunks at once, counts each term's frequency in its chunk centroid (in a
+dense chunk-by-term table when the vocabulary is small enough), and computes
+the top-3 inverse-frequency uniqueness and cosine similarity in vector form.
+No step loops over sentences in Python.
+
+Uniqueness scores are bit-for-bit identical to the Counter path in
+SentencePruner, so both backends keep exactly the same sentences.
+"""
+
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+from backend.algorithms.vocabulary import SentenceTerms, TermStatistics
+from backend.profiling import NULL_PROFILER, StageProfiler
+
+
+class VectorizedScorer:
+    """
+    Scores and selects sentences for many chunks at once with NumPy.
+    """
+    
+    # Number of most unique words averaged into a sentence's uniqueness
+    TOP_WORDS = 3
+    
+    # Chunk centroids are counted in a dense chunk-by-term table when it has
+    # at most this many cells per word of the document, and by sorting
+    # (chunk, term) pairs otherwise
+    DENSE_CELLS_PER_WORD = 8
+    
+    def __init__(self, extraction_ratio: float, similarity_weight: float = 0.0, query_weight: float = 0.0,
+                 global_weight: float = 0.0):
+        """
+        Initialize the scorer.
+        
+        Args:
+            extraction_ratio: Fraction of each chunk's sentences to keep
+            similarity_weight: Weight of centroid similarity in the combined score
+            query_weight: Weight of query relevance in the combined score
+            global_weight: Share of document-wide rarity in the inverse
+                frequency, when statistics are given
+        """
+        self.extraction_ratio = extraction_ratio
+        self.similarity_weight = similarity_weight
+        self.query_weight = query_weight
+        self.global_weight = global_weight
+        self._inverse = np.zeros(1, dtype=np.float64)
+    
+    def score_spans(self, terms: SentenceTerms, spans: Sequence[Tuple[int, int]],
+                    relevance: Dict[int, float] = None, statistics: TermStatistics = None) -> np.ndarray:
+        """
+        Score the sentences of every chunk.
+        
+        Args:
+            terms: Term ids of the document's sentences
+            spans: (lo, hi) sentence range of each chunk, in document order
+            relevance: Query relevance of matching sentences, by sentence number
+            statistics: Document-wide chunk frequencies of the same term ids
+        
+        Returns:
+            Float array with one score per sentence, chunk after chunk
+        """
+        # Sentence-by-term matrix as (sentence, term) pairs, read straight
+        # from the interned term id arrays
+        ids = np.frombuffer(terms.ids, dtype=np.uint32) if len(terms.ids) else np.zeros(0, dtype=np.uint32)
+        offsets = np.frombuffer(terms.offsets, dtype=np.int64)
+        term_array = np.concatenate([ids[offsets[lo]:offsets[hi]] for lo, hi in spans] or [ids[:0]]).astype(np.int64)
+        num_terms = max(terms.num_terms, 1)
+        sentence_words = np.concatenate([np.diff(offsets[lo:hi + 1]) for lo, hi in spans] or [offsets[:0]])
+        num_sentences = len(sentence_words)
+        chunk_sizes = np.array([hi - lo for lo, hi in spans], dtype=np.int64)
+        sentence_chunk = np.repeat(np.arange(len(spans), dtype=np.int64), chunk_sizes)
+        token_sentence = np.repeat(np.arange(num_sentences, dtype=np.int64), sentence_words)
+        
+        # Distinct words of each sentence, with their in-sentence counts
+        pair_keys, pair_tf = np.unique(token_sentence * num_terms + term_array, return_counts=True)
+        pair_sentence = pair_keys // num_terms
+        pair_term = pair_keys % num_terms
+        
+        # Chunk centroids: count of each term in each chunk
+        pair_chunk = sentence_chunk[pair_sentence]
+        chunk_frequency, centroid_norm = self._chunk_frequencies(sentence_chunk[token_sentence], term_array,
+                                                                 pair_chunk, pair_term, len(spans), num_terms)
+        
+        global_frequency = None
+        if statistics is not None and len(pair_term):
+            global_frequency = np.frombuffer(statistics.chunk_frequencies, dtype=np.uint32)[pair_term]
+        
+        scores = self._uniqueness(pair_sentence, chunk_frequency, num_sentences, global_frequency)
+        
+        if self.similarity_weight:
+            similarity = self._cosine(pair_sentence, pair_tf, pair_chunk, chunk_frequency, centroid_norm,
+                                      num_sentences)
+            scores = scores + self.similarity_weight * similarity
+        
+        if relevance:
+            scores = scores + self.query_weight * self._relevance(relevance, spans, num_sentences)
+        
+        return scores
+    
+    def select_spans(self, terms: SentenceTerms, spans: Sequence[Tuple[int, int]],
+                     profiler: StageProfiler = NULL_PROFILER, relevance: Dict[int, float] = None,
+                     statistics: TermStatistics = None) -> List[List[int]]:
+        """
+        Choose which sentences of every chunk to keep.
+        
+        Args:
+            terms: Term ids of the document's sentences
+            spans: (lo, hi) sentence range of each chunk
+            profiler: Records the prune.score and prune.select sub-steps
+            relevance: Query relevance of matching sentences, by sentence number
+            statistics: Document-wide chunk frequencies of the same term ids
+        
+        Returns:
+            For each chunk, the sentence numbers to keep in original order
+        """
+        with profiler.stage('prune.score'):
+            scores = self.score_spans(terms, spans, relevance, statistics)
+        
+        with profiler.stage('prune.select'):
+            return self._select(scores, spans)
+    
+    def _select(self, scores: np.ndarray, spans: Sequence[Tuple[int, int]]) -> List[List[int]]:
+        """
+        Keep the top extraction_ratio of each chunk's sentences by score.
+        
+        Args:
+            scores: One score per sentence, chunk after chunk
+            spans: (lo, hi) sentence range of each chunk
+        
+        Returns:
+            For each chunk, the sentence numbers to keep in original order
+        """
+        chunk_sizes = np.array([hi - lo for lo, hi in spans], dtype=np.int64)
+        offsets = np.concatenate(([0], np.cumsum(chunk_sizes)))
+        sentence_chunk = np.repeat(np.arange(len(spans), dtype=np.int64), chunk_sizes)
+        position = np.arange(len(scores), dtype=np.int64)
+        
+        # Rank within each chunk by score descending, ties in original order
+        order = np.lexsort((position, -scores, sentence_chunk))
+        rank = np.empty_like(position)
+        rank[order] = position - offsets[sentence_chunk[order]]
+        
+        keep = np.array([max(1, int(size * self.extraction_ratio)) for size in chunk_sizes.tolist()], dtype=np.int64)
+        kept = np.flatnonzero(rank < keep[sentence_chunk])
+        
+        selected = []
+        bounds = np.searchsorted(kept, offsets)
+        for chunk, (lo, hi) in enumerate(spans):
+            local = kept[bounds[chunk]:bounds[chunk + 1]] - offsets[chunk]
+            selected.append((local + lo).tolist())
+        return selected
+    
+    def _relevance(self, relevance: Dict[int, float], spans: Sequence[Tuple[int, int]], num_sentences: int) -> np.ndarray:
+        """
+        Spread sparse per-sentence relevance over the scored positions.
+        
+        Args:
+            relevance: Query relevance of matching sentences, by sentence number
+            spans: (lo, hi) sentence range of each chunk, in document order
+            num_sentences: Number of sentences scored
+        
+        Returns:
+            Relevance per scored position (0.0 where a sentence has none)
+        """
+        values = np.zeros(num_sentences, dtype=np.float64)
+        if not spans:
+            return values
+        
+        sentences = np.fromiter(relevance.keys(), dtype=np.int64, count=len(relevance))
+        scores = np.fromiter(relevance.values(), dtype=np.float64, count=len(relevance))
+        bounds = np.array(spans, dtype=np.int64).reshape(-1, 2)
+        first_position = np.concatenate(([0], np.cumsum(bounds[:, 1] - bounds[:, 0])[:-1]))
+        
+        # The chunk each matching sentence falls in, if any
+        chunk = np.searchsorted(bounds[:, 0], sentences, side='right') - 1
+        inside = (chunk >= 0) & (sentences < bounds[np.maximum(chunk, 0), 1])
+        chunk = chunk[inside]
+        values[first_position[chunk] + sentences[inside] - bounds[chunk, 0]] = scores[inside]
+        return values
+    
+    def _chunk_frequencies(self, token_chunk: np.ndarray, token_term: np.ndarray, pair_chunk: np.ndarray,
+                           pair_term: np.ndarray, num_chunks: int, num_terms: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Count every term in every chunk, and look up each pair's count.
+        
+        Args:
+            token_chunk: Chunk of each word
+            token_term: Term id of each word
+            pair_chunk: Chunk of each distinct (sentence, term) pair
+            pair_term: Term id of each pair
+            num_chunks: Number of chunks scored
+            num_terms: Vocabulary size
+        
+        Returns:
+            (count of the pair's term in its chunk, for each pair; Euclidean
+            norm of each chunk centroid, or None when similarity is not
+            weighted in)
+        """
+        token_keys = token_chunk * num_terms + token_term
+        pair_keys = pair_chunk * num_terms + pair_term
+        centroid_norm = None
+        
+        if num_chunks * num_terms <= self.DENSE_CELLS_PER_WORD * len(token_keys):
+            counts = np.bincount(token_keys, minlength=num_chunks * num_terms)
+            if self.similarity_weight:
+                squares = counts.reshape(num_chunks, num_terms).astype(np.float64) ** 2
+                centroid_norm = np.sqrt(squares.sum(axis=1))
+            return counts[pair_keys], centroid_norm
+        
+        centroid_keys, centroid_counts = np.unique(token_keys, return_counts=True)
+        if self.similarity_weight:
+            centroid_norm = np.sqrt(np.bincount(centroid_keys // num_terms,
+                                                weights=centroid_counts.astype(np.float64) ** 2,
+                                                minlength=num_chunks))
+        return centroid_counts[np.searchsorted(centroid_keys, pair_keys)], centroid_norm
+    
+    def _uniqueness(self, pair_sentence: np.ndarray, chunk_frequency: np.ndarray, num_sentences: int,
+                    global_frequency: np.ndarray = None) -> np.ndarray:
+        """
+        Average of the TOP_WORDS highest inverse frequencies per sentence.
+        
+        Args:
+            pair_sentence: Sentence of each distinct (sentence, term) pair
+            chunk_frequency: Chunk frequency of the pair's term
+            num_sentences: Number of sentences scored
+            global_frequency: Number of the document's chunks containing the
+                pair's term, blended in with global_weight (None to skip)
+        
+        Returns:
+            Uniqueness score per sentence
+        """
+        idf = self._inverse_frequencies(chunk_frequency)
+        if global_frequency is not None:
+            # Same operations, in the same order, as the Counter path's blend
+            idf = (1.0 - self.global_weight) * idf + self.global_weight * self._inverse_frequencies(global_frequency)
+        
+        # Take the TOP_WORDS largest values of each sentence one at a time:
+        # pairs are grouped by sentence, so each round is one reduction per
+        # sentence, after which one occurrence of the maximum is removed
+        distinct_words = np.bincount(pair_sentence, minlength=num_sentences)
+        scored = np.flatnonzero(distinct_words)
+        scores = np.zeros(num_sentences, dtype=np.float64)
+        if not len(scored):
+            return scores
+        
+        sizes = distinct_words[scored]
+        starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        segment = np.repeat(np.arange(len(scored)), sizes)
+        position = np.arange(len(idf))
+        remaining = idf.copy()
+        
+        # Sum in the same order as sum() over the sorted list
+        total = np.zeros(len(scored), dtype=np.float64)
+        for rank in range(self.TOP_WORDS):
+            best = np.maximum.reduceat(remaining, starts)
+            present = sizes > rank
+            total = total + np.where(present, best, 0.0)
+            first = np.minimum.reduceat(np.where(remaining == best[segment], position, len(idf)), starts)
+            remaining[first[present]] = -np.inf
+        
+        scores[scored] = total / np.minimum(sizes, self.TOP_WORDS)
+        return scores
+    
+    def _inverse_frequencies(self, frequency: np.ndarray) -> np.ndarray:
+        """
+        Inverse frequency 1/sqrt(frequency) of every element.
+        
+        Looked up in a table computed with Python floats, so values match
+        the Counter path exactly.
+        
+        Args:
+            frequency: Integer frequencies
+        
+        Returns:
+            Float array of the same shape
+        """
+        inverse = self._inverse
+        max_frequency = int(frequency.max()) if len(frequency) else 0
+        if len(inverse) <= max_frequency:
+            # Replace rather than extend the table, so concurrent readers in
+            # other threads never see it half-built
+            extra = [1.0 / (count ** 0.5) for count in range(len(inverse), max_frequency + 1)]
+            inverse = np.concatenate((inverse, np.array(extra, dtype=np.float64)))
+            self._inverse = inverse
+        return inverse[frequency]
+    
+    def _cosine(self, pair_sentence: np.ndarray, pair_tf: np.ndarray, pair_chunk: np.ndarray,
+                chunk_frequency: np.ndarray, centroid_norm: np.ndarray, num_sentences: int) -> np.ndarray:
+        """
+        Cosine similarity between each sentence vector and its chunk centroid.
+        
+        Args:
+            pair_sentence: Sentence of each distinct (sentence, term) pair
+            pair_tf: Count of the pair's term in the sentence
+            pair_chunk: Chunk of each pair
+            chunk_frequency: Chunk frequency of the pair's term
+            centroid_norm: Euclidean norm of each chunk centroid
+            num_sentences: Number of sentences scored
+        
+        Returns:
+            Cosine similarity per sentence (0.0 to 1.0)
+        """
+        pair_tf = pair_tf.astype(np.float64)
+        numerator = np.bincount(pair_sentence, weights=pair_tf * chunk_frequency, minlength=num_sentences)
+        sentence_norm = np.sqrt(np.bincount(pair_sentence, weights=pair_tf ** 2, minlength=num_sentences))
+        sentence_centroid_norm = np.zeros(num_sentences, dtype=np.float64)
+        sentence_centroid_norm[pair_sentence] = centroid_norm[pair_chunk]
+        denominator = sentence_norm * sentence_centroid_norm
+        return np.divide(numerator, denominator, out=np.zeros(num_sentences, dtype=np.float64), where=denominator > 0)
@@ -0,0 +1,226 @@
+"""
+Term Vocabulary - Integer interning of words for the SignalCore Pipeline
+
+This module maps each normalized word of a document to an integer term id
+once, and stores the words of every sentence as a compact array of ids.
+Pruner scoring then works on id arrays and id-indexed count arrays instead
+of dicts keyed by freshly lowercased strings.
+"""
+
+from array import array
+from collections import Counter
+from itertools import accumulate
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from backend.algorithms.sentences import SentenceIndex
+
+
+# Sentences encoded per split call, bounding the temporary word list
+ENCODE_BATCH_SENTENCES = 4096
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into normalized words (lowercase, whitespace separated).
+    
+    Args:
+        text: The text to tokenize
+    
+    Returns:
+        List of normalized words
+    """
+    return text.lower().split()
+
+
+class Vocabulary:
+    """
+    Maps normalized words to dense integer term ids, in first-seen order.
+    """
+    
+    __slots__ = ('ids',)
+    
+    def __init__(self):
+        """Initialize an empty vocabulary."""
+        self.ids: Dict[str, int] = {}
+    
+    def __len__(self) -> int:
+        return len(self.ids)
+    
+    def get(self, word: str) -> Optional[int]:
+        """
+        Look up the term id of an already normalized word.
+        
+        Args:
+            word: Normalized word
+        
+        Returns:
+            The term id, or None if the word has not been seen
+        """
+        return self.ids.get(word)
+    
+    def encode(self, words: List[str]) -> array:
+        """
+        Intern words and return their term ids.
+        
+        Args:
+            words: Normalized words
+        
+        Returns:
+            array('I') of term ids, one per word
+        """
+        ids = self.ids
+        for word in dict.fromkeys(words):
+            if word not in ids:
+                ids[word] = len(ids)
+        return array('I', map(ids.__getitem__, words))
+
+
+class SentenceTerms:
+    """
+    Term ids of every sentence of a document, stored back to back.
+    
+    Sentence i's ids are ids[offsets[i]:offsets[i + 1]], so the whole
+    document costs four bytes per word plus eight bytes per sentence.
+    """
+    
+    __slots__ = ('vocabulary', 'ids', 'offsets', '_num_terms')
+    
+    def __init__(self, vocabulary: Optional[Vocabulary], ids: Sequence[int], offsets: Sequence[int],
+                 num_terms: int = None):
+        """
+        Args:
+            vocabulary: Vocabulary the ids refer to (None for a detached view)
+            ids: array('I') of term ids of all sentences, in order; any
+                buffer of unsigned 32-bit ints such as a memoryview works
+            offsets: array('q') of len(sentences) + 1 positions into ids
+            num_terms: Vocabulary size, required when vocabulary is None
+        """
+        self.vocabulary = vocabulary
+        self.ids = ids
+        self.offsets = offsets
+        self._num_terms = num_terms
+    
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+    
+    @property
+    def num_terms(self) -> int:
+        """Number of distinct term ids the sentences may use."""
+        if self.vocabulary is not None:
+            return len(self.vocabulary)
+        return self._num_terms
+    
+    @classmethod
+    def from_index(cls, index: SentenceIndex, vocabulary: Vocabulary = None) -> 'SentenceTerms':
+        """
+        Encode every sentence of a sentence index.
+        
+        Args:
+            index: Sentence index of the document
+            vocabulary: Vocabulary to intern into (a new one if None)
+        
+        Returns:
+            SentenceTerms aligned with the index
+        """
+        if vocabulary is None:
+            vocabulary = Vocabulary()
+        
+        text = index.text
+        starts = index.starts
+        ends = index.ends
+        ids = array('I')
+        
+        # Sentences are separated by whitespace only, so splitting a run of
+        # sentences in one call yields their words back to back
+        for lo in range(0, len(index), ENCODE_BATCH_SENTENCES):
+            hi = min(lo + ENCODE_BATCH_SENTENCES, len(index))
+            ids.extend(vocabulary.encode(tokenize(text[starts[lo]:ends[hi - 1]])))
+        
+        offsets = array('q', accumulate(index.word_counts, initial=0))
+        return cls(vocabulary, ids, offsets)
+    
+    def sentence(self, i: int) -> Sequence[int]:
+        """
+        Term ids of sentence i.
+        
+        Args:
+            i: Sentence number
+        
+        Returns:
+            array('I') of term ids (a slice of the same type as ids)
+        """
+        return self.ids[self.offsets[i]:self.offsets[i + 1]]
+    
+    def span(self, lo: int, hi: int) -> Sequence[int]:
+        """
+        Term ids of sentences lo..hi-1, back to back.
+        
+        Args:
+            lo: First sentence number
+            hi: One past the last sentence number
+        
+        Returns:
+            array('I') of term ids (a slice of the same type as ids)
+        """
+        return self.ids[self.offsets[lo]:self.offsets[hi]]
+    
+    def subset(self, indices: Iterable[int]) -> 'SentenceTerms':
+        """
+        Term ids of the given sentences only, sharing the vocabulary.
+        
+        Args:
+            indices: Sentence numbers to keep, in order
+        
+        Returns:
+            SentenceTerms whose sentence i is the i-th kept sentence
+        """
+        ids = array('I')
+        offsets = array('q', [0])
+        for i in indices:
+            ids.extend(self.sentence(i))
+            offsets.append(len(ids))
+        return SentenceTerms(self.vocabulary, ids, offsets, self._num_terms)
+
+
+class TermStatistics:
+    """
+    Document-wide term statistics: in how many chunks each term id occurs.
+    
+    Computed once per document after chunking and only read while scoring,
+    so every pruner worker shares the same copy.
+    """
+    
+    __slots__ = ('chunk_frequencies', 'num_chunks', 'max_frequency')
+    
+    def __init__(self, chunk_frequencies: Sequence[int], num_chunks: int):
+        """
+        Args:
+            chunk_frequencies: array('I') of the number of chunks each term
+                id occurs in; any buffer of unsigned 32-bit ints works
+            num_chunks: Number of chunks of the document
+        """
+        self.chunk_frequencies = chunk_frequencies
+        self.num_chunks = num_chunks
+        self.max_frequency = max(chunk_frequencies, default=0)
+    
+    @classmethod
+    def from_spans(cls, terms: SentenceTerms, spans: Iterable[Tuple[int, int]]) -> 'TermStatistics':
+        """
+        Count chunk frequencies over a document's chunks.
+        
+        Args:
+            terms: Term ids of the document's sentences
+            spans: (lo, hi) sentence range of each chunk
+        
+        Returns:
+            TermStatistics indexed by the terms' ids
+        """
+        counts = Counter()
+        num_chunks = 0
+        for lo, hi in spans:
+            counts.update(set(terms.span(lo, hi)))
+            num_chunks += 1
+        
+        chunk_frequencies = array('I', bytes(4 * terms.num_terms))
+        for term, count in counts.items():
+            chunk_frequencies[term] = count
+        return cls(chunk_frequencies, num_chunks)
@@ -2,27 +2,41 @@
 SignalCore Flask API Server
 
 This module provides HTTP endpoints for the SignalCore demo UI.
-It exposes two endpoints:
+It exposes the following endpoints:
 - /api/test-naive: Tests LLM with full unprocessed document
 - /api/test-optimized: Tests LLM with SignalCore optimized document
+- /api/test-optimized/stream: Same, streaming the answer as Server-Sent Events
+- /api/compare: Runs both tests on one upload, querying the LLM concurrently
+- /api/documents: Stores a document server-side for the endpoints above
+- /api/optimize-batch: Optimizes many documents at once (no LLM call)
+- /api/corpus/documents: Ingests documents into the corpus index
+- /api/corpus/query: Answers a question from the top chunks of the corpus
+- /api/startup: Reports how long this server process took to start
+
+Shared state and configuration live in services.py.
 """
 
+import time
+
+_import_started = time.perf_counter()
+
+import json
 import os
 import sys
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from dotenv import load_dotenv
 
-# Add project root to Python path
-project_root = Path(__file__).parent.parent
-sys.path.insert(0, str(project_root))
-
-# Load environment variables from .env file
-load_dotenv(project_root / '.env')
+if __name__ == '__main__':
+    # Run as a script: make the backend package importable
+    sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-from backend.pipeline import SignalCorePipeline
-from backend.llm_client import LLMClient
+from backend.documents import DocumentTooLarge, read_text
+from backend.services import (count_tokens, document_store, get_corpus_index, get_llm_client, get_pipeline,
+                              max_document_bytes, optimized_result, request_document, sse_event, startup_report,
+                              startup_times)
 
 
 
@@ -30,31 +44,16 @@ from backend.llm_client import LLMClient
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend communication
 
-# Initialize SignalCore components
-pipeline = SignalCorePipeline()
+# The pipeline and LLM client (see services.py) are built on first use
 
-# Load API key from environment and initialize LLM client
-api_key = os.getenv("GEMINI_API_KEY")
-if not api_key:
-    raise ValueError("GEMINI_API_KEY not found in environment variables")
+# LLM calls are network-bound, so a small thread pool lets /api/compare
+# wait on both answers at once
+llm_pool = ThreadPoolExecutor(max_workers=int(os.getenv("SIGNALCORE_LLM_WORKERS", "8")))
 
-llm_client = LLMClient(api_key=api_key)
-
-
-def count_tokens(text: str) -> int:
-    """
-    Approximate token count using word-based estimation.
-    
-    Rule of thumb: 1 token ≈ 0.75 words
-    
-    Args:
-        text: The text to count tokens for
-        
-    Returns:
-        Estimated token count
-    """
-    words = len(text.split())
-    return int(words / 0.75)
+# Worker processes of the pipeline's batch pool (/api/optimize-batch), one
+# pool shared by all requests; bounded, since it is forked from this
+# multi-threaded server
+batch_workers = int(os.getenv("SIGNALCORE_BATCH_WORKERS") or min(4, os.cpu_count() or 1))
 
 
 @app.route('/api/test-naive', methods=['POST'])
@@ -63,19 +62,24 @@ def test_naive():
     Test Naive RAG approach with full unprocessed document.
     
     Request JSON:
-        - document: The full document text
+        - document: The full document text (or document_id)
+        - document_id: ID of a document uploaded to /api/documents
         - query: The question to ask the LLM
     
     Response JSON:
         - response: LLM's answer
+        - llm_cached: Whether the answer came from the LLM response cache
         - tokens: Token count of the full document
     """
     try:
         # Parse request JSON
         data = request.json
-        document = data.get('document', '')
+        document = request_document(data)
         query = data.get('query', '')
         
+        if document is None:
+            return jsonify({"error": "Unknown or expired document_id"}), 404
+        
         # Validate inputs
         if not document or not query:
             return jsonify({"error": "Missing required fields"}), 400
@@ -84,11 +88,12 @@ def test_naive():
         tokens = count_tokens(document)
         
         # Query LLM with full document
-        response = llm_client.query(document, query)
+        response, llm_cached = get_llm_client().query_cached(document, query)
         
         # Return response with token count
         return jsonify({
             "response": response,
+            "llm_cached": llm_cached,
             "tokens": tokens
         })
     
@@ -102,42 +107,346 @@ def test_optimized():
     Test Optimized RAG approach with SignalCore processed document.
     
     Request JSON:
-        - document: The full document text
+        - document: The full document text (or document_id)
+        - document_id: ID of a document uploaded to /api/documents
         - query: The question to ask the LLM
     
     Response JSON:
         - response: LLM's answer
+        - llm_cached: Whether the answer came from the LLM response cache
         - original_tokens: Token count of original document
         - optimized_tokens: Token count of optimized document
         - reduction_percentage: Percentage reduction in tokens
+        - cache_hits / cache_misses: Pipeline result cache totals
+        - boilerplate_removed: Sentences dropped as cross-document boilerplate
     """
     try:
         # Parse request JSON
         data = request.json
-        document = data.get('document', '')
+        document = request_document(data)
         query = data.get('query', '')
         
+        if document is None:
+            return jsonify({"error": "Unknown or expired document_id"}), 404
+        
         # Validate inputs
         if not document or not query:
             return jsonify({"error": "Missing required fields"}), 400
         
-        # Process document through SignalCore pipeline
-        optimized_context, metrics = pipeline.process(document)
+        # Process document through SignalCore pipeline, ranking sentences
+        # by relevance to the question as well as uniqueness
+        optimized_context, metrics = get_pipeline().process(document, query)
         
         # Query LLM with optimized context
-        response = llm_client.query(optimized_context, query)
+        response, llm_cached = get_llm_client().query_cached(optimized_context, query)
         
         # Return response with metrics
+        return jsonify(optimized_result(response, metrics, llm_cached))
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/test-optimized/stream', methods=['POST'])
+def test_optimized_stream():
+    """
+    Test Optimized RAG approach, streaming the answer as it is generated.
+    
+    The pipeline finishes long before the model does, so the metrics are
+    sent first and the answer follows piece by piece.
+    
+    Request JSON:
+        - document: The full document text (or document_id)
+        - document_id: ID of a document uploaded to /api/documents
+        - query: The question to ask the LLM
+    
+    Response (text/event-stream):
+        - metrics: Result fields of /api/test-optimized, without response
+        - token: {"text": ...} for each piece of the answer, in order (a
+          cached answer arrives as a single piece)
+        - done: {} once the answer is complete
+        - error: {"error": ...} if the request fails while streaming
+    """
+    try:
+        # Parse request JSON
+        data = request.json
+        document = request_document(data)
+        query = data.get('query', '')
+        
+        if document is None:
+            return jsonify({"error": "Unknown or expired document_id"}), 404
+        
+        # Validate inputs
+        if not document or not query:
+            return jsonify({"error": "Missing required fields"}), 400
+        
+        # Process, and build the LLM client, before the stream starts, so
+        # pipeline and configuration errors still get a regular error
+        # response
+        optimized_context, metrics = get_pipeline().process(document, query)
+        llm_client = get_llm_client()
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    
+    def events():
+        try:
+            texts, llm_cached = llm_client.query_stream_cached(optimized_context, query)
+            result = optimized_result("", metrics, llm_cached)
+            del result["response"]
+            yield sse_event("metrics", result)
+            for text in texts:
+                yield sse_event("token", {"text": text})
+            yield sse_event("done", {})
+        except Exception as e:
+            yield sse_event("error", {"error": str(e)})
+    
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.route('/api/compare', methods=['POST'])
+def compare():
+    """
+    Run the naive and optimized tests on one upload of the document.
+    
+    The naive LLM call starts right away and runs while the pipeline
+    optimizes the document; the optimized call follows on another thread.
+    The request takes about as long as the slower of the two answers
+    instead of their sum.
+    
+    Request JSON:
+        - document: The full document text (or document_id)
+        - document_id: ID of a document uploaded to /api/documents
+        - query: The question to ask the LLM
+    
+    Response JSON:
+        - naive: Result as returned by /api/test-naive
+        - optimized: Result as returned by /api/test-optimized
+    """
+    try:
+        # Parse request JSON
+        data = request.json
+        document = request_document(data)
+        query = data.get('query', '')
+        
+        if document is None:
+            return jsonify({"error": "Unknown or expired document_id"}), 404
+        
+        # Validate inputs
+        if not document or not query:
+            return jsonify({"error": "Missing required fields"}), 400
+        
+        # Query LLM with the full document in the background
+        naive_future = llm_pool.submit(get_llm_client().query_cached, document, query)
+        
+        # Meanwhile, process the document and query with the optimized context
+        optimized_context, metrics = get_pipeline().process(document, query)
+        optimized_future = llm_pool.submit(get_llm_client().query_cached, optimized_context, query)
+        
+        naive_response, naive_cached = naive_future.result()
+        optimized_response, optimized_cached = optimized_future.result()
+        return jsonify({
+            "naive": {
+                "response": naive_response,
+                "llm_cached": naive_cached,
+                "tokens": count_tokens(document)
+            },
+            "optimized": optimized_result(optimized_response, metrics, optimized_cached)
+        })
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/documents', methods=['POST'])
+def upload_document():
+    """
+    Store a document server-side so questions can refer to it by ID.
+    
+    The body is read from the request stream as it arrives and may be
+    gzip-compressed (Content-Encoding: gzip). It is either the raw document
+    text or, with Content-Type application/json, an object with a document
+    field.
+    
+    Response JSON:
+        - document_id: Content-hash ID to pass as document_id
+        - tokens: Token count of the document
+    """
+    try:
+        gzipped = request.headers.get('Content-Encoding', '').lower() == 'gzip'
+        try:
+            charset = request.mimetype_params.get('charset', 'utf-8')
+            document = read_text(request.stream, gzipped, max_document_bytes, charset)
+        except DocumentTooLarge as e:
+            return jsonify({"error": str(e)}), 413
+        except (ValueError, LookupError, zlib.error):
+            return jsonify({"error": "Invalid document body"}), 400
+        
+        if request.mimetype == 'application/json':
+            try:
+                document = json.loads(document).get('document', '')
+            except (ValueError, AttributeError):
+                return jsonify({"error": "Invalid document body"}), 400
+        
+        # Validate inputs
+        if not document or not isinstance(document, str):
+            return jsonify({"error": "Missing required fields"}), 400
+        
+        result = {
+            "document_id": document_store.add(document),
+            "tokens": count_tokens(document)
+        }
+        
+        return jsonify(result)
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/optimize-batch', methods=['POST'])
+def optimize_batch():
+    """
+    Optimize many documents with the SignalCore pipeline in one request.
+    
+    Documents are spread across a pool of batch_workers worker processes,
+    started on the first batch and reused; results come back in input order.
+    
+    Request JSON:
+        - documents: List of document texts
+    
+    Response JSON:
+        - results: One entry per document, in input order, with
+          optimized_context, original_tokens, optimized_tokens and
+          reduction_percentage
+    """
+    try:
+        # Parse request JSON
+        data = request.json
+        documents = data.get('documents')
+        
+        # Validate inputs
+        if not documents or not isinstance(documents, list) or not all(isinstance(d, str) for d in documents):
+            return jsonify({"error": "Missing required fields"}), 400
+        
+        # Process all documents through the SignalCore pipeline
+        results = [
+            {"optimized_context": optimized_context, **metrics}
+            for optimized_context, metrics in get_pipeline().process_many(documents, workers=batch_workers)
+        ]
+        
+        return jsonify({"results": results})
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/corpus/documents', methods=['POST'])
+def corpus_documents():
+    """
+    Ingest documents into the corpus index (chunked and indexed once).
+    
+    Request JSON:
+        - documents: List of document texts
+    
+    Response JSON:
+        - document_ids: Content-hash ID of each document, in input order
+        - corpus_documents: Documents in the corpus
+        - corpus_chunks: Chunks in the corpus
+    """
+    try:
+        corpus_index = get_corpus_index()
+        if corpus_index is None:
+            return jsonify({"error": "Corpus mode is not enabled (set SIGNALCORE_CORPUS_PATH)"}), 400
+        
+        # Parse request JSON
+        data = request.json
+        documents = data.get('documents')
+        
+        # Validate inputs
+        if not documents or not isinstance(documents, list) or not all(isinstance(d, str) for d in documents):
+            return jsonify({"error": "Missing required fields"}), 400
+        
+        document_ids = corpus_index.add_documents(documents)
+        
+        return jsonify({
+            "document_ids": document_ids,
+            "corpus_documents": corpus_index.documents,
+            "corpus_chunks": len(corpus_index)
+        })
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/corpus/query', methods=['POST'])
+def corpus_query():
+    """
+    Answer a question from the corpus: retrieve the top chunks, prune them,
+    and query the LLM with the result.
+    
+    Request JSON:
+        - query: The question to ask the LLM
+        - top_k: Optional number of chunks to retrieve (default 8)
+    
+    Response JSON:
+        - response: LLM's answer
+        - llm_cached: Whether the answer came from the LLM response cache
+        - original_tokens: Token count of the retrieved chunks
+        - optimized_tokens: Token count after pruning
+        - reduction_percentage: Percentage of tokens saved
+        - retrieved_chunks / corpus_chunks: Chunks used / in the corpus
+    """
+    try:
+        corpus_index = get_corpus_index()
+        if corpus_index is None:
+            return jsonify({"error": "Corpus mode is not enabled (set SIGNALCORE_CORPUS_PATH)"}), 400
+        
+        # Parse request JSON
+        data = request.json
+        query = data.get('query', '')
+        top_k = data.get('top_k', 8)
+        
+        # Validate inputs
+        if not query or not isinstance(top_k, int) or top_k <= 0:
+            return jsonify({"error": "Missing required fields"}), 400
+        
+        # Retrieve and prune only the best matching chunks
+        optimized_context, metrics = get_pipeline().process_corpus(corpus_index, query, top_k)
+        
+        # Query LLM with optimized context
+        response, llm_cached = get_llm_client().query_cached(optimized_context, query)
+        
         return jsonify({
             "response": response,
+            "llm_cached": llm_cached,
             "original_tokens": metrics["original_tokens"],
             "optimized_tokens": metrics["optimized_tokens"],
-            "reduction_percentage": metrics["reduction_percentage"]
+            "reduction_percentage": metrics["reduction_percentage"],
+            "retrieved_chunks": metrics["retrieved_chunks"],
+            "corpus_chunks": metrics["corpus_chunks"]
         })
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/api/startup', methods=['GET'])
+def startup():
+    """
+    Report this process's startup timings.
+    
+    Response JSON:
+        - pid: Server process ID
+        - preloaded: Whether the pipeline was built before the fork
+        - *_seconds: Time taken by each startup step so far (imports,
+          building the pipeline and the LLM client, preloading)
+    """
+    return jsonify(startup_report())
+
+
+startup_times['app_import_seconds'] = time.perf_counter() - _import_started
+
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
@@ -0,0 +1,496 @@
+"""
+SignalCore ASGI Server - async serving mode
+
+The Flask server (app.py) runs the pipeline inside the request handler, so
+a large document holds a worker thread for the whole chunk + prune pass and
+for every LLM round trip. This module serves the same question endpoints
+from one asyncio event loop instead:
+
+- Pipeline work runs on a process pool whose workers are started, each
+  with its own copy of the pipeline, before the first request arrives.
+  Cache hits are answered in the event loop and never reach the pool.
+- LLM calls use the client's async API, so waiting on the model ties up
+  no thread.
+- Admission is bounded. Beyond max_requests requests in flight, or
+  max_pipeline_queue documents waiting for the pool, a request is refused
+  at once with 429 and a Retry-After header instead of queueing without
+  limit, which keeps latency of the admitted requests flat.
+
+Configuration and shared state (pipeline, LLM client, document store) come
+from backend.services; Flask is not imported. Serve with any ASGI server,
+in a single server process (the pipeline pool provides the parallelism):
+
+    uvicorn backend.asgi:app --port 5000    (or: python -m backend.asgi)
+"""
+
+import time
+
+_import_started = time.perf_counter()
+
+import asyncio
+import json
+import os
+from typing import TYPE_CHECKING, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Tuple
+from backend.documents import DocumentStore, DocumentTooLarge, decode_blocks
+from backend.services import (count_tokens, document_store, get_llm_client, get_pipeline, max_document_bytes,
+                              optimized_result, request_document, sse_event, startup_report, startup_times)
+
+if TYPE_CHECKING:
+    from backend.llm_client import LLMClient
+    from backend.pipeline import SignalCorePipeline
+
+
+# ASGI callables
+Receive = Callable[[], Awaitable[dict]]
+Send = Callable[[dict], Awaitable[None]]
+
+
+class ServerBusy(Exception):
+    """The server is at capacity; the request is answered with 429."""
+
+
+class AsyncServer:
+    """
+    ASGI application serving the question endpoints with bounded queues.
+    """
+    
+    def __init__(self, pipeline: 'SignalCorePipeline', llm: 'LLMClient', documents: DocumentStore,
+                 workers: int = None, max_requests: int = 512, max_pipeline_queue: int = None,
+                 llm_concurrency: int = 64, retry_after: int = 1):
+        """
+        Args:
+            pipeline: Pipeline whose configuration the pool workers copy;
+                its result cache is used in the server process (the shared
+                one from backend.services, built on startup, if None)
+            llm: LLM client (the shared one, built on startup, if None)
+            documents: Store of uploaded documents
+            workers: Pipeline worker processes (defaults to the number of CPUs)
+            max_requests: Requests in flight before new ones get 429
+            max_pipeline_queue: Documents queued or running on the pool
+                before new ones get 429 (defaults to 16 per worker)
+            llm_concurrency: LLM calls in progress at once; further calls
+                wait their turn (bounded by max_requests)
+            retry_after: Seconds suggested to refused clients
+        """
+        self.pipeline = pipeline
+        self.llm = llm
+        self.documents = documents
+        self.workers = workers or os.cpu_count() or 1
+        self.max_requests = max_requests
+        self.max_pipeline_queue = max_pipeline_queue or self.workers * 16
+        self.llm_concurrency = llm_concurrency
+        self.retry_after = retry_after
+        self.pool = None
+        self._llm_slots: asyncio.Semaphore = None
+        self._requests = 0
+        self._pipeline_queue = 0
+        self._routes = {
+            '/api/test-naive': ('POST', self.test_naive),
+            '/api/test-optimized': ('POST', self.test_optimized),
+            '/api/test-optimized/stream': ('POST', self.test_optimized_stream),
+            '/api/compare': ('POST', self.compare),
+            '/api/documents': ('POST', self.upload_document),
+            '/api/startup': ('GET', self.startup),
+        }
+    
+    async def __call__(self, scope: dict, receive: Receive, send: Send) -> None:
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+        
+        # CORS preflight, as flask_cors answers it for the Flask server
+        if scope['method'] == 'OPTIONS':
+            await send({'type': 'http.response.start', 'status': 204, 'headers': _headers(None, [
+                (b'access-control-allow-methods', b'GET, POST, OPTIONS'),
+                (b'access-control-allow-headers', b'*'),
+            ])})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        
+        method, handler = self._routes.get(scope['path'], (None, None))
+        if handler is None:
+            await _send_json(send, 404, {"error": "Not found"})
+            return
+        if scope['method'] != method:
+            await _send_json(send, 405, {"error": "Method not allowed"})
+            return
+        
+        if self._requests >= self.max_requests:
+            await self._send_busy(send)
+            return
+        
+        # A response already started (a stream) cannot take an error
+        # response any more; it can only be closed
+        started = False
+        
+        async def tracked_send(message: dict) -> None:
+            nonlocal started
+            if message['type'] == 'http.response.start':
+                started = True
+            await send(message)
+        
+        self._requests += 1
+        try:
+            await handler(scope, receive, tracked_send)
+        except ConnectionError:
+            # The client went away; there is no one to answer
+            pass
+        except Exception as e:
+            if started:
+                await send({'type': 'http.response.body', 'body': b''})
+            elif isinstance(e, ServerBusy):
+                await self._send_busy(send)
+            elif isinstance(e, DocumentTooLarge):
+                await _send_json(send, 413, {"error": str(e)})
+            else:
+                await _send_json(send, 500, {"error": str(e)})
+        finally:
+            self._requests -= 1
+    
+    async def start(self) -> None:
+        """Build the shared state and start the pipeline pool (called on ASGI startup)."""
+        loop = asyncio.get_running_loop()
+        self._llm_slots = asyncio.Semaphore(self.llm_concurrency)
+        if self.pipeline is None:
+            self.pipeline = await loop.run_in_executor(None, get_pipeline)
+        if self.llm is None:
+            self.llm = await loop.run_in_executor(None, get_llm_client)
+        
+        started = time.perf_counter()
+        self.pool = await loop.run_in_executor(None, self.pipeline.process_pool, self.workers)
+        startup_times['pipeline_pool_seconds'] = time.perf_counter() - started
+    
+    async def stop(self) -> None:
+        """Shut the pipeline pool down (called on ASGI shutdown)."""
+        if self.pool is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.pool.shutdown)
+            self.pool = None
+    
+    async def test_naive(self, scope: dict, receive: Receive, send: Send) -> None:
+        """Query the LLM with the full document, as /api/test-naive in app.py."""
+        document, query = await self._question(receive, send)
+        if document is None:
+            return
+        
+        # Counting a whole document is CPU work, so it leaves the event loop
+        tokens = asyncio.get_running_loop().run_in_executor(None, count_tokens, document)
+        response, llm_cached = await self._ask(document, query)
+        await _send_json(send, 200, {"response": response, "llm_cached": llm_cached, "tokens": await tokens})
+    
+    async def test_optimized(self, scope: dict, receive: Receive, send: Send) -> None:
+        """Query the LLM with the optimized document, as /api/test-optimized in app.py."""
+        document, query = await self._question(receive, send)
+        if document is None:
+            return
+        
+        optimized_context, metrics = await self._optimize(document, query)
+        response, llm_cached = await self._ask(optimized_context, query)
+        await _send_json(send, 200, optimized_result(response, metrics, llm_cached))
+    
+    async def test_optimized_stream(self, scope: dict, receive: Receive, send: Send) -> None:
+        """Stream the optimized answer as Server-Sent Events, as in app.py."""
+        document, query = await self._question(receive, send)
+        if document is None:
+            return
+        
+        optimized_context, metrics = await self._optimize(document, query)
+        await send({'type': 'http.response.start', 'status': 200, 'headers': _headers(b'text/event-stream', [
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ])})
+        
+        async def event(name: str, data: dict) -> None:
+            await send({'type': 'http.response.body', 'body': sse_event(name, data).encode('utf-8'),
+                        'more_body': True})
+        
+        try:
+            texts, llm_cached = self.llm.query_stream_cached_async(optimized_context, query)
+            result = optimized_result("", metrics, llm_cached)
+            del result["response"]
+            await event("metrics", result)
+            
+            # The model's pieces are buffered, so a slow client does not
+            # hold an LLM slot after the model has finished
+            pieces = asyncio.Queue()
+            reader = asyncio.ensure_future(self._read_stream(texts, pieces))
+            try:
+                while True:
+                    text = await pieces.get()
+                    if text is None:
+                        break
+                    await event("token", {"text": text})
+                await reader
+            finally:
+                reader.cancel()
+            await event("done", {})
+        except Exception as e:
+            await event("error", {"error": str(e)})
+        await send({'type': 'http.response.body', 'body': b''})
+    
+    async def compare(self, scope: dict, receive: Receive, send: Send) -> None:
+        """Run both tests on one upload, as /api/compare in app.py."""
+        document, query = await self._question(receive, send)
+        if document is None:
+            return
+        
+        # The naive answer is awaited while the document is optimized
+        naive = asyncio.ensure_future(self._ask(document, query))
+        try:
+            optimized_context, metrics = await self._optimize(document, query)
+            optimized_response, optimized_cached = await self._ask(optimized_context, query)
+            naive_response, naive_cached = await naive
+        finally:
+            naive.cancel()
+        
+        await _send_json(send, 200, {
+            "naive": {"response": naive_response, "llm_cached": naive_cached,
+                      "tokens": metrics["original_tokens"]},
+            "optimized": optimized_result(optimized_response, metrics, optimized_cached)
+        })
+    
+    async def startup(self, scope: dict, receive: Receive, send: Send) -> None:
+        """Report this process's startup timings, as /api/startup in app.py."""
+        await _send_json(send, 200, startup_report())
+    
+    async def upload_document(self, scope: dict, receive: Receive, send: Send) -> None:
+        """Store a document server-side, as /api/documents in app.py."""
+        headers = dict(scope['headers'])
+        gzipped = headers.get(b'content-encoding', b'').lower() == b'gzip'
+        mimetype, charset = _content_type(headers.get(b'content-type', b'').decode('latin-1'))
+        
+        # Decompressing and parsing a large body is CPU work, so it leaves
+        # the event loop
+        loop = asyncio.get_running_loop()
+        blocks = await _read_body(receive, max_document_bytes)
+        try:
+            document = await loop.run_in_executor(None, decode_blocks, blocks, gzipped, max_document_bytes, charset)
+        except DocumentTooLarge:
+            raise
+        except (ValueError, LookupError):
+            await _send_json(send, 400, {"error": "Invalid document body"})
+            return
+        
+        if mimetype == 'application/json':
+            try:
+                document = (await loop.run_in_executor(None, json.loads, document)).get('document', '')
+            except (ValueError, AttributeError):
+                await _send_json(send, 400, {"error": "Invalid document body"})
+                return
+        
+        # Validate inputs
+        if not document or not isinstance(document, str):
+            await _send_json(send, 400, {"error": "Missing required fields"})
+            return
+        
+        result = {
+            "document_id": self.documents.add(document),
+            "tokens": await loop.run_in_executor(None, count_tokens, document)
+        }
+        
+        await _send_json(send, 200, result)
+    
+    async def _question(self, receive: Receive, send: Send) -> Tuple[str, str]:
+        """
+        Read and validate a question request, answering it if it is invalid.
+        
+        Args:
+            receive: ASGI receive callable
+            send: ASGI send callable
+        
+        Returns:
+            (document, query), or (None, None) if an error was sent
+        """
+        body = b''.join(await _read_body(receive, max_document_bytes))
+        try:
+            data = await asyncio.get_running_loop().run_in_executor(None, json.loads, body)
+        except ValueError:
+            await _send_json(send, 400, {"error": "Invalid JSON body"})
+            return None, None
+        
+        document = request_document(data)
+        query = data.get('query', '')
+        
+        if document is None:
+            await _send_json(send, 404, {"error": "Unknown or expired document_id"})
+            return None, None
+        
+        # Validate inputs
+        if not document or not query:
+            await _send_json(send, 400, {"error": "Missing required fields"})
+            return None, None
+        
+        return document, query
+    
+    async def _optimize(self, document: str, query: str = None) -> Tuple[str, Dict[str, float]]:
+        """
+        Run the pipeline on the pool, refusing work beyond the queue bound.
+        
+        Args:
+            document: Full document text
+            query: Optional user question
+        
+        Returns:
+            (optimized_context, metrics)
+        """
+        if self._pipeline_queue >= self.max_pipeline_queue:
+            raise ServerBusy()
+        
+        self._pipeline_queue += 1
+        try:
+            return await asyncio.wrap_future(self.pipeline.submit_process(self.pool, document, query))
+        finally:
+            self._pipeline_queue -= 1
+    
+    async def _ask(self, context: str, query: str) -> Tuple[str, bool]:
+        """
+        Query the LLM, at most llm_concurrency calls at a time.
+        
+        Args:
+            context: Document context
+            query: The user's question
+        
+        Returns:
+            (the LLM's answer, whether it came from the response cache or
+            an identical request in flight)
+        """
+        async with self._llm_slots:
+            return await self.llm.query_cached_async(context, query)
+    
+    async def _read_stream(self, texts: AsyncIterator[str], pieces: asyncio.Queue) -> None:
+        """
+        Read a streamed answer into a queue, holding an LLM slot only meanwhile.
+        
+        Args:
+            texts: The answer's pieces, from query_stream_cached_async()
+            pieces: Queue that receives each piece, then None once the
+                stream ends (or fails; the failure is raised here)
+        """
+        try:
+            async with self._llm_slots:
+                async for text in texts:
+                    pieces.put_nowait(text)
+        finally:
+            pieces.put_nowait(None)
+    
+    async def _send_busy(self, send: Send) -> None:
+        """Refuse a request because the server is saturated."""
+        await _send_json(send, 429, {"error": "Server busy, try again later"},
+                         [(b'retry-after', str(self.retry_after).encode('ascii'))])
+    
+    async def _lifespan(self, receive: Receive, send: Send) -> None:
+        """Handle ASGI lifespan events: start the pool, and stop it."""
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await self.start()
+                except Exception as e:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.stop()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+async def _read_body(receive: Receive, max_bytes: int) -> List[bytes]:
+    """
+    Receive a request body as the blocks it arrives in.
+    
+    Args:
+        receive: ASGI receive callable
+        max_bytes: Largest body accepted
+    
+    Returns:
+        Body blocks, in order
+    """
+    blocks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            raise ConnectionError("Client disconnected")
+        
+        block = message.get('body', b'')
+        size += len(block)
+        if size > max_bytes:
+            raise DocumentTooLarge(f"Document exceeds {max_bytes} bytes")
+        if block:
+            blocks.append(block)
+        if not message.get('more_body', False):
+            return blocks
+
+
+async def _send_json(send: Send, status: int, data: dict, headers: Iterable[Tuple[bytes, bytes]] = ()) -> None:
+    """
+    Send a complete JSON response.
+    
+    Args:
+        send: ASGI send callable
+        status: HTTP status code
+        data: JSON-serializable body
+        headers: Extra response headers
+    """
+    body = json.dumps(data).encode('utf-8')
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': _headers(b'application/json', [(b'content-length', str(len(body)).encode('ascii')),
+                                                          *headers])})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def _headers(content_type: bytes, extra: Iterable[Tuple[bytes, bytes]] = ()) -> List[Tuple[bytes, bytes]]:
+    """
+    Response headers: content type, CORS and any extras.
+    
+    Args:
+        content_type: Content-Type value, or None for no body
+        extra: Additional (name, value) pairs
+    
+    Returns:
+        ASGI header list
+    """
+    headers = [(b'access-control-allow-origin', b'*')]
+    if content_type is not None:
+        headers.append((b'content-type', content_type))
+    headers.extend(extra)
+    return headers
+
+
+def _content_type(value: str) -> Tuple[str, str]:
+    """
+    Split a Content-Type header into its media type and charset.
+    
+    Args:
+        value: Header value, e.g. 'text/plain; charset=utf-8'
+    
+    Returns:
+        (lowercase media type, charset defaulting to utf-8)
+    """
+    mimetype, _, params = value.partition(';')
+    charset = 'utf-8'
+    for param in params.split(';'):
+        name, _, param_value = param.strip().partition('=')
+        if name.lower() == 'charset' and param_value:
+            charset = param_value.strip('"')
+    return mimetype.strip().lower(), charset
+
+
+app = AsyncServer(
+    None,
+    None,
+    document_store,
+    workers=int(os.getenv("SIGNALCORE_PIPELINE_WORKERS", "0")) or None,
+    max_requests=int(os.getenv("SIGNALCORE_MAX_REQUESTS", "512")),
+    max_pipeline_queue=int(os.getenv("SIGNALCORE_PIPELINE_QUEUE", "0")) or None,
+    llm_concurrency=int(os.getenv("SIGNALCORE_LLM_CONCURRENCY", "64"))
+)
+
+startup_times['asgi_import_seconds'] = time.perf_counter() - _import_started
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, port=5000)
@@ -0,0 +1,524 @@
+"""
+Needle-in-a-Haystack Benchmark for SignalCore
+
+Measures, fully offline, how reliably and how fast the pipeline keeps a
+needle across a sweep of settings. Each point of the sweep combines a
+needle depth, a document size in words, chunk sizes and an extraction
+ratio: a document of that size is built from the haystack, the needle is
+injected at that depth, and the pipeline optimizes it (with the question,
+as the API servers do) once to warm up and then `repeats` more times.
+
+For every point the benchmark records:
+
+- needle recall: whether the needle survived pruning, and whether the
+  offline local LLM backend answers the question from the optimized context
+- compression: original / optimized tokens and the reduction percentage
+- throughput: MB/s and sentences/s at the median latency
+- latency: min, mean, p50, p90 and p99 over the repeats, in milliseconds
+
+Points run on a pool of worker processes, each of which loads the haystack
+once. Workers share the CPU, so compare latency figures only between runs
+with the same number of workers (1 gives the cleanest numbers).
+
+The report is written as JSON (settings, environment, summary and every
+point) and as CSV (one row per point). Compared with a saved baseline
+report, any drop in recall, a drop in compression beyond a small tolerance,
+or lower throughput / higher median latency beyond a wider one is listed as
+a regression.
+
+Usage, from the project root:
+    python -m backend.benchmark --output benchmark_results
+    python -m backend.benchmark --baseline benchmark_results/baseline.json
+"""
+
+import argparse
+import csv
+import json
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+from backend.algorithms.sentences import split_sentences
+from backend.llm_backends import LocalBackend
+from backend.llm_client import LLMClient
+from backend.pipeline import SignalCorePipeline
+from backend.utils import inject_needle
+
+
+project_root = Path(__file__).parent.parent
+HAYSTACK_PATH = project_root / 'test_data' / 'haystack.txt'
+
+NEEDLE = "The secret code is FJORD2024."
+QUERY = "What is the secret code?"
+ANSWER = "FJORD2024"
+
+# Default sweep
+DEPTHS = (0, 10, 25, 50, 75, 90, 100)
+SIZES = (2500, 10000, 40000)  # words
+CHUNK_SIZES = ((100, 500), (200, 1000), (400, 2000))  # (min, max) words
+EXTRACTION_RATIOS = (0.1, 0.3)
+
+# Fields that identify a point, e.g. when matching it with a baseline
+POINT_KEYS = ('depth', 'words', 'min_chunk_size', 'max_chunk_size', 'extraction_ratio')
+
+# Metrics compared with a baseline: +1 if higher is better, -1 if lower is
+RECALL_METRICS = {'needle_kept': 1, 'answer_found': 1}
+COMPRESSION_METRICS = {'compression_ratio': 1}
+TIMING_METRICS = {'mb_per_second': 1, 'sentences_per_second': 1, 'latency_p50_ms': -1}
+
+# Regressions listed on the console; comparison.json has all of them
+MAX_PRINTED_REGRESSIONS = 20
+
+
+class NeedleBenchmark:
+    """
+    Runs needle-in-a-haystack points through the pipeline and measures them.
+    """
+    
+    def __init__(self, haystack: str, needle: str = NEEDLE, query: str = QUERY, answer: str = ANSWER,
+                 repeats: int = 5, tokenizer: str = 'heuristic', query_aware: bool = True,
+                 scorer: str = 'counter'):
+        """
+        Args:
+            haystack: Text documents are built from (repeated as needed)
+            needle: Sentence injected into every document
+            query: Question asked about the needle
+            answer: Text a correct answer contains
+            repeats: Timed pipeline runs per point, after one warm-up run
+            tokenizer: Tokenizer for the token metrics (see SignalCorePipeline)
+            query_aware: Pass the question to the pipeline; if False, the
+                needle must survive query-independent pruning
+            scorer: Sentence scoring backend (see SignalCorePipeline)
+        """
+        self.haystack = haystack
+        self.needle = needle
+        self.query = query
+        self.answer = answer
+        self.repeats = max(1, repeats)
+        self.tokenizer = tokenizer
+        self.query_aware = query_aware
+        self.scorer = scorer
+        self.client = LLMClient(backend=LocalBackend())
+        self._index = split_sentences(haystack)
+    
+    @staticmethod
+    def points(depths: Iterable[int] = DEPTHS, sizes: Iterable[int] = SIZES,
+               chunk_sizes: Iterable[Tuple[int, int]] = CHUNK_SIZES,
+               extraction_ratios: Iterable[float] = EXTRACTION_RATIOS) -> List[Dict[str, Any]]:
+        """
+        Every combination of the swept settings.
+        
+        Args:
+            depths: Needle depths, in percent of the document
+            sizes: Document sizes, in words
+            chunk_sizes: (min_chunk_size, max_chunk_size) pairs, in words
+            extraction_ratios: Fractions of each chunk's sentences to keep
+        
+        Returns:
+            One dict of settings (the POINT_KEYS) per point
+        """
+        return [{"depth": depth, "words": words, "min_chunk_size": lo, "max_chunk_size": hi,
+                 "extraction_ratio": ratio}
+                for words in sizes for lo, hi in chunk_sizes for ratio in extraction_ratios for depth in depths]
+    
+    def document(self, words: int, depth: int) -> str:
+        """
+        Build a document of about the given size with the needle injected.
+        
+        Args:
+            words: Target size; haystack sentences are taken in order,
+                wrapping around, until it is reached
+            depth: Needle depth, in percent of the document
+        
+        Returns:
+            The document text
+        """
+        index = self._index
+        count = len(index)
+        sentences = []
+        total = 0
+        while total < words and count:
+            i = len(sentences) % count
+            sentences.append(i)
+            total += index.word_counts[i]
+        return inject_needle(index.join(sentences), self.needle, depth)
+    
+    def run_point(self, point: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Measure one point.
+        
+        Args:
+            point: Settings from points()
+        
+        Returns:
+            The point's settings plus its recall, compression, throughput
+            and latency metrics
+        """
+        pipeline = SignalCorePipeline(extraction_ratio=point["extraction_ratio"],
+                                      min_chunk_size=point["min_chunk_size"],
+                                      max_chunk_size=point["max_chunk_size"],
+                                      tokenizer=self.tokenizer,
+                                      scorer=self.scorer)
+        document = self.document(point["words"], point["depth"])
+        query = self.query if self.query_aware else None
+        
+        optimized_context, metrics = pipeline.process(document, query)
+        latencies = []
+        for _ in range(self.repeats):
+            started = time.perf_counter()
+            optimized_context, metrics = pipeline.process(document, query)
+            latencies.append(time.perf_counter() - started)
+        
+        needle_kept = self.needle.rstrip('.!?') in optimized_context
+        answer_found = self.answer.lower() in self.client.query(optimized_context, self.query).lower()
+        
+        document_bytes = len(document.encode('utf-8'))
+        sentences = len(split_sentences(document))
+        median = percentile(latencies, 50)
+        
+        return dict(
+            point,
+            document_bytes=document_bytes,
+            sentences=sentences,
+            needle_kept=needle_kept,
+            answer_found=answer_found,
+            original_tokens=metrics["original_tokens"],
+            optimized_tokens=metrics["optimized_tokens"],
+            compression_ratio=metrics["original_tokens"] / max(metrics["optimized_tokens"], 1),
+            reduction_percentage=metrics["reduction_percentage"],
+            mb_per_second=document_bytes / (1024 * 1024) / median if median else 0.0,
+            sentences_per_second=sentences / median if median else 0.0,
+            latency_min_ms=min(latencies) * 1000,
+            latency_mean_ms=sum(latencies) / len(latencies) * 1000,
+            latency_p50_ms=median * 1000,
+            latency_p90_ms=percentile(latencies, 90) * 1000,
+            latency_p99_ms=percentile(latencies, 99) * 1000
+        )
+    
+    def run(self, points: Sequence[Dict[str, Any]], workers: int = None) -> Dict[str, Any]:
+        """
+        Measure every point, on a pool of worker processes.
+        
+        Args:
+            points: Settings from points()
+            workers: Number of worker processes (defaults to the number of
+                CPUs); 1 measures every point in this process
+        
+        Returns:
+            JSON-serializable report with settings, environment, summary
+            and the measured points, in input order
+        """
+        workers = workers or os.cpu_count() or 1
+        started = time.perf_counter()
+        
+        if workers == 1:
+            results = [self.run_point(point) for point in points]
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(self._config(),)) as pool:
+                results = list(pool.map(_run_point, points))
+        
+        return {
+            "settings": {key: value for key, value in self._config().items() if key != "haystack"},
+            "environment": dict(environment(), workers=workers),
+            "seconds": time.perf_counter() - started,
+            "summary": summarize(results),
+            "points": results
+        }
+    
+    def _config(self) -> Dict[str, Any]:
+        """
+        Constructor arguments that reproduce this benchmark.
+        
+        Returns:
+            Keyword arguments for NeedleBenchmark()
+        """
+        return {"haystack": self.haystack, "needle": self.needle, "query": self.query, "answer": self.answer,
+                "repeats": self.repeats, "tokenizer": self.tokenizer, "query_aware": self.query_aware,
+                "scorer": self.scorer}
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """
+    Percentile with linear interpolation between the nearest ranks.
+    
+    Args:
+        values: Samples (at least one)
+        q: Percentile, 0 to 100
+    
+    Returns:
+        The interpolated value
+    """
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lo = int(position)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (position - lo)
+
+
+def summarize(results: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Aggregate measured points.
+    
+    Args:
+        results: Points returned by run_point()
+    
+    Returns:
+        Overall recall, mean compression and throughput, plus recall by the
+        value of each swept setting
+    """
+    if not results:
+        return {"points": 0}
+    
+    count = len(results)
+    # Throughput over all points, at each point's median latency
+    seconds = sum(result["latency_p50_ms"] for result in results) / 1000 or float('inf')
+    summary = {
+        "points": count,
+        "needle_recall": sum(result["needle_kept"] for result in results) / count,
+        "answer_recall": sum(result["answer_found"] for result in results) / count,
+        "mean_compression_ratio": sum(result["compression_ratio"] for result in results) / count,
+        "mean_reduction_percentage": sum(result["reduction_percentage"] for result in results) / count,
+        "mb_per_second": sum(result["document_bytes"] for result in results) / (1024 * 1024) / seconds,
+        "sentences_per_second": sum(result["sentences"] for result in results) / seconds
+    }
+    
+    # Where the needle gets lost: recall at each value of each setting
+    summary["needle_recall_by"] = {}
+    for key in POINT_KEYS:
+        groups: Dict[str, List[bool]] = {}
+        for result in results:
+            groups.setdefault(str(result[key]), []).append(result["needle_kept"])
+        summary["needle_recall_by"][key] = {value: sum(kept) / len(kept) for value, kept in groups.items()}
+    
+    return summary
+
+
+def environment() -> Dict[str, Any]:
+    """
+    Describe the machine and interpreter the benchmark ran on.
+    
+    Returns:
+        JSON-serializable description, with the UTC time of the run
+    """
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "time": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    }
+
+
+def write_reports(report: Dict[str, Any], directory: str) -> Tuple[Path, Path]:
+    """
+    Write a report as benchmark.json and benchmark.csv.
+    
+    Args:
+        report: Report returned by NeedleBenchmark.run()
+        directory: Output directory (created if missing)
+    
+    Returns:
+        Paths of the JSON and CSV files
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    
+    json_path = directory / 'benchmark.json'
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    
+    csv_path = directory / 'benchmark.csv'
+    with open(csv_path, 'w', encoding='utf-8', newline='') as f:
+        points = report["points"]
+        if points:
+            writer = csv.DictWriter(f, fieldnames=list(points[0]))
+            writer.writeheader()
+            writer.writerows(points)
+    
+    return json_path, csv_path
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.02,
+            timing_tolerance: float = 0.25) -> Dict[str, Any]:
+    """
+    Compare a report with a baseline report, point by point.
+    
+    Points are matched by their settings; points missing from either
+    report are not compared. Any drop in recall is a regression. Benchmark
+    settings that differ between the reports (e.g. the tokenizer) are
+    listed, since they change the metrics too.
+    
+    Args:
+        report: Current report
+        baseline: Earlier report to compare against
+        tolerance: Relative drop in compression that is still accepted
+        timing_tolerance: Relative loss in throughput or latency that is
+            still accepted (timings are noisy)
+    
+    Returns:
+        Differing settings, number of compared points and the regressions,
+        each with the point, metric, baseline and current values and the
+        relative change
+    """
+    previous = {tuple(point[key] for key in POINT_KEYS): point for point in baseline["points"]}
+    allowed = [(RECALL_METRICS, 0.0), (COMPRESSION_METRICS, tolerance), (TIMING_METRICS, timing_tolerance)]
+    
+    compared = 0
+    regressions = []
+    for point in report["points"]:
+        old = previous.get(tuple(point[key] for key in POINT_KEYS))
+        if old is None:
+            continue
+        compared += 1
+        
+        for metrics, limit in allowed:
+            for metric, direction in metrics.items():
+                if metric not in old:
+                    continue
+                before = float(old[metric])
+                after = float(point[metric])
+                change = (after - before) / before if before else 0.0
+                if direction * (after - before) >= 0 or (before and abs(change) <= limit):
+                    continue
+                regressions.append({
+                    "point": {key: point[key] for key in POINT_KEYS},
+                    "metric": metric,
+                    "baseline": before,
+                    "current": after,
+                    "change": change
+                })
+    
+    settings = report.get("settings", {})
+    baseline_settings = baseline.get("settings", {})
+    changed_settings = sorted(key for key in set(settings) | set(baseline_settings)
+                              if settings.get(key) != baseline_settings.get(key))
+    
+    return {"changed_settings": changed_settings, "compared_points": compared, "regressions": regressions}
+
+
+# Benchmark of a worker process, built once per worker
+_benchmark: NeedleBenchmark = None
+
+
+def _init_worker(config: Dict[str, Any]) -> None:
+    """
+    Build the worker's benchmark once, before it receives points.
+    
+    Args:
+        config: Keyword arguments for NeedleBenchmark()
+    """
+    global _benchmark
+    _benchmark = NeedleBenchmark(**config)
+
+
+def _run_point(point: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Worker task: measure one point with the worker's benchmark.
+    
+    Args:
+        point: Settings from points()
+    
+    Returns:
+        The measured point
+    """
+    return _benchmark.run_point(point)
+
+
+def _chunk_size(value: str) -> Tuple[int, int]:
+    """
+    Parse a MIN:MAX chunk size argument.
+    
+    Args:
+        value: e.g. "200:1000"
+    
+    Returns:
+        (min_chunk_size, max_chunk_size)
+    """
+    lo, _, hi = value.partition(':')
+    try:
+        return int(lo), int(hi)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected MIN:MAX words, got '{value}'")
+
+
+def main(argv: Sequence[str] = None) -> int:
+    """
+    Command-line entry point: run the sweep, write reports, compare.
+    
+    Args:
+        argv: Arguments (defaults to sys.argv[1:])
+    
+    Returns:
+        Exit status: 1 if the comparison with the baseline found
+        regressions, else 0
+    """
+    parser = argparse.ArgumentParser(description="Offline needle-in-a-haystack benchmark of the SignalCore pipeline")
+    parser.add_argument('--haystack', default=str(HAYSTACK_PATH), help="haystack text file")
+    parser.add_argument('--depths', type=int, nargs='+', default=DEPTHS, help="needle depths in percent")
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help="document sizes in words")
+    parser.add_argument('--chunk-sizes', type=_chunk_size, nargs='+', default=CHUNK_SIZES,
+                        help="chunk sizes as MIN:MAX words")
+    parser.add_argument('--ratios', type=float, nargs='+', default=EXTRACTION_RATIOS, help="extraction ratios")
+    parser.add_argument('--repeats', type=int, default=5, help="timed runs per point")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPUs)")
+    parser.add_argument('--tokenizer', default='heuristic', help="heuristic or a tiktoken rank file")
+    parser.add_argument('--scorer', default='counter', choices=('counter', 'vectorized'),
+                        help="sentence scoring backend")
+    parser.add_argument('--no-query', action='store_true', help="prune without the question")
+    parser.add_argument('--output', default='benchmark_results', help="directory for the reports")
+    parser.add_argument('--baseline', help="baseline report (benchmark.json) to compare against")
+    parser.add_argument('--save-baseline', help="also save this run's report as a baseline here")
+    parser.add_argument('--tolerance', type=float, default=0.02, help="accepted relative compression drop")
+    parser.add_argument('--timing-tolerance', type=float, default=0.25,
+                        help="accepted relative throughput / latency loss")
+    args = parser.parse_args(argv)
+    
+    with open(args.haystack, 'r', encoding='utf-8') as f:
+        haystack = f.read()
+    
+    benchmark = NeedleBenchmark(haystack, repeats=args.repeats, tokenizer=args.tokenizer,
+                                query_aware=not args.no_query, scorer=args.scorer)
+    points = benchmark.points(args.depths, args.sizes, args.chunk_sizes, args.ratios)
+    print(f"Running {len(points)} points...")
+    report = benchmark.run(points, args.workers)
+    
+    json_path, csv_path = write_reports(report, args.output)
+    summary = report["summary"]
+    print(f"Needle recall: {summary['needle_recall']:.1%}  Answer recall: {summary['answer_recall']:.1%}")
+    print(f"Compression: {summary['mean_compression_ratio']:.2f}x ({summary['mean_reduction_percentage']:.1f}%)")
+    print(f"Throughput: {summary['mb_per_second']:.2f} MB/s, {summary['sentences_per_second']:,.0f} sentences/s")
+    print(f"Reports: {json_path}, {csv_path} ({report['seconds']:.1f}s)")
+    
+    if args.save_baseline:
+        Path(args.save_baseline).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved: {args.save_baseline}")
+    
+    if not args.baseline:
+        return 0
+    
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        comparison = compare(report, json.load(f), args.tolerance, args.timing_tolerance)
+    with open(Path(args.output) / 'comparison.json', 'w', encoding='utf-8') as f:
+        json.dump(comparison, f, indent=2)
+    
+    if comparison["changed_settings"]:
+        print(f"Warning: settings differ from the baseline: {', '.join(comparison['changed_settings'])}")
+    regressions = comparison["regressions"]
+    print(f"Compared {comparison['compared_points']} points with {args.baseline}: {len(regressions)} regressions")
+    for regression in regressions[:MAX_PRINTED_REGRESSIONS]:
+        settings = ' '.join(f"{key}={value}" for key, value in regression["point"].items())
+        print(f"  {regression['metric']}: {regression['baseline']:.4g} -> {regression['current']:.4g} "
+              f"({regression['change']:+.1%})  {settings}")
+    if len(regressions) > MAX_PRINTED_REGRESSIONS:
+        print(f"  ... see {Path(args.output) / 'comparison.json'} for all of them")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
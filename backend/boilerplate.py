@@ -0,0 +1,351 @@
+"""
+Cross-Document Boilerplate Index for SignalCore
+
+Inputs often share legal footers, disclaimers and templated intros that
+carry no signal for any particular question. This module remembers, for
+every sentence fingerprint, in how many past documents it appeared, and
+flags sentences that appeared in more than a configured fraction of them.
+
+Counts live in a count-min sketch: a fixed grid of counters that never
+grows, however many documents flow through, and answers each lookup with a
+handful of array reads. Sketch estimates can only overcount, and
+conservative updates keep that error small. Given a path, the sketch is a
+memory-mapped file, so it persists across restarts and worker processes
+update the same counters.
+
+Whether a document was recorded before is not asked of the sketch, whose
+false positives grow as it fills: an exact set of document fingerprints
+(a SQLite table next to the sketch file) answers that. Updates take an
+exclusive lock on the sketch file, so several processes can share one
+index. Where fcntl is not available (Windows), a file-backed index must be
+used by a single process.
+"""
+
+import hashlib
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+from backend.algorithms.sentences import SentenceIndex
+from backend.algorithms.vocabulary import tokenize
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking
+    fcntl = None
+
+
+class CountMinSketch:
+    """
+    Count-min sketch of 32-bit counters, in memory or in a memory-mapped file.
+    """
+    
+    # File layout: magic, document count, depth, width, then the counters
+    HEADER = struct.Struct('<8sQII')
+    MAGIC = b'SCCMS001'
+    
+    def __init__(self, width: int = 1 << 20, depth: int = 4, path: str = None):
+        """
+        Args:
+            width: Counters per row; more columns mean fewer collisions
+            depth: Rows, each hashed independently
+            path: File to map the sketch from, created if missing
+                (in memory if None)
+        """
+        self.path = path
+        size = self.HEADER.size + width * depth * 4
+        
+        if path is None:
+            self._buffer = bytearray(size)
+            self.HEADER.pack_into(self._buffer, 0, self.MAGIC, 0, depth, width)
+        else:
+            if not os.path.exists(path) or os.path.getsize(path) == 0:
+                with open(path, 'wb') as file:
+                    file.write(self.HEADER.pack(self.MAGIC, 0, depth, width))
+                    file.truncate(size)
+            with open(path, 'r+b') as file:
+                self._buffer = mmap.mmap(file.fileno(), 0)
+        
+        magic, _, self.depth, self.width = self.HEADER.unpack_from(self._buffer, 0)
+        if magic != self.MAGIC:
+            raise ValueError(f"{path} is not a count-min sketch file")
+        self._counters = memoryview(self._buffer)[self.HEADER.size:].cast('I')
+    
+    @property
+    def total(self) -> int:
+        """Number of items recorded with increment_total()."""
+        return self.HEADER.unpack_from(self._buffer, 0)[1]
+    
+    def increment_total(self) -> None:
+        """Add one to the item total stored in the header."""
+        self.HEADER.pack_into(self._buffer, 0, self.MAGIC, self.total + 1, self.depth, self.width)
+    
+    def estimate(self, fingerprint: int) -> int:
+        """
+        Upper-bound estimate of a key's count.
+        
+        Args:
+            fingerprint: 64-bit hash of the key
+        
+        Returns:
+            The smallest of the key's counters
+        """
+        counters = self._counters
+        return min([counters[slot] for slot in self._slots(fingerprint)])
+    
+    def add(self, fingerprint: int) -> None:
+        """
+        Count one occurrence of a key, with a conservative update.
+        
+        Only the counters at the key's current minimum are raised, which
+        leaves the estimate correct while overcounting other keys less.
+        
+        Args:
+            fingerprint: 64-bit hash of the key
+        """
+        counters = self._counters
+        slots = self._slots(fingerprint)
+        current = min([counters[slot] for slot in slots])
+        if current == 0xFFFFFFFF:
+            return
+        for slot in slots:
+            if counters[slot] == current:
+                counters[slot] = current + 1
+    
+    def flush(self) -> None:
+        """Write a memory-mapped sketch back to its file."""
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.flush()
+    
+    def close(self) -> None:
+        """Flush and unmap the sketch."""
+        self.flush()
+        self._counters.release()
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+    
+    def _slots(self, fingerprint: int) -> List[int]:
+        """
+        Counter positions of a key, one per row (double hashing).
+        
+        Args:
+            fingerprint: 64-bit hash of the key
+        
+        Returns:
+            Flat counter index in each row
+        """
+        width = self.width
+        low = fingerprint & 0xFFFFFFFF
+        high = (fingerprint >> 32) | 1
+        return [row * width + (low + row * high) % width for row in range(self.depth)]
+    
+    def __getstate__(self) -> Dict[str, Any]:
+        # A mapped sketch travels as its path; an in-memory one as a copy
+        if self.path is not None:
+            return {'path': self.path, 'width': self.width, 'depth': self.depth}
+        return {'path': None, 'buffer': bytes(self._buffer)}
+    
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.path = state['path']
+        if self.path is not None:
+            self.__init__(state['width'], state['depth'], self.path)
+            return
+        self._buffer = bytearray(state['buffer'])
+        _, _, self.depth, self.width = self.HEADER.unpack_from(self._buffer, 0)
+        self._counters = memoryview(self._buffer)[self.HEADER.size:].cast('I')
+
+
+class DocumentSet:
+    """
+    Exact set of document fingerprints, in memory or in a SQLite file.
+    
+    A file-backed set is shared across processes; each thread (and each
+    forked process) opens its own connection.
+    """
+    
+    def __init__(self, path: str = None):
+        """
+        Args:
+            path: SQLite database file, created if missing (in memory if
+                None)
+        """
+        self.path = path
+        self._fingerprints = set() if path is None else None
+        self._local = threading.local()
+        if path is not None:
+            with self._connect() as connection:
+                connection.execute("CREATE TABLE IF NOT EXISTS documents (fingerprint INTEGER PRIMARY KEY)")
+    
+    def add(self, fingerprint: int) -> bool:
+        """
+        Add a fingerprint unless it is present, in one atomic step.
+        
+        Args:
+            fingerprint: 64-bit hash of the document
+        
+        Returns:
+            True if the fingerprint was new
+        """
+        # SQLite integers are signed
+        fingerprint >>= 1
+        if self._fingerprints is not None:
+            if fingerprint in self._fingerprints:
+                return False
+            self._fingerprints.add(fingerprint)
+            return True
+        with self._connect() as connection:
+            cursor = connection.execute("INSERT OR IGNORE INTO documents (fingerprint) VALUES (?)", (fingerprint,))
+            return cursor.rowcount == 1
+    
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Get this thread's connection, opening one if needed.
+        
+        Returns:
+            An open SQLite connection
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+    
+    def __getstate__(self) -> Dict[str, Any]:
+        # A file-backed set travels as its path; an in-memory one as a copy
+        return {'path': self.path, 'fingerprints': self._fingerprints}
+    
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(state['path'])
+        if state['path'] is None:
+            self._fingerprints = set(state['fingerprints'])
+
+
+class BoilerplateIndex:
+    """
+    Document frequency of sentence fingerprints, for dropping boilerplate.
+    """
+    
+    def __init__(self, path: str = None, max_fraction: float = 0.5, min_documents: int = 20,
+                 width: int = 1 << 20, depth: int = 4):
+        """
+        Args:
+            path: Sketch file shared across runs and processes (in memory
+                if None); the recorded documents are kept in path +
+                '.documents'
+            max_fraction: Sentences found in more than this fraction of
+                past documents count as boilerplate
+            min_documents: Documents to see before anything is dropped
+            width: Counters per sketch row
+            depth: Sketch rows
+        """
+        self.max_fraction = max_fraction
+        self.min_documents = min_documents
+        self.sketch = CountMinSketch(width, depth, path)
+        self.seen = DocumentSet(path + '.documents' if path is not None else None)
+        self._lock = threading.Lock()
+        self._lock_file = None
+        self._lock_pid = None
+    
+    @property
+    def documents(self) -> int:
+        """Number of distinct documents recorded."""
+        return self.sketch.total
+    
+    @property
+    def shared(self) -> bool:
+        """Whether updates from several processes are combined (a file-backed, lockable sketch)."""
+        return self.sketch.path is not None and fcntl is not None
+    
+    def update(self, index: SentenceIndex) -> List[int]:
+        """
+        Flag a document's boilerplate, then record the document.
+        
+        Sentences are judged against past documents only. A document that
+        was already recorded (e.g. sent again with another question) is not
+        counted twice.
+        
+        Args:
+            index: Sentence index of the document
+        
+        Returns:
+            Sentence numbers that are not boilerplate, in original order
+        """
+        fingerprints = [_fingerprint(' '.join(tokenize(index.sentence(i)))) for i in range(len(index))]
+        document = _fingerprint('\0document\0' + index.text)
+        sketch = self.sketch
+        
+        with self._exclusive():
+            documents = sketch.total
+            kept = list(range(len(index)))
+            if documents >= self.min_documents:
+                limit = self.max_fraction * documents
+                kept = [i for i in kept if sketch.estimate(fingerprints[i]) <= limit]
+            
+            if self.seen.add(document):
+                for fingerprint in set(fingerprints):
+                    sketch.add(fingerprint)
+                sketch.increment_total()
+        
+        return kept
+    
+    @contextmanager
+    def _exclusive(self) -> Iterator[None]:
+        """
+        Hold the index against other threads and, for a file-backed
+        sketch, other processes.
+        """
+        with self._lock:
+            if self.sketch.path is None or fcntl is None:
+                yield
+                return
+            
+            # flock() locks belong to an open file, which a forked child
+            # would share with its parent, so each process opens its own
+            if self._lock_pid != os.getpid():
+                self._lock_file = open(self.sketch.path, 'rb')
+                self._lock_pid = os.getpid()
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+    
+    def flush(self) -> None:
+        """Write the sketch to disk, if it is file backed."""
+        self.sketch.flush()
+    
+    def close(self) -> None:
+        """Flush and release the sketch."""
+        self.sketch.close()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+    
+    def __getstate__(self) -> Dict[str, Any]:
+        # Locks do not pickle; each process gets its own
+        return {'max_fraction': self.max_fraction, 'min_documents': self.min_documents, 'sketch': self.sketch,
+                'seen': self.seen}
+    
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._lock_file = None
+        self._lock_pid = None
+
+
+def _fingerprint(text: str) -> int:
+    """
+    64-bit fingerprint of a string.
+    
+    Args:
+        text: Text to hash
+    
+    Returns:
+        Unsigned 64-bit integer
+    """
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=8).digest(), 'little')
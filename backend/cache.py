@@ -0,0 +1,447 @@
+"""
+Result Caching for SignalCore
+
+This module provides a two-tier cache for pipeline results: an in-memory
+LRU tier bounded by the byte size of its values, and an optional SQLite
+tier on disk that several worker processes can share. Entries are keyed by
+a hash of the document content plus the pipeline configuration, so the
+same document sent again skips the whole chunk + prune pass. For questions,
+the query-independent work on a document (sentences, chunks, base scores
+and BM25 index) is cached in memory instead, so a different question about
+the same document only adds its relevance on top.
+
+The same two tiers, with entries that expire, cache LLM answers
+(ResponseCache), keyed by model, context and question.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+def content_key(text: str, config: Dict[str, Any]) -> str:
+    """
+    Build a cache key from text content and the configuration applied to it.
+    
+    Args:
+        text: The content (e.g. a document)
+        config: JSON-serializable settings that affect the result
+    
+    Returns:
+        Hex digest identifying (config, text)
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps(config, sort_keys=True).encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(text.encode('utf-8', 'surrogatepass'))
+    return digest.hexdigest()
+
+
+class LRUCache:
+    """
+    Thread-safe in-memory LRU cache that evicts by total value size in bytes.
+    
+    With a ttl, entries also expire after that many seconds without use.
+    Every use moves an entry to the back, so the front always holds the
+    entries that expire first.
+    """
+    
+    def __init__(self, max_bytes: int, ttl: float = None):
+        """
+        Args:
+            max_bytes: Total size of cached values before the least recently
+                used entries are evicted
+            ttl: Seconds an entry may go unused before it expires (never if
+                None)
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.current_bytes = 0
+        self._entries: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()
+        self._last_used: Dict[str, float] = {}
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Look up a value and mark it as recently used.
+        
+        Args:
+            key: Cache key
+        
+        Returns:
+            The cached value, or None on a miss
+        """
+        with self._lock:
+            if self.ttl is not None:
+                self._expire(time.monotonic())
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            if self.ttl is not None:
+                self._last_used[key] = time.monotonic()
+            return entry[0]
+    
+    def put(self, key: str, value: Any, size: int) -> None:
+        """
+        Store a value, evicting least recently used entries to fit.
+        
+        Args:
+            key: Cache key
+            value: Value to cache
+            size: Size of the value in bytes
+        """
+        if size > self.max_bytes:
+            return
+        
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            if self.ttl is not None:
+                now = time.monotonic()
+                self._last_used[key] = now
+                self._expire(now)
+            
+            while self.current_bytes > self.max_bytes:
+                self._evict_oldest()
+    
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            self._entries.clear()
+            self._last_used.clear()
+            self.current_bytes = 0
+    
+    def _expire(self, now: float) -> None:
+        """
+        Evict entries unused for more than ttl seconds (lock held).
+        
+        Args:
+            now: Current time.monotonic()
+        """
+        while self._entries and now - self._last_used[next(iter(self._entries))] > self.ttl:
+            self._evict_oldest()
+    
+    def _evict_oldest(self) -> None:
+        """Evict the least recently used entry (lock held)."""
+        key, (_, evicted_size) = self._entries.popitem(last=False)
+        self._last_used.pop(key, None)
+        self.current_bytes -= evicted_size
+
+
+class SQLiteCache:
+    """
+    Persistent key/value cache in a SQLite file, shareable across processes.
+    
+    Each thread (and each forked process) opens its own connection. With a
+    max_bytes, the oldest entries are evicted once the stored values
+    outgrow it.
+    """
+    
+    # Writes between checks of the total size (and of expired entries)
+    MAINTENANCE_INTERVAL = 64
+    
+    def __init__(self, path: str, ttl: float = None, table: str = 'cache', max_bytes: int = None):
+        """
+        Args:
+            path: SQLite database file, created if missing
+            ttl: Seconds after which a stored value expires (never if None)
+            table: Table holding the entries, so several caches can share
+                one file
+            max_bytes: Total size of stored values before the oldest
+                entries are evicted (unbounded if None)
+        """
+        self.path = path
+        self.ttl = ttl
+        self.table = table
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        with self._connect() as connection:
+            connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value BLOB NOT NULL, stored REAL)"
+            )
+            connection.execute(f"CREATE INDEX IF NOT EXISTS {table}_stored ON {table} (stored)")
+    
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Look up a value.
+        
+        Args:
+            key: Cache key
+        
+        Returns:
+            The stored bytes, or None on a miss (or if the value expired)
+        """
+        row = self._connect().execute(f"SELECT value, stored FROM {self.table} WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if self.ttl is not None and row[1] is not None and time.time() - row[1] > self.ttl:
+            return None
+        return row[0]
+    
+    def put(self, key: str, value: bytes) -> None:
+        """
+        Store a value, replacing any previous one.
+        
+        Args:
+            key: Cache key
+            value: Bytes to store
+        """
+        with self._connect() as connection:
+            connection.execute(f"INSERT OR REPLACE INTO {self.table} (key, value, stored) VALUES (?, ?, ?)",
+                               (key, value, time.time()))
+            # Expired and excess entries are dropped now and then, not on
+            # every write
+            if hash(key) % self.MAINTENANCE_INTERVAL == 0:
+                self._maintain(connection)
+    
+    def _maintain(self, connection: sqlite3.Connection) -> None:
+        """
+        Delete expired entries, then the oldest entries beyond max_bytes.
+        
+        Args:
+            connection: Connection inside the writing transaction
+        """
+        if self.ttl is not None:
+            connection.execute(f"DELETE FROM {self.table} WHERE stored < ?", (time.time() - self.ttl,))
+        if self.max_bytes is not None:
+            # Keep the newest entries whose running total fits
+            connection.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f"SELECT key FROM (SELECT key, SUM(LENGTH(value)) OVER (ORDER BY stored DESC, key) AS total "
+                f"FROM {self.table}) WHERE total > ?)",
+                (self.max_bytes,)
+            )
+    
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Get this thread's connection, opening one if needed.
+        
+        Returns:
+            An open SQLite connection
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+    
+    def __getstate__(self) -> Dict[str, Any]:
+        # Connections are per process; only the settings travel
+        return {'path': self.path, 'ttl': self.ttl, 'table': self.table, 'max_bytes': self.max_bytes}
+    
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(state['path'], state.get('ttl'), state.get('table', 'cache'), state.get('max_bytes'))
+
+
+class PipelineCache:
+    """
+    Two-tier cache of SignalCorePipeline results with hit/miss counters,
+    plus an in-memory LRU of prepared documents for query-aware runs.
+    """
+    
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, path: str = None,
+                 disk_max_bytes: int = 1024 * 1024 * 1024, document_bytes: int = 256 * 1024 * 1024):
+        """
+        Args:
+            max_bytes: Byte budget of the in-memory LRU tier
+            path: Optional SQLite file for the on-disk tier
+            disk_max_bytes: Byte budget of the on-disk tier (unbounded if
+                None)
+            document_bytes: Byte budget of the prepared documents
+        """
+        self.max_bytes = max_bytes
+        self.document_bytes = document_bytes
+        self.memory = LRUCache(max_bytes)
+        self.documents = LRUCache(document_bytes)
+        self.disk = SQLiteCache(path, max_bytes=disk_max_bytes) if path else None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[Tuple[str, Dict[str, float]]]:
+        """
+        Look up a pipeline result, memory tier first.
+        
+        Args:
+            key: Cache key from content_key()
+        
+        Returns:
+            (optimized_context, metrics), or None on a miss
+        """
+        result = self.memory.get(key)
+        if result is None and self.disk is not None:
+            stored = self.disk.get(key)
+            if stored is not None:
+                result = tuple(json.loads(stored))
+                self.memory.put(key, result, self._size(result))
+        
+        self._count(result is not None)
+        return result
+    
+    def get_document(self, key: str) -> Optional[Any]:
+        """
+        Look up a prepared document.
+        
+        Args:
+            key: Cache key from content_key(), without the query
+        
+        Returns:
+            The PreparedDocument, or None on a miss
+        """
+        prepared = self.documents.get(key)
+        self._count(prepared is not None)
+        return prepared
+    
+    def put_document(self, key: str, prepared: Any, size: int) -> None:
+        """
+        Store a prepared document in memory.
+        
+        Args:
+            key: Cache key from content_key(), without the query
+            prepared: The PreparedDocument
+            size: Its approximate size in bytes
+        """
+        self.documents.put(key, prepared, size)
+    
+    def _count(self, hit: bool) -> None:
+        """
+        Count a lookup.
+        
+        Args:
+            hit: Whether the lookup found an entry
+        """
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+    
+    def put(self, key: str, result: Tuple[str, Dict[str, float]]) -> None:
+        """
+        Store a pipeline result in both tiers.
+        
+        Args:
+            key: Cache key from content_key()
+            result: (optimized_context, metrics)
+        """
+        self.memory.put(key, result, self._size(result))
+        if self.disk is not None:
+            self.disk.put(key, json.dumps(result).encode('utf-8'))
+    
+    def _size(self, result: Tuple[str, Dict[str, float]]) -> int:
+        """
+        Approximate memory footprint of a cached result.
+        
+        Args:
+            result: (optimized_context, metrics)
+        
+        Returns:
+            Size in bytes
+        """
+        optimized_context, metrics = result
+        return sys.getsizeof(optimized_context) + sys.getsizeof(metrics)
+    
+    def __getstate__(self) -> Dict[str, Any]:
+        # Worker processes get empty memory tiers and share the disk tier
+        return {'max_bytes': self.max_bytes, 'document_bytes': self.document_bytes, 'disk': self.disk}
+    
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(state['max_bytes'], document_bytes=state['document_bytes'])
+        self.disk = state['disk']
+
+
+class ResponseCache:
+    """
+    Two-tier cache of LLM answers, whose entries expire after a TTL.
+    """
+    
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024, path: str = None, ttl: float = 24 * 3600,
+                 disk_max_bytes: int = 256 * 1024 * 1024):
+        """
+        Args:
+            max_bytes: Byte budget of the in-memory LRU tier
+            path: Optional SQLite file for the on-disk tier
+            ttl: Seconds an answer stays valid after it was stored (never
+                expires if None)
+            disk_max_bytes: Byte budget of the on-disk tier (unbounded if
+                None)
+        """
+        self.ttl = ttl
+        self.memory = LRUCache(max_bytes)
+        self.disk = SQLiteCache(path, ttl, table='llm_responses', max_bytes=disk_max_bytes) if path else None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def key(model: str, context: str, question: str) -> str:
+        """
+        Cache key of one LLM call.
+        
+        Args:
+            model: Model name
+            context: Context sent with the question
+            question: The user's question
+        
+        Returns:
+            Hex digest identifying the call
+        """
+        return content_key(context, {"model": model, "question": question})
+    
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up an answer, memory tier first.
+        
+        Args:
+            key: Key from key()
+        
+        Returns:
+            The answer, or None on a miss (or if it expired)
+        """
+        entry = self.memory.get(key)
+        if entry is not None and self.ttl is not None and time.time() - entry[1] > self.ttl:
+            entry = None
+        
+        if entry is None and self.disk is not None:
+            stored = self.disk.get(key)
+            if stored is not None:
+                # The disk tier keeps the storage time; the memory copy
+                # expires with it
+                entry = tuple(json.loads(stored))
+                self.memory.put(key, entry, sys.getsizeof(entry[0]))
+        
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return entry[0]
+    
+    def put(self, key: str, response: str) -> None:
+        """
+        Store an answer in both tiers.
+        
+        Args:
+            key: Key from key()
+            response: The LLM's answer
+        """
+        entry = (response, time.time())
+        self.memory.put(key, entry, sys.getsizeof(response))
+        if self.disk is not None:
+            self.disk.put(key, json.dumps(entry).encode('utf-8'))
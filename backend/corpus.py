@@ -0,0 +1,318 @@
+"""
+Corpus Retrieval Index for SignalCore
+
+Questions against a large document collection should not have to send every
+document through the pipeline. This module ingests documents once, stores
+their chunks (from SemanticChunker) in SQLite, and keeps an inverted index
+from normalized terms to chunks. At query time the top-k chunks by BM25 are
+retrieved, and only those go on to the pruner and the LLM.
+
+Postings are stored in blocks of delta-encoded chunk ids (plus term
+frequencies) as zlib-compressed uint32 arrays. Chunk ids only grow, so
+ingesting more documents appends to the last block of each term, and only
+blocks below BLOCK_SIZE postings are ever rewritten. A query reads the
+postings of its few terms and scores them with NumPy, so its cost depends
+on how many chunks contain the query terms rather than on corpus size.
+"""
+
+import math
+import os
+import sqlite3
+import threading
+import zlib
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+from backend.algorithms.bm25 import normalize
+from backend.algorithms.chunker import SemanticChunker
+from backend.algorithms.vocabulary import tokenize
+from backend.cache import content_key
+
+
+class CorpusIndex:
+    """
+    On-disk chunk store and BM25 inverted index over a document collection.
+    
+    Each thread (and each forked process) opens its own connection; writes
+    from several processes are serialized by SQLite.
+    """
+    
+    # Postings per block before a new block is started
+    BLOCK_SIZE = 4096
+    
+    # BM25 parameters
+    K1 = 1.2
+    B = 0.75
+    
+    # Query terms found in more than this fraction of chunks (and in more
+    # than one block of them) carry almost no weight, and reading their
+    # postings would dominate query latency
+    MAX_DF_FRACTION = 0.5
+    
+    def __init__(self, path: str):
+        """
+        Args:
+            path: SQLite database file, created if missing
+        """
+        self.path = path
+        self.chunker = SemanticChunker()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._lengths = np.zeros(0, dtype=np.float64)
+        self._total_length = 0.0
+        
+        connection = self._connect()
+        connection.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                id TEXT PRIMARY KEY, first_chunk INTEGER NOT NULL, num_chunks INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS chunks (
+                id INTEGER PRIMARY KEY, document TEXT NOT NULL, length INTEGER NOT NULL, text BLOB NOT NULL);
+            CREATE TABLE IF NOT EXISTS terms (
+                term TEXT PRIMARY KEY, df INTEGER NOT NULL) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL, block INTEGER NOT NULL, count INTEGER NOT NULL, last INTEGER NOT NULL,
+                ids BLOB NOT NULL, frequencies BLOB NOT NULL, PRIMARY KEY (term, block)) WITHOUT ROWID;
+        """)
+    
+    def __len__(self) -> int:
+        """Number of chunks in the corpus."""
+        row = self._connect().execute("SELECT MAX(id) FROM chunks").fetchone()
+        return row[0] + 1 if row[0] is not None else 0
+    
+    @property
+    def documents(self) -> int:
+        """Number of documents in the corpus."""
+        return self._connect().execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+    
+    def add_documents(self, documents: Iterable[str]) -> List[str]:
+        """
+        Chunk and index documents; documents already in the corpus are skipped.
+        
+        All documents of one call are written in a single transaction, so
+        batching many documents per call makes ingest much faster.
+        
+        Args:
+            documents: Document texts
+        
+        Returns:
+            Content-hash ID of each document, in input order
+        """
+        document_ids = []
+        postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        
+        with self._lock:
+            connection = self._connect()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                next_chunk = len(self)
+                for document in documents:
+                    document_id = content_key(document, {})
+                    document_ids.append(document_id)
+                    if connection.execute("SELECT 1 FROM documents WHERE id = ?", (document_id,)).fetchone():
+                        continue
+                    
+                    first_chunk = next_chunk
+                    for chunk in self.chunker.chunk(document):
+                        words = [normalize(word) for word in tokenize(chunk)]
+                        connection.execute("INSERT INTO chunks (id, document, length, text) VALUES (?, ?, ?, ?)",
+                                           (next_chunk, document_id, len(words), zlib.compress(chunk.encode('utf-8'))))
+                        for word, frequency in Counter([word for word in words if word]).items():
+                            ids, frequencies = postings.setdefault(word, ([], []))
+                            ids.append(next_chunk)
+                            frequencies.append(frequency)
+                        next_chunk += 1
+                    
+                    connection.execute("INSERT INTO documents (id, first_chunk, num_chunks) VALUES (?, ?, ?)",
+                                       (document_id, first_chunk, next_chunk - first_chunk))
+                
+                for term, (ids, frequencies) in postings.items():
+                    self._append_postings(connection, term, ids, frequencies)
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        
+        return document_ids
+    
+    def add_document(self, document: str) -> str:
+        """
+        Chunk and index one document.
+        
+        Args:
+            document: Document text
+        
+        Returns:
+            Content-hash ID of the document
+        """
+        return self.add_documents([document])[0]
+    
+    def search(self, query: str, top_k: int = 8) -> List[Tuple[int, float]]:
+        """
+        Rank chunks against a query with BM25.
+        
+        Args:
+            query: The user's question
+            top_k: Number of chunks to return
+        
+        Returns:
+            (chunk id, score) of the best matching chunks, best first
+        """
+        lengths = self._chunk_lengths()
+        num_chunks = len(lengths)
+        if not num_chunks or top_k <= 0:
+            return []
+        
+        connection = self._connect()
+        average_length = self._total_length / num_chunks
+        matched_ids = []
+        weights = []
+        
+        # Document frequency of each query term found in the corpus
+        query_terms = {}
+        for term in dict.fromkeys(normalize(word) for word in tokenize(query)):
+            row = connection.execute("SELECT df FROM terms WHERE term = ?", (term,)).fetchone() if term else None
+            if row is not None:
+                query_terms[term] = row[0]
+        
+        # Skip very common terms, unless the query has nothing else
+        max_df = max(self.MAX_DF_FRACTION * num_chunks, self.BLOCK_SIZE)
+        scored_terms = {term: df for term, df in query_terms.items() if df <= max_df}
+        if not scored_terms and query_terms:
+            rarest = min(query_terms, key=query_terms.get)
+            scored_terms = {rarest: query_terms[rarest]}
+        
+        for term, df in scored_terms.items():
+            ids, frequencies = self._read_postings(connection, term)
+            idf = math.log(1.0 + (num_chunks - df + 0.5) / (df + 0.5))
+            length_norm = 1.0 - self.B + self.B * lengths[ids] / average_length
+            matched_ids.append(ids)
+            weights.append(idf * frequencies * (self.K1 + 1) / (frequencies + self.K1 * length_norm))
+        
+        if not matched_ids:
+            return []
+        
+        # Sum term scores per chunk, then take the top k without a full sort;
+        # every chunk tied with the k-th score is a candidate, so ties are
+        # broken by chunk id rather than by partition order
+        candidates, inverse = np.unique(np.concatenate(matched_ids), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(weights))
+        if len(candidates) > top_k:
+            cutoff = -np.partition(-scores, top_k - 1)[top_k - 1]
+            best = np.flatnonzero(scores >= cutoff)
+        else:
+            best = np.arange(len(candidates))
+        best = best[np.lexsort((candidates[best], -scores[best]))][:top_k]
+        return [(int(candidates[b]), float(scores[b])) for b in best]
+    
+    def fetch(self, chunk_ids: List[int]) -> List[str]:
+        """
+        Text of the given chunks.
+        
+        Args:
+            chunk_ids: Chunk ids, e.g. from search()
+        
+        Returns:
+            Chunk texts, in the order given
+        """
+        if not chunk_ids:
+            return []
+        
+        placeholders = ",".join("?" * len(chunk_ids))
+        rows = self._connect().execute(f"SELECT id, text FROM chunks WHERE id IN ({placeholders})", chunk_ids)
+        texts = {chunk_id: zlib.decompress(text).decode('utf-8') for chunk_id, text in rows}
+        return [texts[chunk_id] for chunk_id in chunk_ids]
+    
+    def _append_postings(self, connection: sqlite3.Connection, term: str, ids: List[int],
+                         frequencies: List[int]) -> None:
+        """
+        Append postings of new chunks (all above existing ids) to a term.
+        
+        Args:
+            connection: Connection inside the ingest transaction
+            term: Normalized term
+            ids: Increasing chunk ids
+            frequencies: Term frequency in each chunk
+        """
+        row = connection.execute(
+            "SELECT block, count, last, ids, frequencies FROM postings WHERE term = ? ORDER BY block DESC LIMIT 1",
+            (term,)
+        ).fetchone()
+        
+        previous = row[2] if row is not None else 0
+        deltas = array('I', [ids[0] - previous])
+        deltas.extend([b - a for a, b in zip(ids, ids[1:])])
+        
+        if row is not None and row[1] < self.BLOCK_SIZE:
+            block, count, _, old_deltas, old_frequencies = row
+            connection.execute(
+                "UPDATE postings SET count = ?, last = ?, ids = ?, frequencies = ? WHERE term = ? AND block = ?",
+                (count + len(ids), ids[-1],
+                 zlib.compress(zlib.decompress(old_deltas) + deltas.tobytes()),
+                 zlib.compress(zlib.decompress(old_frequencies) + array('I', frequencies).tobytes()),
+                 term, block)
+            )
+        else:
+            # A new block starts from an absolute id, so blocks decode independently
+            deltas[0] = ids[0]
+            connection.execute(
+                "INSERT INTO postings (term, block, count, last, ids, frequencies) VALUES (?, ?, ?, ?, ?, ?)",
+                (term, row[0] + 1 if row is not None else 0, len(ids), ids[-1],
+                 zlib.compress(deltas.tobytes()), zlib.compress(array('I', frequencies).tobytes()))
+            )
+        
+        connection.execute(
+            "INSERT INTO terms (term, df) VALUES (?, ?) ON CONFLICT (term) DO UPDATE SET df = df + excluded.df",
+            (term, len(ids))
+        )
+    
+    def _read_postings(self, connection: sqlite3.Connection, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Decode every posting block of a term.
+        
+        Args:
+            connection: Open connection
+            term: Normalized term
+        
+        Returns:
+            (chunk ids, term frequencies) as NumPy arrays
+        """
+        ids = []
+        frequencies = []
+        for deltas, block_frequencies in connection.execute(
+                "SELECT ids, frequencies FROM postings WHERE term = ? ORDER BY block", (term,)):
+            ids.append(np.cumsum(np.frombuffer(zlib.decompress(deltas), dtype=np.uint32), dtype=np.int64))
+            frequencies.append(np.frombuffer(zlib.decompress(block_frequencies), dtype=np.uint32))
+        return np.concatenate(ids), np.concatenate(frequencies).astype(np.float64)
+    
+    def _chunk_lengths(self) -> np.ndarray:
+        """
+        Word count of every chunk, loading chunks added since the last call.
+        
+        Returns:
+            Float array indexed by chunk id
+        """
+        with self._lock:
+            known = len(self._lengths)
+            if len(self) > known:
+                rows = self._connect().execute("SELECT length FROM chunks WHERE id >= ? ORDER BY id", (known,))
+                new_lengths = np.array([length for (length,) in rows], dtype=np.float64)
+                self._lengths = np.concatenate((self._lengths, new_lengths))
+                self._total_length += float(new_lengths.sum())
+            return self._lengths
+    
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Get this thread's connection, opening one if needed.
+        
+        Returns:
+            An open SQLite connection (autocommit; ingest manages its own
+            transaction)
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
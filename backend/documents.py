@@ -0,0 +1,131 @@
+"""
+Server-Side Document Store for SignalCore
+
+Without it, every question re-uploads the full document as JSON. This
+module keeps uploaded documents in memory under a content-hash ID, so the
+client sends a long document once and then refers to it by ID. The store
+is a bounded LRU (by document size) whose entries also expire after a
+period without use.
+
+Uploads are read from the request stream in blocks, optionally
+gzip-compressed, and decoded as they arrive. The raw body is never held
+in memory, and the decompressed size is capped, so a small compressed
+body cannot expand without bound.
+"""
+
+import codecs
+import sys
+import zlib
+from typing import BinaryIO, Iterable, Optional
+from backend.cache import LRUCache, content_key
+
+
+class DocumentTooLarge(ValueError):
+    """An upload decompressed to more than the allowed size."""
+
+
+class DocumentStore:
+    """
+    Uploaded documents by content-hash ID, with LRU and idle-time eviction.
+    """
+    
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, ttl: float = 3600.0):
+        """
+        Args:
+            max_bytes: Total size of stored documents before the least
+                recently used ones are evicted
+            ttl: Seconds a document may go unused before it expires
+                (never if None)
+        """
+        self.documents = LRUCache(max_bytes, ttl)
+    
+    def __len__(self) -> int:
+        return len(self.documents)
+    
+    def add(self, document: str) -> str:
+        """
+        Store a document; storing the same text again only refreshes it.
+        
+        Args:
+            document: Document text
+        
+        Returns:
+            Content-hash ID of the document (the same ID CorpusIndex uses)
+        """
+        document_id = content_key(document, {})
+        if self.documents.get(document_id) is None:
+            self.documents.put(document_id, document, sys.getsizeof(document))
+        return document_id
+    
+    def get(self, document_id: str) -> Optional[str]:
+        """
+        Look up a document and mark it as recently used.
+        
+        Args:
+            document_id: ID returned by add()
+        
+        Returns:
+            The document text, or None if it is unknown or was evicted
+        """
+        return self.documents.get(document_id)
+
+
+def read_text(stream: BinaryIO, gzipped: bool = False, max_bytes: int = 64 * 1024 * 1024,
+              encoding: str = 'utf-8', block_size: int = 64 * 1024) -> str:
+    """
+    Read and decode a (possibly gzip-compressed) body, block by block.
+    
+    Args:
+        stream: Binary stream of the body, e.g. a request's input stream
+        gzipped: Whether the body is gzip-compressed
+        max_bytes: Largest (decompressed) body accepted
+        encoding: Text encoding of the (decompressed) body
+        block_size: Bytes read from the stream at a time
+    
+    Returns:
+        The decoded text
+    """
+    return decode_blocks(iter(lambda: stream.read(block_size), b''), gzipped, max_bytes, encoding)
+
+
+def decode_blocks(blocks: Iterable[bytes], gzipped: bool = False, max_bytes: int = 64 * 1024 * 1024,
+                  encoding: str = 'utf-8') -> str:
+    """
+    Decompress and decode a body that arrives as a sequence of blocks.
+    
+    Args:
+        blocks: Raw body blocks, in order
+        gzipped: Whether the body is gzip-compressed
+        max_bytes: Largest (decompressed) body accepted
+        encoding: Text encoding of the (decompressed) body
+    
+    Returns:
+        The decoded text
+    """
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16) if gzipped else None
+    decoder = codecs.getincrementaldecoder(encoding)()
+    parts = []
+    size = 0
+    
+    for block in blocks:
+        # Decompress in bounded steps so the size cap applies before a
+        # highly compressed block is expanded in full
+        pending = block
+        while pending:
+            if decompressor is not None:
+                data = decompressor.decompress(pending, max_bytes - size + 1)
+                pending = decompressor.unconsumed_tail
+            else:
+                data = pending
+                pending = b''
+            
+            size += len(data)
+            if size > max_bytes:
+                raise DocumentTooLarge(f"Document exceeds {max_bytes} bytes")
+            parts.append(decoder.decode(data))
+    
+    if decompressor is not None and not decompressor.eof:
+        raise ValueError("Truncated gzip body")
+    
+    parts.append(decoder.decode(b'', final=True))
+    return ''.join(parts)
@@ -0,0 +1,268 @@
+"""
+LLM Backends for SignalCore
+
+LLMClient does not talk to a model API itself: it sends prompts to an
+LLMBackend. Two backends are available, chosen by name with
+create_backend():
+
+- gemini: Google Gemini through google.generativeai (imported only when
+  this backend is created)
+- local: A deterministic stand-in that needs no network. It waits a
+  configurable latency, streams its answer in pieces, and answers a
+  question with the context sentence that contains the most of the
+  question's words, which is enough to find the needle in a
+  needle-in-a-haystack document. It lets the full HTTP path be load-tested
+  and benchmarked offline.
+"""
+
+import asyncio
+import re
+import time
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import AsyncIterator, Iterator, List
+
+
+class LLMBackend(ABC):
+    """
+    Interface of a model backend: one prompt in, the response text out.
+    
+    Backends raise on failure; LLMClient's transport decides whether to
+    retry.
+    """
+    
+    # Name reported with answers and used in cache keys
+    model_name = ''
+    
+    @abstractmethod
+    def generate(self, prompt: str) -> str:
+        """
+        Generate a response.
+        
+        Args:
+            prompt: Full prompt text
+        
+        Returns:
+            The response text
+        """
+    
+    @abstractmethod
+    async def generate_async(self, prompt: str) -> str:
+        """
+        Generate a response without blocking the event loop.
+        
+        Args:
+            prompt: Full prompt text
+        
+        Returns:
+            The response text
+        """
+    
+    @abstractmethod
+    def stream(self, prompt: str) -> Iterator[str]:
+        """
+        Generate a response piece by piece.
+        
+        Args:
+            prompt: Full prompt text
+        
+        Returns:
+            Iterator over successive pieces of the response text
+        """
+    
+    @abstractmethod
+    def stream_async(self, prompt: str) -> AsyncIterator[str]:
+        """
+        Generate a response piece by piece without blocking the event loop.
+        
+        Args:
+            prompt: Full prompt text
+        
+        Returns:
+            Async iterator over successive pieces of the response text
+        """
+
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini API backend."""
+    
+    def __init__(self, api_key: str, model_name: str = 'gemini-1.5-flash'):
+        """
+        Args:
+            api_key: Google Gemini API key
+            model_name: Gemini model to use
+        """
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY not found in environment variables")
+        
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+    
+    def generate(self, prompt: str) -> str:
+        return self.model.generate_content(prompt).text
+    
+    async def generate_async(self, prompt: str) -> str:
+        return (await self.model.generate_content_async(prompt)).text
+    
+    def stream(self, prompt: str) -> Iterator[str]:
+        for chunk in self.model.generate_content(prompt, stream=True):
+            # Chunks without text (e.g. only safety metadata) are skipped
+            if chunk.parts:
+                yield chunk.text
+    
+    async def stream_async(self, prompt: str) -> AsyncIterator[str]:
+        response = await self.model.generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            if chunk.parts:
+                yield chunk.text
+
+
+class LocalBackend(LLMBackend):
+    """
+    Deterministic offline stand-in for a model.
+    
+    It understands the prompts LLMClient builds: the text after "Context:"
+    is searched for each question, and several numbered questions get
+    numbered answers.
+    """
+    
+    model_name = 'local'
+    
+    # Words ignored when matching a question against the context
+    STOP_WORDS = frozenset("""
+        a an and are as at be by can could did do does for from had has have how i in is it its of on or
+        that the their there these this to was were what when where which who whom whose why will with
+        would you your according context document text mentioned say says said
+    """.split())
+    
+    NOT_FOUND = "The context does not contain the answer."
+    
+    def __init__(self, latency: float = 0.0, piece_latency: float = 0.0, piece_words: int = 4):
+        """
+        Args:
+            latency: Seconds before the response (or its first piece)
+            piece_latency: Seconds between streamed pieces
+            piece_words: Words per streamed piece
+        """
+        self.latency = latency
+        self.piece_latency = piece_latency
+        self.piece_words = max(1, piece_words)
+    
+    def generate(self, prompt: str) -> str:
+        if self.latency:
+            time.sleep(self.latency)
+        return self.answer(prompt)
+    
+    async def generate_async(self, prompt: str) -> str:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.answer(prompt)
+    
+    def stream(self, prompt: str) -> Iterator[str]:
+        if self.latency:
+            time.sleep(self.latency)
+        for n, piece in enumerate(self._pieces(self.answer(prompt))):
+            if n and self.piece_latency:
+                time.sleep(self.piece_latency)
+            yield piece
+    
+    async def stream_async(self, prompt: str) -> AsyncIterator[str]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        for n, piece in enumerate(self._pieces(self.answer(prompt))):
+            if n and self.piece_latency:
+                await asyncio.sleep(self.piece_latency)
+            yield piece
+    
+    def answer(self, prompt: str) -> str:
+        """
+        Answer a prompt built by LLMClient.
+        
+        Args:
+            prompt: Single- or multi-question prompt
+        
+        Returns:
+            The best matching context sentence, or numbered answers for a
+            multi-question prompt
+        """
+        context, found, rest = prompt.rpartition("\n\nQuestion: ")
+        if found:
+            return self.search(context.removeprefix("Context: "), rest.rsplit("\n\nAnswer:", 1)[0])
+        
+        # Multi-question prompt: "Questions:" followed by "N. question" lines
+        context, _, rest = prompt.rpartition("\n\nAnswer each of the following questions")
+        questions = re.findall(r'^\d+\. (.*)$', rest.partition("\nQuestions:\n")[2], re.MULTILINE)
+        if not questions:
+            return self.search(prompt, prompt)
+        context = context.removeprefix("Context: ")
+        return "\n".join(f"Answer {n}: {self.search(context, question)}"
+                         for n, question in enumerate(questions, 1))
+    
+    def search(self, context: str, question: str) -> str:
+        """
+        Find the context sentence that best matches the question words.
+        
+        A question word found in few sentences counts for more, and of
+        equally good sentences the shortest wins, so a short needle beats a
+        long sentence that happens to share its words.
+        
+        Args:
+            context: Text to search
+            question: The question
+        
+        Returns:
+            The sentence, or NOT_FOUND if no sentence contains any question
+            word
+        """
+        words = {word for word in re.findall(r"[a-z0-9]+", question.lower())
+                 if len(word) > 2 and word not in self.STOP_WORDS}
+        sentences = [sentence.strip() for sentence in re.split(r'(?<=[.!?])\s+', context) if sentence.strip()]
+        matches = [[word for word in words if word in sentence.lower()] for sentence in sentences]
+        
+        frequencies = Counter(word for matched in matches for word in matched)
+        best = None
+        best_key = (0.0, 0)
+        for sentence, matched in zip(sentences, matches):
+            if matched:
+                key = (sum(1.0 / frequencies[word] for word in matched), -len(sentence))
+                if key > best_key:
+                    best, best_key = sentence, key
+        return best or self.NOT_FOUND
+    
+    def _pieces(self, text: str) -> List[str]:
+        """
+        Split a response into streamed pieces of piece_words words.
+        
+        Args:
+            text: Response text
+        
+        Returns:
+            Pieces that join back to the text
+        """
+        tokens = re.findall(r'\S+\s*', text)
+        return [''.join(tokens[i:i + self.piece_words]) for i in range(0, len(tokens), self.piece_words)] or ['']
+
+
+# Backends by configuration name
+BACKENDS = {
+    'gemini': GeminiBackend,
+    'local': LocalBackend,
+}
+
+
+def create_backend(name: str, **options) -> LLMBackend:
+    """
+    Create a backend by name.
+    
+    Args:
+        name: 'gemini' or 'local'
+        **options: Arguments of the backend's constructor
+    
+    Returns:
+        The backend
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend '{name}', expected one of {tuple(BACKENDS)}")
+    return BACKENDS[name](**options)
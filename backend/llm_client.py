@@ -1,36 +1,69 @@
 """
 LLM API Client for SignalCore
 
-This module provides integration with Google Gemini API for querying
-the LLM with context and questions.
+This module provides integration with an LLM backend (Google Gemini API by
+default, see llm_backends.py) for querying the LLM with context and
+questions.
+
+Answers can be cached (ResponseCache), keyed by model, context and
+question, and identical requests that arrive while one is already in flight
+wait for its answer instead of calling the API again. Failed calls are
+never cached.
+
+Calls go through an LLMTransport (concurrency limit, rate limiting and
+retries). query_many() asks several questions about one context in a
+single call and splits the answer apart.
 """
 
+import asyncio
 import os
-import google.generativeai as genai
+import re
+import threading
+from concurrent.futures import Future
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from backend.cache import ResponseCache
+from backend.llm_backends import GeminiBackend, LLMBackend
+from backend.transport import LLMTransport
+
+
+# Marker line before each answer of a multi-question prompt
+ANSWER_MARKER = re.compile(r'^[ \t#*]*Answer[ \t]+(\d+)[ \t*]*(?:[:.)]|$)[ \t*]*', re.MULTILINE | re.IGNORECASE)
 
 
 class LLMClient:
-    """Client for interacting with Google Gemini API."""
+    """Client for querying an LLM backend (Google Gemini API by default)."""
     
-    def __init__(self, api_key: str = None, model_name: str = None):
+    def __init__(self, api_key: str = None, model_name: str = None, cache: ResponseCache = None,
+                 transport: LLMTransport = None, backend: LLMBackend = None):
         """
-        Initialize the LLM client with Google Gemini API.
+        Initialize the LLM client, with Google Gemini API unless a backend is given.
         
         Args:
             api_key: Google Gemini API key. If None, reads from environment.
             model_name: Model name to use. If None, reads from environment or defaults to 'gemini-1.5-flash'.
+            cache: Optional cache of answers (none are cached if None)
+            transport: Limits, rate limiting and retries of API calls
+                (defaults to LLMTransport())
+            backend: Backend to query instead of Gemini (e.g. LocalBackend);
+                api_key and model_name are not used then
         """
-        if api_key is None:
-            api_key = os.getenv("GEMINI_API_KEY")
-        
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY not found in environment variables")
+        if backend is None:
+            if api_key is None:
+                api_key = os.getenv("GEMINI_API_KEY")
+            if model_name is None:
+                model_name = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+            backend = GeminiBackend(api_key, model_name)
         
-        if model_name is None:
-            model_name = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+        self.backend = backend
+        self.model_name = backend.model_name
+        self.cache = cache
+        self.transport = transport or LLMTransport()
         
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel(model_name)
+        # Requests being answered, by cache key: threads wait on a Future,
+        # coroutines on the Task making the call
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+        self._in_flight_async: Dict[str, asyncio.Task] = {}
     
     def query(self, context: str, question: str) -> str:
         """
@@ -43,15 +76,429 @@ class LLMClient:
         Returns:
             The LLM's response text, or "API Error" on failure
         """
-        prompt = f"""Context: {context}
+        return self.query_cached(context, question)[0]
+    
+    def query_cached(self, context: str, question: str) -> Tuple[str, bool]:
+        """
+        Query the LLM, answering from the cache or an identical request in
+        flight when possible.
+        
+        A failed call fails every request waiting for it.
+        
+        Args:
+            context: The document context (naive or optimized)
+            question: The user's question
+        
+        Returns:
+            (response text or "API Error", whether it was answered without
+            a call of its own; False on failure)
+        """
+        key = ResponseCache.key(self.model_name, context, question)
+        response = self._lookup(key)
+        if response is not None:
+            return response, True
+        
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+        if not leader:
+            try:
+                return future.result(), True
+            except Exception:
+                # The call this request waited for failed
+                return "API Error", False
+        
+        try:
+            response = self._call(self._prompt(context, question))
+        except BaseException as e:
+            future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            print(f"LLM API Error: {e}")
+            return "API Error", False
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+        
+        self._store(key, response)
+        future.set_result(response)
+        return response, False
+    
+    def query_stream(self, context: str, question: str) -> Iterator[str]:
+        """
+        Query the LLM and yield its answer as the model produces it.
+        
+        Args:
+            context: The document context (naive or optimized)
+            question: The user's question
+        
+        Returns:
+            Iterator over successive pieces of the response text, which
+            raises the request's error if it fails (possibly after some text)
+        """
+        return self.query_stream_cached(context, question)[0]
+    
+    def query_stream_cached(self, context: str, question: str) -> Tuple[Iterator[str], bool]:
+        """
+        Stream the LLM's answer, or a cached answer in one piece.
+        
+        Streams are not coalesced; a complete answer is cached once the
+        stream ends.
+        
+        Args:
+            context: The document context (naive or optimized)
+            question: The user's question
+        
+        Returns:
+            (iterator over pieces of the response text, whether it comes
+            from the cache)
+        """
+        key = ResponseCache.key(self.model_name, context, question)
+        response = self._lookup(key)
+        if response is not None:
+            return iter([response]), True
+        return self._stream(key, context, question), False
+    
+    async def query_async(self, context: str, question: str) -> str:
+        """
+        Query the LLM without blocking the event loop.
+        
+        Args:
+            context: The document context (naive or optimized)
+            question: The user's question
+        
+        Returns:
+            The LLM's response text, or "API Error" on failure
+        """
+        return (await self.query_cached_async(context, question))[0]
+    
+    async def query_cached_async(self, context: str, question: str) -> Tuple[str, bool]:
+        """
+        Query the LLM without blocking the event loop, answering from the
+        cache or an identical request in flight when possible.
+        
+        The call runs as its own task, so a caller that is cancelled (e.g.
+        a client disconnecting) does not cancel it for the others waiting.
+        
+        Args:
+            context: The document context (naive or optimized)
+            question: The user's question
+        
+        Returns:
+            (response text or "API Error", whether it was answered without
+            a call of its own; False on failure)
+        """
+        key = ResponseCache.key(self.model_name, context, question)
+        response = self._lookup(key)
+        if response is not None:
+            return response, True
+        
+        task = self._in_flight_async.get(key)
+        leader = task is None
+        if leader:
+            task = asyncio.ensure_future(self._generate_shared_async(key, context, question))
+            self._in_flight_async[key] = task
+            task.add_done_callback(lambda _: self._finish_async(key, task))
+        
+        try:
+            return await asyncio.shield(task), not leader
+        except Exception:
+            return "API Error", False
+    
+    def query_stream_async(self, context: str, question: str) -> AsyncIterator[str]:
+        """
+        Query the LLM without blocking the event loop, yielding its answer
+        as the model produces it.
+        
+        Args:
+            context: The document context (naive or optimized)
+            question: The user's question
+        
+        Returns:
+            Async iterator over successive pieces of the response text,
+            which raises the request's error if it fails (possibly after
+            some text)
+        """
+        return self.query_stream_cached_async(context, question)[0]
+    
+    def query_stream_cached_async(self, context: str, question: str) -> Tuple[AsyncIterator[str], bool]:
+        """
+        Stream the LLM's answer without blocking the event loop, or a
+        cached answer in one piece.
+        
+        Args:
+            context: The document context (naive or optimized)
+            question: The user's question
+        
+        Returns:
+            (async iterator over pieces of the response text, whether it
+            comes from the cache)
+        """
+        key = ResponseCache.key(self.model_name, context, question)
+        response = self._lookup(key)
+        if response is not None:
+            return _single_async(response), True
+        return self._stream_async(key, context, question), False
+    
+    def query_many(self, context: str, questions: List[str]) -> List[str]:
+        """
+        Answer several questions about one context, in a single call where
+        possible.
+        
+        Cached answers are reused; the remaining questions are packed into
+        one prompt that asks for numbered answers, and the reply is split
+        at the numbers. A question whose answer cannot be found in the
+        reply is asked on its own.
+        
+        Args:
+            context: The document context (naive or optimized)
+            questions: The user's questions
+        
+        Returns:
+            One response text (or "API Error") per question, in order
+        """
+        keys = [ResponseCache.key(self.model_name, context, question) for question in questions]
+        answers = [self._lookup(key) for key in keys]
+        missing = [i for i, answer in enumerate(answers) if answer is None]
+        
+        if len(missing) > 1:
+            reply = self._complete(self._batch_prompt(context, [questions[i] for i in missing]))
+            split = _split_answers(reply, len(missing)) if reply is not None else [None] * len(missing)
+            for i, answer in zip(missing, split):
+                answers[i] = answer
+        
+        for i in missing:
+            if answers[i] is None:
+                answers[i] = self._complete(self._prompt(context, questions[i]))
+            if answers[i] is None:
+                answers[i] = "API Error"
+            else:
+                self._store(keys[i], answers[i])
+        return answers
+    
+    def _call(self, prompt: str) -> str:
+        """
+        Send one prompt through the transport; the last error is raised if
+        every attempt fails.
+        
+        Args:
+            prompt: Full prompt text
+        
+        Returns:
+            The response text
+        """
+        return self.transport.call(lambda: self.backend.generate(prompt), _estimate_tokens(prompt))
+    
+    def _complete(self, prompt: str) -> Optional[str]:
+        """
+        Send one prompt through the transport.
+        
+        Args:
+            prompt: Full prompt text
+        
+        Returns:
+            The response text, or None on failure (after any retries)
+        """
+        try:
+            return self._call(prompt)
+        except Exception as e:
+            print(f"LLM API Error: {e}")
+            return None
+    
+    async def _generate_shared_async(self, key: str, context: str, question: str) -> str:
+        """
+        Make one API call without blocking the event loop, caching its
+        answer; the error is raised, to every waiting request, on failure.
+        
+        Args:
+            key: Cache key of the request
+            context: The document context
+            question: The user's question
+        
+        Returns:
+            The response text
+        """
+        prompt = self._prompt(context, question)
+        try:
+            text = await self.transport.call_async(lambda: self.backend.generate_async(prompt),
+                                                   _estimate_tokens(prompt))
+        except Exception as e:
+            print(f"LLM API Error: {e}")
+            raise
+        self._store(key, text)
+        return text
+    
+    def _finish_async(self, key: str, task: asyncio.Task) -> None:
+        """
+        Forget a finished async call, retrieving its error so it is not
+        reported as unhandled when every waiter was cancelled.
+        
+        Args:
+            key: Cache key of the request
+            task: The finished call
+        """
+        self._in_flight_async.pop(key, None)
+        if not task.cancelled():
+            task.exception()
+    
+    def _stream(self, key: str, context: str, question: str) -> Iterator[str]:
+        """
+        Stream one API call, caching the answer if it completes.
+        
+        Args:
+            key: Cache key of the request
+            context: The document context
+            question: The user's question
+        
+        Yields:
+            Successive pieces of the response text; if the request fails
+            (possibly after some text), its error is raised
+        """
+        prompt = self._prompt(context, question)
+        parts = []
+        try:
+            for text in self.transport.stream(lambda: self.backend.stream(prompt), _estimate_tokens(prompt)):
+                parts.append(text)
+                yield text
+        except Exception as e:
+            print(f"LLM API Error: {e}")
+            raise
+        self._store(key, ''.join(parts))
+    
+    async def _stream_async(self, key: str, context: str, question: str) -> AsyncIterator[str]:
+        """
+        Stream one API call without blocking the event loop, caching the
+        answer if it completes.
+        
+        Args:
+            key: Cache key of the request
+            context: The document context
+            question: The user's question
+        
+        Yields:
+            Successive pieces of the response text; if the request fails
+            (possibly after some text), its error is raised
+        """
+        prompt = self._prompt(context, question)
+        parts = []
+        try:
+            async for text in self.transport.stream_async(lambda: self.backend.stream_async(prompt),
+                                                          _estimate_tokens(prompt)):
+                parts.append(text)
+                yield text
+        except Exception as e:
+            print(f"LLM API Error: {e}")
+            raise
+        self._store(key, ''.join(parts))
+    
+    def _lookup(self, key: str) -> Optional[str]:
+        """
+        Look up a cached answer.
+        
+        Args:
+            key: Cache key of the request
+        
+        Returns:
+            The answer, or None on a miss or without a cache
+        """
+        return self.cache.get(key) if self.cache is not None else None
+    
+    def _store(self, key: str, response: str) -> None:
+        """
+        Cache an answer, if there is a cache.
+        
+        Args:
+            key: Cache key of the request
+            response: The complete response text
+        """
+        if self.cache is not None:
+            self.cache.put(key, response)
+    
+    def _prompt(self, context: str, question: str) -> str:
+        """
+        Build the prompt sent to the model.
+        
+        Args:
+            context: The document context
+            question: The user's question
+        
+        Returns:
+            Prompt text
+        """
+        return f"""Context: {context}
 
 Question: {question}
 
 Answer:"""
+
+    def _batch_prompt(self, context: str, questions: List[str]) -> str:
+        """
+        Build a prompt asking several questions, with numbered answers.
         
-        try:
-            response = self.model.generate_content(prompt)
-            return response.text
-        except Exception as e:
-            print(f"LLM API Error: {e}")
-            return "API Error"
+        Args:
+            context: The document context
+            questions: The user's questions
+        
+        Returns:
+            Prompt text
+        """
+        numbered = "\n".join(f"{n}. {question}" for n, question in enumerate(questions, 1))
+        return f"""Context: {context}
+
+Answer each of the following questions using the context. For each question,
+write a line "Answer N:" (N is the question's number), then its answer.
+
+Questions:
+{numbered}
+
+Answers:"""
+
+
+def _estimate_tokens(text: str) -> int:
+    """
+    Rough token count of a prompt, for rate limiting.
+    
+    Args:
+        text: Prompt text
+    
+    Returns:
+        Estimated number of tokens
+    """
+    return int(len(text.split()) / 0.75)
+
+
+def _split_answers(reply: str, count: int) -> List[Optional[str]]:
+    """
+    Split the reply to a multi-question prompt into its numbered answers.
+    
+    Args:
+        reply: The model's response text
+        count: Number of questions asked
+    
+    Returns:
+        The answer to each question, or None where it is missing or empty
+    """
+    answers: List[Optional[str]] = [None] * count
+    markers = list(ANSWER_MARKER.finditer(reply))
+    for m, marker in enumerate(markers):
+        n = int(marker.group(1))
+        end = markers[m + 1].start() if m + 1 < len(markers) else len(reply)
+        text = reply[marker.end():end].strip()
+        if 1 <= n <= count and answers[n - 1] is None and text:
+            answers[n - 1] = text
+    return answers
+
+
+async def _single_async(text: str) -> AsyncIterator[str]:
+    """
+    Async iterator over one piece of text.
+    
+    Args:
+        text: The text to yield
+    
+    Yields:
+        The text
+    """
+    yield text
@@ -0,0 +1,238 @@
+"""
+Parallel Chunk Pruning for the SignalCore Pipeline
+
+Pruning each chunk is independent of every other chunk, so Stage 2 can fan
+out across cores. This module runs the pruner's selection (or, for token
+budgets, scoring) step serially, on a thread pool, or on a process pool.
+
+In process mode the document text is never sent to workers. Scoring only
+needs the interned term ids, so the parent copies the id and offset arrays
+(and any document-wide term statistics) into one shared-memory block; each
+task carries the block name and a batch of chunk ranges, and returns the
+sentence numbers to keep. The parent then
+builds the output from slices of the original text.
+"""
+
+import os
+from array import array
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Sequence, Tuple
+from backend.algorithms.pruner import SentencePruner
+from backend.algorithms.vocabulary import SentenceTerms, TermStatistics
+from backend.profiling import NULL_PROFILER, StageProfiler
+
+
+class PruningExecutor:
+    """
+    Runs SentencePruner selection over many chunks in a chosen execution mode.
+    
+    Results are always returned in chunk order, whatever the mode.
+    """
+    
+    # Available execution modes
+    MODES = ('serial', 'thread', 'process')
+    
+    # Chunk batches submitted per worker; more than one evens out batches
+    # that happen to contain longer chunks
+    BATCHES_PER_WORKER = 2
+    
+    def __init__(self, pruner: SentencePruner, mode: str = 'serial', workers: int = None):
+        """
+        Initialize the executor. Worker pools are started on first use.
+        
+        Args:
+            pruner: Pruner whose configuration every worker uses
+            mode: 'serial', 'thread' or 'process'
+            workers: Pool size (defaults to the number of CPUs)
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown execution mode '{mode}', expected one of {self.MODES}")
+        
+        self.pruner = pruner
+        self.mode = mode
+        self.workers = workers or os.cpu_count() or 1
+        self._pool: Executor = None
+    
+    def select_spans(self, terms: SentenceTerms, spans: Sequence[Tuple[int, int]],
+                     profiler: StageProfiler = NULL_PROFILER, relevance: Dict[int, float] = None,
+                     statistics: TermStatistics = None) -> List[List[int]]:
+        """
+        Choose which sentences to keep in every chunk.
+        
+        Args:
+            terms: Term ids of the document's sentences
+            spans: (lo, hi) sentence range of each chunk
+            profiler: Records pruner sub-steps; only used when chunks are
+                pruned in this thread
+            relevance: Query relevance of matching sentences, by sentence number
+            statistics: Document-wide chunk frequencies, read by every worker
+        
+        Returns:
+            For each chunk, the sentence numbers to keep in original order
+        """
+        batches = self._batches(spans)
+        if self.mode == 'serial' or len(batches) <= 1:
+            return self.pruner.select_terms(terms, spans, profiler, relevance, statistics)
+        
+        if self.mode == 'thread':
+            results = self._get_pool().map(
+                lambda batch: self.pruner.select_terms(terms, batch, relevance=relevance, statistics=statistics), batches)
+            return [selected for batch in results for selected in batch]
+        
+        results = self._run_shared('select_terms', terms, batches, relevance, statistics)
+        return [selected for batch in results for selected in batch]
+    
+    def score_spans(self, terms: SentenceTerms, spans: Sequence[Tuple[int, int]],
+                    profiler: StageProfiler = NULL_PROFILER, relevance: Dict[int, float] = None,
+                    statistics: TermStatistics = None) -> List[float]:
+        """
+        Score the sentences of every chunk.
+        
+        Args:
+            terms: Term ids of the document's sentences
+            spans: (lo, hi) sentence range of each chunk
+            profiler: Records pruner sub-steps; only used when chunks are
+                scored in this thread
+            relevance: Query relevance of matching sentences, by sentence number
+            statistics: Document-wide chunk frequencies, read by every worker
+        
+        Returns:
+            One score per sentence, chunk after chunk
+        """
+        batches = self._batches(spans)
+        if self.mode == 'serial' or len(batches) <= 1:
+            return self.pruner.score_terms(terms, spans, profiler, relevance, statistics)
+        
+        if self.mode == 'thread':
+            results = self._get_pool().map(
+                lambda batch: self.pruner.score_terms(terms, batch, relevance=relevance, statistics=statistics), batches)
+        else:
+            results = self._run_shared('score_terms', terms, batches, relevance, statistics)
+        return [score for batch in results for score in batch]
+    
+    def close(self) -> None:
+        """Shut down the worker pool, if one was started."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+    
+    def __enter__(self) -> 'PruningExecutor':
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+    
+    def _run_shared(self, method: str, terms: SentenceTerms, batches: List[List[Tuple[int, int]]],
+                    relevance: Dict[int, float] = None, statistics: TermStatistics = None) -> List[list]:
+        """
+        Run a pruner method on a process pool over a shared-memory copy of the term ids.
+        
+        Args:
+            method: 'select_terms' or 'score_terms'
+            terms: Term ids of the document's sentences
+            batches: Consecutive groups of chunk ranges
+            relevance: Query relevance of matching sentences (sparse, so
+                it is sent to workers as is)
+            statistics: Document-wide chunk frequencies, copied into the
+                block after the offsets
+        
+        Returns:
+            The method's result for each batch, in batch order
+        """
+        ids = terms.ids if isinstance(terms.ids, array) else array('I', terms.ids)
+        offsets = terms.offsets if isinstance(terms.offsets, array) else array('q', terms.offsets)
+        frequencies = array('I')
+        num_chunks = -1
+        if statistics is not None:
+            frequencies = statistics.chunk_frequencies
+            if not isinstance(frequencies, array):
+                frequencies = array('I', frequencies)
+            num_chunks = statistics.num_chunks
+        ids_size = len(ids) * ids.itemsize
+        offsets_end = ids_size + len(offsets) * offsets.itemsize
+        
+        block = shared_memory.SharedMemory(create=True, size=max(offsets_end + len(frequencies) * 4, 1))
+        try:
+            block.buf[:ids_size] = memoryview(ids).cast('B')
+            block.buf[ids_size:offsets_end] = memoryview(offsets).cast('B')
+            block.buf[offsets_end:offsets_end + len(frequencies) * 4] = memoryview(frequencies).cast('B')
+            
+            shared = (block.name, len(ids), len(offsets), terms.num_terms, len(frequencies), num_chunks)
+            futures = [self._get_pool().submit(_run_shared_batch, self.pruner, method, shared, batch, relevance)
+                       for batch in batches]
+            return [future.result() for future in futures]
+        finally:
+            block.close()
+            block.unlink()
+    
+    def _batches(self, spans: Sequence[Tuple[int, int]]) -> List[List[Tuple[int, int]]]:
+        """
+        Split chunk ranges into consecutive batches, one task each.
+        
+        Args:
+            spans: (lo, hi) sentence range of each chunk
+        
+        Returns:
+            Consecutive, non-empty groups of spans
+        """
+        num_batches = max(1, min(len(spans), self.workers * self.BATCHES_PER_WORKER))
+        size, extra = divmod(len(spans), num_batches)
+        batches = []
+        start = 0
+        for b in range(num_batches):
+            end = start + size + (1 if b < extra else 0)
+            batches.append(list(spans[start:end]))
+            start = end
+        return batches
+    
+    def _get_pool(self) -> Executor:
+        """
+        Start the worker pool on first use.
+        
+        Returns:
+            The thread or process pool
+        """
+        if self._pool is None:
+            if self.mode == 'thread':
+                self._pool = ThreadPoolExecutor(max_workers=self.workers)
+            else:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+
+def _run_shared_batch(pruner: SentencePruner, method: str, shared: Tuple[str, int, int, int, int, int],
+                      spans: List[Tuple[int, int]], relevance: Dict[int, float] = None) -> list:
+    """
+    Worker task: select or score sentences for a batch of chunks from shared memory.
+    
+    Args:
+        pruner: Pruner to run (small; its configuration travels with it)
+        method: 'select_terms' or 'score_terms'
+        shared: (block name, number of ids, number of offsets, vocabulary
+            size, number of chunk frequencies, number of chunks or -1 when
+            there are no statistics)
+        spans: (lo, hi) sentence range of each chunk in the batch
+        relevance: Query relevance of matching sentences, by sentence number
+    
+    Returns:
+        The pruner method's result for the batch
+    """
+    name, num_ids, num_offsets, num_terms, num_frequencies, num_chunks = shared
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        ids_size = num_ids * 4
+        offsets_end = ids_size + num_offsets * 8
+        ids = block.buf[:ids_size].cast('I')
+        offsets = block.buf[ids_size:offsets_end].cast('q')
+        frequencies = block.buf[offsets_end:offsets_end + num_frequencies * 4].cast('I')
+        statistics = TermStatistics(frequencies, num_chunks) if num_chunks >= 0 else None
+        try:
+            return getattr(pruner, method)(SentenceTerms(None, ids, offsets, num_terms), spans,
+                                           relevance=relevance, statistics=statistics)
+        finally:
+            ids.release()
+            offsets.release()
+            frequencies.release()
+    finally:
+        block.close()
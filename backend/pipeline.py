@@ -3,12 +3,92 @@ SignalCore Pipeline - Orchestrates the two-stage optimization process
 
 This module combines the Semantic Chunker (Stage 1) and Sentence-Level Pruner
 (Stage 2) to create an optimized context for LLM consumption. It also calculates
-token reduction metrics.
+token reduction metrics, summed from the token cost of each sentence, which is
+computed once when the document is segmented.
 """
 
-from typing import Tuple, Dict
-from backend.algorithms.chunker import SemanticChunker
+import os
+import sys
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from backend.algorithms.bm25 import BM25Index
+from backend.algorithms.chunker import SemanticChunker, Source
 from backend.algorithms.pruner import SentencePruner
+from backend.algorithms.sentences import SentenceIndex, sentence_list, split_sentences
+from backend.algorithms.tokens import get_tokenizer
+from backend.algorithms.vocabulary import SentenceTerms, TermStatistics
+from backend.boilerplate import BoilerplateIndex
+from backend.cache import PipelineCache, content_key
+from backend.parallel import PruningExecutor
+from backend.profiling import NULL_PROFILER, NullProfiler, StageHook, StageProfiler
+
+if TYPE_CHECKING:
+    # The corpus index needs NumPy; the pipeline only uses one passed in
+    from backend.corpus import CorpusIndex
+
+
+class IncrementalState:
+    """
+    What process_incremental() remembers between runs: the pruned output of
+    each chunk and its token cost, keyed by a hash of the chunk content and
+    pipeline settings.
+    """
+    
+    def __init__(self, pruned_chunks: Dict[str, str] = None, chunk_costs: Dict[str, int] = None):
+        """
+        Args:
+            pruned_chunks: Pruned chunk text by chunk key
+            chunk_costs: Token cost of each pruned chunk, by chunk key
+        """
+        self.pruned_chunks = pruned_chunks or {}
+        self.chunk_costs = chunk_costs or {}
+    
+    def __len__(self) -> int:
+        return len(self.pruned_chunks)
+
+
+class PreparedDocument:
+    """
+    The query-independent part of a query-aware run over one document: its
+    sentences after deduplication, chunk spans, sentence scores without a
+    query and BM25 index. Each question about the document only adds its
+    relevance to the scores and selects again.
+    """
+    
+    def __init__(self, index: SentenceIndex, chunk_spans: List[Tuple[int, int]], scores: List[float],
+                 bm25: BM25Index, original_tokens: int, duplicates_removed: int = 0):
+        """
+        Args:
+            index: Sentence index of the document, after deduplication
+            chunk_spans: (lo, hi) sentence range of each chunk
+            scores: One score per sentence without a query, chunk after chunk
+            bm25: BM25 index of the sentences
+            original_tokens: Token count of the whole document
+            duplicates_removed: Sentences removed as near-duplicates
+        """
+        self.index = index
+        self.chunk_spans = chunk_spans
+        self.scores = scores
+        self.bm25 = bm25
+        self.original_tokens = original_tokens
+        self.duplicates_removed = duplicates_removed
+    
+    def size(self) -> int:
+        """
+        Approximate memory footprint, for the cache's byte budget.
+        
+        Returns:
+            Size in bytes
+        """
+        index = self.index
+        bm25 = self.bm25
+        arrays = [index.starts, index.ends, index.word_counts, index.token_costs, bm25.lengths]
+        return (sys.getsizeof(index.text) + sum(map(sys.getsizeof, arrays)) + sys.getsizeof(self.scores)
+                + 8 * len(self.scores) + sys.getsizeof(self.chunk_spans) + 64 * len(self.chunk_spans)
+                + sys.getsizeof(bm25.keys) + sum(map(sys.getsizeof, bm25.keys))
+                + sum(map(sys.getsizeof, bm25.sentences)) + sum(map(sys.getsizeof, bm25.frequencies)))
 
 
 class SignalCorePipeline:
@@ -22,38 +102,433 @@ class SignalCorePipeline:
     efficiency gains.
     """
     
-    def __init__(self):
-        """Initialize the pipeline with chunker and pruner instances."""
-        self.chunker = SemanticChunker()
-        self.pruner = SentencePruner()
+    # Target size of one process_many() work unit; consecutive small
+    # documents are packed together up to this many characters
+    BATCH_UNIT_CHARS = 256 * 1024
     
-    def process(self, document: str) -> Tuple[str, Dict[str, float]]:
+    def __init__(self, scorer: str = 'counter', execution: str = 'serial', workers: int = None,
+                 cache: PipelineCache = None, profile: bool = False, profile_memory: bool = True,
+                 profile_hook: StageHook = None, token_budget: int = None, min_sentences_per_chunk: int = 1,
+                 dedup_threshold: float = None, boilerplate: BoilerplateIndex = None,
+                 extraction_ratio: float = None, global_weight: float = None, tokenizer: str = 'heuristic',
+                 min_chunk_size: int = None, max_chunk_size: int = None):
+        """
+        Initialize the pipeline with chunker and pruner instances.
+        
+        Args:
+            scorer: Pruner scoring backend, 'counter' or 'vectorized'
+            execution: How chunks are pruned: 'serial', 'thread' or 'process'
+            workers: Worker pool size for thread/process execution
+                (defaults to the number of CPUs)
+            cache: Optional result cache, keyed by document content and
+                pipeline configuration. Not used with a boilerplate index,
+                whose state changes as documents are processed
+            profile: Record wall time, CPU time and peak memory of each
+                stage and report them under metrics["stages"]
+            profile_memory: Include tracemalloc peak memory when profiling
+                (tracing slows the run down noticeably)
+            profile_hook: Optional callback(stage, record) invoked as each
+                stage finishes, when profiling
+            token_budget: If set, ignore the per-chunk extraction ratio and
+                keep the highest-scoring sentences of the whole document
+                whose token count fits this budget
+            min_sentences_per_chunk: In budget mode, sentences kept from
+                every chunk (budget permitting) so no region is dropped
+            dedup_threshold: If set, remove near-duplicate sentences across
+                the whole document before chunking, keeping the first of
+                each cluster; the estimated Jaccard similarity of word
+                shingles at which sentences count as duplicates
+            boilerplate: Optional cross-document sentence index; sentences
+                found in too many past documents are dropped, and every
+                processed document is recorded in it
+            extraction_ratio: Fraction of each chunk's sentences to keep
+                (defaults to SentencePruner.EXTRACTION_RATIO); query-aware
+                runs stay accurate at much lower ratios such as 0.1
+            global_weight: Share of document-wide rarity (how many chunks
+                contain a word) in each word's inverse frequency, 0.0 to 1.0
+                (defaults to SentencePruner.GLOBAL_WEIGHT); when non-zero,
+                chunk frequencies are counted once per document and shared
+                with every pruner worker
+            tokenizer: Tokenizer for token metrics and the token budget:
+                'heuristic' (words / 0.75) or the path of a tiktoken-format
+                rank file
+            min_chunk_size: Words a chunk needs before it may be closed
+                (defaults to SemanticChunker.MIN_CHUNK_SIZE)
+            max_chunk_size: Words a chunk may hold (defaults to
+                SemanticChunker.MAX_CHUNK_SIZE)
+        """
+        self.chunker = SemanticChunker(min_chunk_size, max_chunk_size)
+        self.pruner = SentencePruner(scorer=scorer, extraction_ratio=extraction_ratio, global_weight=global_weight)
+        self.executor = PruningExecutor(self.pruner, mode=execution, workers=workers)
+        # A cached result would keep the boilerplate removal of its first
+        # run, and a hit would never record the document in the index
+        self.cache = cache if boilerplate is None else None
+        self.profile = profile
+        self.profile_memory = profile_memory
+        self.profile_hook = profile_hook
+        self.tokenizer = get_tokenizer(tokenizer)
+        self.tokenizer_name = tokenizer
+        self.token_budget = token_budget
+        self.min_sentences_per_chunk = min_sentences_per_chunk
+        self.boilerplate = boilerplate
+        self.dedup_threshold = dedup_threshold
+        self._batch_pool: ProcessPoolExecutor = None
+        self._batch_workers = 0
+        self._batch_lock = threading.Lock()
+        self.deduplicator = None
+        if dedup_threshold is not None:
+            # Imported lazily so NumPy is only required when deduplicating
+            from backend.algorithms.dedup import NearDuplicateFilter
+            self.deduplicator = NearDuplicateFilter(dedup_threshold)
+    
+    def close(self) -> None:
+        """Shut down any worker pool started by the pipeline."""
+        self.executor.close()
+        with self._batch_lock:
+            if self._batch_pool is not None:
+                self._batch_pool.shutdown()
+                self._batch_pool = None
+    
+    def __enter__(self) -> 'SignalCorePipeline':
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+    
+    def process(self, document: str, query: str = None) -> Tuple[str, Dict[str, float]]:
         """
         Run full two-stage optimization on the document.
         
         Args:
             document: Full document text with injected needle
-            
+            query: Optional user question; when given, sentences are also
+                ranked by BM25 relevance to it (query-aware pruning)
+        
         Returns:
             Tuple containing:
                 - optimized_context: Processed text ready for LLM
                 - metrics: Dictionary with token counts and reduction percentage
+                  (plus cache_hits/cache_misses totals when caching,
+                  query_matches for a query, and per-stage timings under
+                  "stages" when profiling)
         """
-        # Calculate original token count
-        original_tokens = self._count_tokens(document)
+        if self.cache is None:
+            return self._process(document, query)
         
-        # Stage 1: Chunk the document
-        chunks = self.chunker.chunk(document)
+        # Questions reuse the document's query-independent work
+        if query:
+            key = content_key(document, self._settings())
+            prepared = self.cache.get_document(key)
+            result, fresh = self._process_prepared(document, query, prepared)
+            if fresh is not None:
+                self.cache.put_document(key, fresh, fresh.size())
+            return self._with_cache_totals(result)
         
-        # Stage 2: Prune each chunk
-        pruned_chunks = [self.pruner.prune(chunk) for chunk in chunks]
+        key = content_key(document, dict(self._settings(), query=None))
+        result = self.cache.get(key)
+        if result is None:
+            result = self._cache_result(key, self._process(document))
+        return self._with_cache_totals(result)
+    
+    def process_pool(self, workers: int = None) -> ProcessPoolExecutor:
+        """
+        Start a process pool for submit_process(), with every worker preloaded.
         
-        # Combine pruned chunks
-        optimized_context = "\n\n".join(pruned_chunks)
+        Each worker builds its own copy of this pipeline (without the
+        result cache, which stays in this process) before it takes work,
+        and all workers are started before this returns. A boilerplate
+        index must be shared (file backed), or the workers' updates would
+        be lost.
+        
+        Args:
+            workers: Number of worker processes (defaults to the number of CPUs)
         
-        # Calculate optimized token count
-        optimized_tokens = self._count_tokens(optimized_context)
+        Returns:
+            The running pool; the caller shuts it down
+        """
+        if self.boilerplate is not None and not self.boilerplate.shared:
+            raise ValueError("Worker processes would each update their own copy of an in-memory "
+                             "boilerplate index; use a file-backed one")
+        
+        workers = workers or os.cpu_count() or 1
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker,
+                                   initargs=(dict(self._config(), cache=None),))
+        
+        # Submitting one task per worker at once makes the pool start them all
+        for future in [pool.submit(os.getpid) for _ in range(workers)]:
+            future.result()
+        return pool
+    
+    def submit_process(self, pool: ProcessPoolExecutor, document: str, query: str = None) -> Future:
+        """
+        Run process() on a pool from process_pool(), without blocking.
+        
+        The result cache is checked and filled in this process, so a hit
+        never reaches the pool. With a question, a document prepared before
+        is sent to the pool instead of its text, and only the question's
+        part of the run is done there.
+        
+        Args:
+            pool: Pool returned by process_pool()
+            document: Full document text
+            query: Optional user question for query-aware pruning
+        
+        Returns:
+            Future of (optimized_context, metrics), as returned by process()
+        """
+        if self.cache is None:
+            return pool.submit(_process_pooled, document, query)
+        
+        future = Future()
+        if query:
+            key = content_key(document, self._settings())
+            prepared = self.cache.get_document(key)
+            
+            def finish_prepared(pooled: Future) -> None:
+                try:
+                    result, fresh = pooled.result()
+                    if fresh is not None:
+                        self.cache.put_document(key, fresh, fresh.size())
+                    future.set_result(self._with_cache_totals(result))
+                except BaseException as e:
+                    future.set_exception(e)
+            
+            # A prepared document carries its text
+            pooled = pool.submit(_process_prepared_pooled, None if prepared else document, query, prepared)
+            pooled.add_done_callback(finish_prepared)
+            return future
+        
+        key = content_key(document, dict(self._settings(), query=None))
+        result = self.cache.get(key)
+        if result is not None:
+            future.set_result(self._with_cache_totals(result))
+            return future
+        
+        def finish(pooled: Future) -> None:
+            try:
+                future.set_result(self._with_cache_totals(self._cache_result(key, pooled.result())))
+            except BaseException as e:
+                future.set_exception(e)
+        
+        pool.submit(_process_pooled, document).add_done_callback(finish)
+        return future
+    
+    def _cache_result(self, key: str, result: Tuple[str, Dict[str, float]]) -> Tuple[str, Dict[str, float]]:
+        """
+        Store a fresh result in the cache.
+        
+        Args:
+            key: Cache key of the document and settings
+            result: (optimized_context, metrics) from _process()
+        
+        Returns:
+            The result, unchanged
+        """
+        # Stage timings describe this run only, so they are not cached
+        optimized_context, metrics = result
+        self.cache.put(key, (optimized_context, {k: v for k, v in metrics.items() if k != "stages"}))
+        return result
+    
+    def _with_cache_totals(self, result: Tuple[str, Dict[str, float]]) -> Tuple[str, Dict[str, float]]:
+        """
+        Add the cache's running hit and miss totals to a result's metrics.
+        
+        Args:
+            result: (optimized_context, metrics)
         
+        Returns:
+            (optimized_context, metrics with cache_hits and cache_misses)
+        """
+        optimized_context, metrics = result
+        return optimized_context, dict(metrics, cache_hits=self.cache.hits, cache_misses=self.cache.misses)
+    
+    def _process(self, document: str, query: str = None) -> Tuple[str, Dict[str, float]]:
+        """
+        Run the two-stage optimization, bypassing the cache.
+        
+        Args:
+            document: Full document text
+            query: Optional user question for query-aware pruning
+        
+        Returns:
+            Tuple of optimized_context and metrics, as for process()
+        """
+        profiler = self._profiler()
+        profiler.start()
+        try:
+            # Split the document into sentences once, counting each one's
+            # tokens; every stage works on this index
+            with profiler.stage('split_sentences'):
+                index = split_sentences(document, self.tokenizer)
+            
+            # Calculate original token count
+            with profiler.stage('count_tokens'):
+                original_tokens = index.token_count()
+            
+            # Intern every word once; the pruner scores on these term ids
+            with profiler.stage('encode_terms'):
+                terms = SentenceTerms.from_index(index)
+            
+            # Drop sentences that past documents share (footers, disclaimers)
+            boilerplate_removed = 0
+            if self.boilerplate is not None:
+                with profiler.stage('boilerplate'):
+                    kept = self.boilerplate.update(index)
+                    boilerplate_removed = len(index) - len(kept)
+                    if boilerplate_removed:
+                        index = index.subset(kept)
+                        terms = terms.subset(kept)
+            
+            # Drop near-duplicate sentences across the whole document
+            duplicates_removed = 0
+            if self.deduplicator is not None:
+                with profiler.stage('dedup'):
+                    kept = self.deduplicator.keep(terms)
+                    duplicates_removed = len(index) - len(kept)
+                    if duplicates_removed:
+                        index = index.subset(kept)
+                        terms = terms.subset(kept)
+            
+            # Index the sentences and rank them against the question
+            relevance = None
+            if query:
+                with profiler.stage('query'):
+                    relevance = BM25Index(terms).relevance(query)
+            
+            # Stage 1: Chunk the document, counting in how many chunks each
+            # term occurs when global rarity is weighted in
+            with profiler.stage('chunk'):
+                chunk_spans = self.chunker.chunk_spans(index)
+                statistics = self._statistics(terms, chunk_spans)
+            
+            # Stage 2: Prune each chunk (possibly in parallel), or select
+            # sentences document-wide to fit the token budget
+            with profiler.stage('prune'):
+                selected = self._prune(index, terms, chunk_spans, profiler, relevance, statistics)
+            
+            # Combine pruned chunks, built from slices of the original document
+            with profiler.stage('join'):
+                optimized_context = "\n\n".join([index.join(sentences) for sentences in selected if sentences])
+            
+            # Calculate optimized token count from the kept sentences
+            with profiler.stage('count_tokens'):
+                optimized_tokens = index.token_count(i for sentences in selected for i in sentences)
+        finally:
+            profiler.stop()
+        
+        metrics = self._metrics(original_tokens, optimized_tokens, relevance, duplicates_removed, profiler)
+        if self.boilerplate is not None:
+            metrics["boilerplate_removed"] = boilerplate_removed
+        return optimized_context, metrics
+    
+    def _process_prepared(self, document: Optional[str], query: str,
+                          prepared: PreparedDocument = None) -> Tuple[Tuple[str, Dict[str, float]],
+                                                                      Optional[PreparedDocument]]:
+        """
+        Run the query-aware optimization on a prepared document.
+        
+        Selects the same sentences as _process(); a run without the
+        prepared document also returns it, for the cache.
+        
+        Args:
+            document: Full document text (unused if prepared is given)
+            query: The user's question
+            prepared: The document's query-independent work, or None to
+                prepare it now
+        
+        Returns:
+            ((optimized_context, metrics) as for process(), the newly
+            prepared document or None)
+        """
+        profiler = self._profiler()
+        profiler.start()
+        try:
+            fresh = None
+            if prepared is None:
+                prepared = fresh = self._prepare(document, profiler)
+            index = prepared.index
+            
+            # Rank the sentences against the question
+            with profiler.stage('query'):
+                relevance = prepared.bm25.relevance(query)
+            
+            # Blend the relevance into the stored scores and select again
+            with profiler.stage('prune'):
+                scores = self.pruner.add_relevance(prepared.scores, prepared.chunk_spans, relevance)
+                selected = self._select_scored(index, prepared.chunk_spans, scores, profiler)
+            
+            with profiler.stage('join'):
+                optimized_context = "\n\n".join([index.join(sentences) for sentences in selected if sentences])
+            
+            with profiler.stage('count_tokens'):
+                optimized_tokens = index.token_count(i for sentences in selected for i in sentences)
+        finally:
+            profiler.stop()
+        
+        metrics = self._metrics(prepared.original_tokens, optimized_tokens, relevance, prepared.duplicates_removed,
+                                profiler)
+        return (optimized_context, metrics), fresh
+    
+    def _prepare(self, document: str, profiler: Union[StageProfiler, NullProfiler]) -> PreparedDocument:
+        """
+        Do the query-independent part of a query-aware run.
+        
+        Every sentence is scored without the query, so the stored scores
+        serve any question.
+        
+        Args:
+            document: Full document text
+            profiler: Profiler of the current run
+        
+        Returns:
+            The prepared document
+        """
+        with profiler.stage('split_sentences'):
+            index = split_sentences(document, self.tokenizer)
+        
+        with profiler.stage('count_tokens'):
+            original_tokens = index.token_count()
+        
+        with profiler.stage('encode_terms'):
+            terms = SentenceTerms.from_index(index)
+        
+        duplicates_removed = 0
+        if self.deduplicator is not None:
+            with profiler.stage('dedup'):
+                kept = self.deduplicator.keep(terms)
+                duplicates_removed = len(index) - len(kept)
+                if duplicates_removed:
+                    index = index.subset(kept)
+                    terms = terms.subset(kept)
+        
+        with profiler.stage('chunk'):
+            chunk_spans = self.chunker.chunk_spans(index)
+            statistics = self._statistics(terms, chunk_spans)
+        
+        with profiler.stage('prune'):
+            scores = self.executor.score_spans(terms, chunk_spans, profiler, None, statistics)
+        
+        with profiler.stage('query_index'):
+            bm25 = BM25Index(terms)
+        
+        return PreparedDocument(index, chunk_spans, scores, bm25, original_tokens, duplicates_removed)
+    
+    def _metrics(self, original_tokens: int, optimized_tokens: int, relevance: Optional[Dict[int, float]],
+                 duplicates_removed: int, profiler: Union[StageProfiler, NullProfiler]) -> Dict[str, float]:
+        """
+        Metrics of a finished run.
+        
+        Args:
+            original_tokens: Token count of the document
+            optimized_tokens: Token count of the optimized context
+            relevance: Query relevance of matching sentences, or None
+                without a query
+            duplicates_removed: Sentences removed as near-duplicates
+            profiler: Profiler of the run, already stopped
+        
+        Returns:
+            Metrics dictionary, as for process()
+        """
         # Calculate reduction percentage
         reduction_percentage = 0.0
         if original_tokens > 0:
@@ -66,19 +541,557 @@ class SignalCorePipeline:
             "reduction_percentage": reduction_percentage
         }
         
-        return optimized_context, metrics
+        if self.token_budget is not None:
+            metrics["token_budget"] = self.token_budget
+        
+        if relevance is not None:
+            metrics["query_matches"] = len(relevance)
+        
+        if self.deduplicator is not None:
+            metrics["duplicates_removed"] = duplicates_removed
+        
+        if profiler.enabled:
+            metrics["stages"] = profiler.report()
+        
+        return metrics
     
-    def _count_tokens(self, text: str) -> int:
+    def process_corpus(self, corpus: 'CorpusIndex', query: str, top_k: int = 8) -> Tuple[str, Dict[str, float]]:
         """
-        Approximate token count using word-based estimation.
+        Answer-oriented optimization over a document collection.
         
-        Rule of thumb: 1 token ≈ 0.75 words
+        The top_k chunks of the corpus by BM25 are retrieved, and only those
+        are pruned (query-aware, each chunk on its own); the rest of the
+        corpus never enters the pipeline.
         
         Args:
-            text: The text to count tokens for
+            corpus: Corpus index the documents were ingested into
+            query: The user's question
+            top_k: Number of chunks to retrieve
+        
+        Returns:
+            Tuple containing:
+                - optimized_context: Pruned retrieved chunks, best match first
+                - metrics: Token metrics of the retrieved chunks plus
+                  retrieved_chunks and corpus_chunks
+        """
+        profiler = self._profiler()
+        profiler.start()
+        try:
+            with profiler.stage('retrieve'):
+                chunks = corpus.fetch([chunk_id for chunk_id, _ in corpus.search(query, top_k)])
+            
+            # Index the retrieved chunks' sentences as one text, keeping each
+            # chunk as a pruning unit
+            with profiler.stage('split_sentences'):
+                chunk_sentences = [sentence_list(chunk) for chunk in chunks]
+                index = SentenceIndex.from_sentences([sentence for sentences in chunk_sentences for sentence in sentences],
+                                                     tokenizer=self.tokenizer)
+                chunk_spans = []
+                for sentences in chunk_sentences:
+                    lo = chunk_spans[-1][1] if chunk_spans else 0
+                    chunk_spans.append((lo, lo + len(sentences)))
+            
+            with profiler.stage('encode_terms'):
+                terms = SentenceTerms.from_index(index)
+                statistics = self._statistics(terms, chunk_spans)
             
+            with profiler.stage('query'):
+                relevance = BM25Index(terms).relevance(query) if len(index) else None
+            
+            with profiler.stage('prune'):
+                selected = self._prune(index, terms, chunk_spans, profiler, relevance or None, statistics)
+            
+            with profiler.stage('join'):
+                optimized_context = "\n\n".join([index.join(sentences) for sentences in selected if sentences])
+        finally:
+            profiler.stop()
+        
+        original_tokens = index.token_count()
+        optimized_tokens = index.token_count(i for sentences in selected for i in sentences)
+        reduction_percentage = 0.0
+        if original_tokens > 0:
+            reduction_percentage = ((original_tokens - optimized_tokens) / original_tokens) * 100
+        
+        metrics = {
+            "original_tokens": original_tokens,
+            "optimized_tokens": optimized_tokens,
+            "reduction_percentage": reduction_percentage,
+            "retrieved_chunks": len(chunks),
+            "corpus_chunks": len(corpus)
+        }
+        
+        if profiler.enabled:
+            metrics["stages"] = profiler.report()
+        
+        return optimized_context, metrics
+    
+    def process_incremental(self, document: str,
+                            state: IncrementalState = None) -> Tuple[str, Dict[str, float], IncrementalState]:
+        """
+        Re-optimize an edited document, re-pruning only the chunks that changed.
+        
+        The document is re-chunked (cheap), and every chunk whose content is
+        the same as a chunk of the previous run reuses that chunk's pruned
+        output. The greedy chunker shifts boundaries after an edit only until
+        they line up with the old ones again, so a small edit usually leaves
+        most chunks reusable. Pruning is chunk-local, so the result is the
+        same as process(document). With global_weight, a chunk is also
+        re-pruned when the chunk frequency of any of its words changed.
+        
+        Args:
+            document: Full (edited) document text
+            state: State returned by the previous run, or None for a first run
+        
+        Returns:
+            Tuple containing:
+                - optimized_context: Processed text ready for LLM
+                - metrics: Token metrics plus reused_chunks and pruned_chunks
+                - state: State to pass to the next run
+        """
+        self._require_chunk_local("Incremental mode")
+        
+        previous = state.pruned_chunks if state is not None else {}
+        previous_costs = state.chunk_costs if state is not None else {}
+        settings = self._settings()
+        
+        index = split_sentences(document, self.tokenizer)
+        original_tokens = index.token_count()
+        chunk_spans = self.chunker.chunk_spans(index)
+        
+        # Key each chunk by its content; reuse what the last run pruned
+        keys = [content_key(document[index.starts[lo]:index.ends[hi - 1]] if hi > lo else '', settings)
+                for lo, hi in chunk_spans]
+        
+        # Document-wide rarity makes a chunk's output depend on the rest of
+        # the document, but only through its own words' chunk frequencies,
+        # so those (in first-occurrence order) join the key
+        statistics = None
+        if self.pruner.global_weight:
+            terms = SentenceTerms.from_index(index)
+            statistics = TermStatistics.from_spans(terms, chunk_spans)
+            frequencies = statistics.chunk_frequencies
+            keys = [content_key(key, {"chunk_frequencies": [frequencies[t] for t in dict.fromkeys(terms.span(lo, hi))]})
+                    for key, (lo, hi) in zip(keys, chunk_spans)]
+        
+        pruned_chunks = [previous.get(key) for key in keys]
+        chunk_costs = [previous_costs.get(key, 0) for key in keys]
+        changed = [c for c, pruned in enumerate(pruned_chunks) if pruned is None]
+        
+        if statistics is not None:
+            # The whole document is encoded already; prune the changed
+            # chunks against its statistics
+            selected = self.executor.select_spans(terms, [chunk_spans[c] for c in changed], statistics=statistics)
+            for c, sentences in zip(changed, selected):
+                pruned_chunks[c] = index.join(sentences)
+                chunk_costs[c] = sum(map(index.token_costs.__getitem__, sentences))
+        else:
+            # Re-prune runs of consecutive changed chunks, encoding only
+            # their sentences
+            for run in _consecutive_runs(changed):
+                lo = chunk_spans[run[0]][0]
+                hi = chunk_spans[run[-1]][1]
+                view = index.view(lo, hi)
+                spans = [(chunk_spans[c][0] - lo, chunk_spans[c][1] - lo) for c in run]
+                selected = self.executor.select_spans(SentenceTerms.from_index(view), spans)
+                for c, sentences in zip(run, selected):
+                    pruned_chunks[c] = view.join(sentences)
+                    chunk_costs[c] = sum(map(view.token_costs.__getitem__, sentences))
+        
+        optimized_context = "\n\n".join(pruned_chunks)
+        optimized_tokens = self.tokenizer.tokens(sum(chunk_costs))
+        
+        reduction_percentage = 0.0
+        if original_tokens > 0:
+            reduction_percentage = ((original_tokens - optimized_tokens) / original_tokens) * 100
+        
+        metrics = {
+            "original_tokens": original_tokens,
+            "optimized_tokens": optimized_tokens,
+            "reduction_percentage": reduction_percentage,
+            "reused_chunks": len(chunk_spans) - len(changed),
+            "pruned_chunks": len(changed)
+        }
+        
+        state = IncrementalState(dict(zip(keys, pruned_chunks)), dict(zip(keys, chunk_costs)))
+        return optimized_context, metrics, state
+    
+    def process_many(self, documents: Iterable[str], workers: int = None,
+                     max_in_flight: int = None) -> Iterator[Tuple[str, Dict[str, float]]]:
+        """
+        Optimize many documents on a pool of worker processes.
+        
+        Consecutive small documents are packed into shared work units of
+        about BATCH_UNIT_CHARS, so per-task overhead does not dominate. At
+        most max_in_flight units are queued at once, which bounds memory
+        even for very large or unbounded document iterables.
+        
+        The pool is started on first use and kept for later calls until
+        close(). The result cache is checked and filled in this process,
+        so cached documents never reach the pool. With a boilerplate index
+        the workers cannot share (an in-memory one), documents are
+        processed in this process instead.
+        
+        Args:
+            documents: Documents to optimize
+            workers: Number of worker processes (defaults to the number of
+                CPUs); 1 processes documents in this process. A different
+                number than the running pool's replaces the pool
+            max_in_flight: Work units submitted but not yet yielded
+                (defaults to twice the number of workers)
+        
+        Yields:
+            (optimized_context, metrics) for each document, in input order
+        """
+        workers = workers or os.cpu_count() or 1
+        units = _pack_documents(documents, self.BATCH_UNIT_CHARS)
+        
+        if workers == 1 or (self.boilerplate is not None and not self.boilerplate.shared):
+            for unit in units:
+                for document in unit:
+                    yield self.process(document)
+            return
+        
+        pool = self._get_batch_pool(workers)
+        max_in_flight = max_in_flight or workers * 2
+        pending = deque()
+        for unit in units:
+            pending.append(self._submit_unit(pool, unit))
+            if len(pending) >= max_in_flight:
+                yield from self._unit_results(*pending.popleft())
+        
+        while pending:
+            yield from self._unit_results(*pending.popleft())
+    
+    def _get_batch_pool(self, workers: int) -> ProcessPoolExecutor:
+        """
+        Start the process_many() pool on first use, or when its size changes.
+        
+        Args:
+            workers: Number of worker processes
+        
+        Returns:
+            The running pool
+        """
+        with self._batch_lock:
+            if self._batch_pool is not None and self._batch_workers != workers:
+                self._batch_pool.shutdown()
+                self._batch_pool = None
+            if self._batch_pool is None:
+                self._batch_pool = self.process_pool(workers)
+                self._batch_workers = workers
+            return self._batch_pool
+    
+    def _submit_unit(self, pool: ProcessPoolExecutor,
+                     unit: List[str]) -> Tuple[List[str], List[Tuple[str, Dict[str, float]]], Future]:
+        """
+        Look a work unit up in the result cache and submit its misses.
+        
+        Args:
+            pool: Pool from process_pool()
+            unit: Documents packed into this unit
+        
+        Returns:
+            (cache key of each document, cached result or None for each
+            document, future of the misses' results or None if all hit);
+            without a cache, the keys are None and every result is a miss
+        """
+        if self.cache is None:
+            return [None] * len(unit), [None] * len(unit), pool.submit(_process_batch_unit, unit)
+        
+        settings = self._settings()
+        keys = [content_key(document, dict(settings, query=None)) for document in unit]
+        cached = [self.cache.get(key) for key in keys]
+        misses = [document for document, result in zip(unit, cached) if result is None]
+        return keys, cached, pool.submit(_process_batch_unit, misses) if misses else None
+    
+    def _unit_results(self, keys: List[str], cached: List[Tuple[str, Dict[str, float]]],
+                      future: Future) -> Iterator[Tuple[str, Dict[str, float]]]:
+        """
+        Merge a work unit's cached and freshly computed results, caching the fresh ones.
+        
+        Args:
+            keys: Cache key of each document, from _submit_unit()
+            cached: Cached result or None for each document
+            future: Future of the misses' results, or None
+        
+        Yields:
+            (optimized_context, metrics) for each document of the unit, in order
+        """
+        fresh = iter(future.result() if future is not None else ())
+        for key, result in zip(keys, cached):
+            if self.cache is None:
+                yield next(fresh)
+            elif result is None:
+                yield self._with_cache_totals(self._cache_result(key, next(fresh)))
+            else:
+                yield self._with_cache_totals(result)
+    
+    def process_stream(self, source: Source, encoding: str = 'utf-8') -> Iterator[str]:
+        """
+        Run the two-stage optimization incrementally over a streamed document.
+        
+        Each pruned chunk is yielded as soon as the chunker closes it, so
+        arbitrarily large inputs are processed in constant memory. Joining
+        the yielded chunks with "\\n\\n" gives the same optimized context as
+        process() on the full text. Document-wide rarity is not available
+        before the whole text has been read, so global_weight must be 0.0.
+        
+        Args:
+            source: File path, text/binary file object or mmap to read from
+            encoding: Encoding used to decode paths, binary files and mmaps
+        
+        Yields:
+            Pruned chunks, in document order
+        """
+        self._require_chunk_local("Streaming")
+        if self.pruner.global_weight:
+            raise ValueError("Streaming prunes chunks before the document is read in full; "
+                             "it cannot weigh in document-wide rarity")
+        
+        for index in self.chunker.iter_chunk_indexes(source, encoding):
+            yield self.pruner.prune_span(index, 0, len(index))
+    
+    def _require_chunk_local(self, mode: str) -> None:
+        """
+        Raise ValueError for settings that do not work chunk by chunk.
+        
+        Args:
+            mode: Name of the chunk-by-chunk mode, for the error message
+        """
+        if self.token_budget is not None:
+            raise ValueError(f"{mode} prunes chunks independently; it cannot apply a token budget")
+        if self.deduplicator is not None:
+            raise ValueError(f"{mode} prunes chunks independently; it cannot deduplicate across the document")
+        if self.boilerplate is not None:
+            raise ValueError(f"{mode} reuses or streams chunk results; it cannot use a boilerplate index")
+    
+    def _statistics(self, terms: SentenceTerms, chunk_spans: List[Tuple[int, int]]) -> TermStatistics:
+        """
+        Count chunk frequencies, if global rarity is weighted in.
+        
+        Args:
+            terms: Term ids of the indexed sentences
+            chunk_spans: (lo, hi) sentence range of each chunk
+        
         Returns:
-            Estimated token count
+            Document-wide term statistics, or None when global_weight is 0.0
+        """
+        if not self.pruner.global_weight:
+            return None
+        return TermStatistics.from_spans(terms, chunk_spans)
+    
+    def _prune(self, index: SentenceIndex, terms: SentenceTerms, chunk_spans: List[Tuple[int, int]],
+               profiler: StageProfiler, relevance: Dict[int, float] = None,
+               statistics: TermStatistics = None) -> List[List[int]]:
         """
-        words = len(text.split())
-        return int(words / 0.75)
+        Stage 2: choose the sentences to keep, per chunk or within the token budget.
+        
+        Args:
+            index: Sentence index of the document
+            terms: Term ids of the indexed sentences
+            chunk_spans: (lo, hi) sentence range of each chunk
+            profiler: Profiler of the current run
+            relevance: Query relevance of matching sentences, by sentence number
+            statistics: Document-wide chunk frequencies of the terms
+        
+        Returns:
+            For each chunk, the sentence numbers to keep in original order
+        """
+        if self.token_budget is None:
+            return self.executor.select_spans(terms, chunk_spans, profiler, relevance, statistics)
+        return self._select_budget(index, terms, chunk_spans, profiler, relevance, statistics)
+    
+    def _select_budget(self, index: SentenceIndex, terms: SentenceTerms, chunk_spans: List[Tuple[int, int]],
+                       profiler: StageProfiler, relevance: Dict[int, float] = None,
+                       statistics: TermStatistics = None) -> List[List[int]]:
+        """
+        Score every sentence once, then keep the best set that fits token_budget.
+        
+        Args:
+            index: Sentence index of the document
+            terms: Term ids of the indexed sentences
+            chunk_spans: (lo, hi) sentence range of each chunk
+            profiler: Profiler of the current run
+            relevance: Query relevance of matching sentences, by sentence number
+            statistics: Document-wide chunk frequencies of the terms
+        
+        Returns:
+            For each chunk, the sentence numbers to keep in original order
+        """
+        scores = self.executor.score_spans(terms, chunk_spans, profiler, relevance, statistics)
+        return self._select_scored(index, chunk_spans, scores, profiler)
+    
+    def _select_scored(self, index: SentenceIndex, chunk_spans: List[Tuple[int, int]], scores: List[float],
+                       profiler: StageProfiler) -> List[List[int]]:
+        """
+        Choose the sentences to keep from scores already computed.
+        
+        Args:
+            index: Sentence index of the document
+            chunk_spans: (lo, hi) sentence range of each chunk
+            scores: One score per sentence, chunk after chunk
+            profiler: Profiler of the current run
+        
+        Returns:
+            For each chunk, the sentence numbers to keep in original order
+        """
+        if self.token_budget is None:
+            return self.pruner.select_scores(scores, chunk_spans, profiler)
+        
+        # Budget in the tokenizer's cost units (words for the heuristic),
+        # which add up over the kept sentences
+        return self.pruner.select_budget(scores, chunk_spans, index.token_costs,
+                                         self.tokenizer.max_cost(self.token_budget),
+                                         self.min_sentences_per_chunk, profiler)
+    
+    def _profiler(self) -> Union[StageProfiler, NullProfiler]:
+        """
+        Profiler for one run: a fresh StageProfiler, or the shared no-op one.
+        
+        Returns:
+            The profiler to record this run's stages with
+        """
+        if not self.profile:
+            return NULL_PROFILER
+        return StageProfiler(memory=self.profile_memory, hook=self.profile_hook)
+    
+    def _config(self) -> Dict[str, object]:
+        """
+        Constructor arguments that reproduce this pipeline's output.
+        
+        Returns:
+            Keyword arguments for SignalCorePipeline()
+        """
+        return {"scorer": self.pruner.scorer, "cache": self.cache, "token_budget": self.token_budget,
+                "min_sentences_per_chunk": self.min_sentences_per_chunk, "dedup_threshold": self.dedup_threshold,
+                "boilerplate": self.boilerplate, "extraction_ratio": self.pruner.extraction_ratio,
+                "global_weight": self.pruner.global_weight, "tokenizer": self.tokenizer_name,
+                "min_chunk_size": self.chunker.min_chunk_size, "max_chunk_size": self.chunker.max_chunk_size}
+    
+    def _settings(self) -> Dict[str, object]:
+        """
+        Every setting that affects the optimized output, for cache keys.
+        
+        Returns:
+            JSON-serializable settings
+        """
+        return {
+            "min_chunk_size": self.chunker.min_chunk_size,
+            "max_chunk_size": self.chunker.max_chunk_size,
+            "extraction_ratio": self.pruner.extraction_ratio,
+            "similarity_weight": self.pruner.SIMILARITY_WEIGHT,
+            "query_weight": self.pruner.QUERY_WEIGHT,
+            "global_weight": self.pruner.global_weight,
+            "scorer": self.pruner.scorer,
+            "token_budget": self.token_budget,
+            "min_sentences_per_chunk": self.min_sentences_per_chunk,
+            "dedup_threshold": self.dedup_threshold,
+            "tokenizer": self.tokenizer.name,
+        }
+
+
+# Pipeline of a process_many() worker process, built once per worker
+_batch_pipeline: SignalCorePipeline = None
+
+
+def _init_batch_worker(config: Dict[str, object]) -> None:
+    """
+    Build the worker's pipeline once, before it receives work units.
+    
+    Args:
+        config: Keyword arguments for SignalCorePipeline()
+    """
+    global _batch_pipeline
+    _batch_pipeline = SignalCorePipeline(**config)
+
+
+def _process_batch_unit(documents: List[str]) -> List[Tuple[str, Dict[str, float]]]:
+    """
+    Worker task: optimize one work unit of documents.
+    
+    Args:
+        documents: Documents packed into this unit
+    
+    Returns:
+        (optimized_context, metrics) for each document, in order
+    """
+    return [_batch_pipeline.process(document) for document in documents]
+
+
+def _process_pooled(document: str, query: str = None) -> Tuple[str, Dict[str, float]]:
+    """
+    Worker task: optimize one document with the worker's pipeline.
+    
+    Args:
+        document: Full document text
+        query: Optional user question
+    
+    Returns:
+        (optimized_context, metrics)
+    """
+    return _batch_pipeline.process(document, query)
+
+
+def _process_prepared_pooled(document: Optional[str], query: str,
+                             prepared: PreparedDocument = None) -> Tuple[Tuple[str, Dict[str, float]],
+                                                                         Optional[PreparedDocument]]:
+    """
+    Worker task: answer-oriented optimization on a prepared document.
+    
+    Args:
+        document: Full document text (None if prepared is given)
+        query: The user's question
+        prepared: The document's query-independent work, or None
+    
+    Returns:
+        (optimized_context, metrics) and the newly prepared document, as
+        returned by SignalCorePipeline._process_prepared()
+    """
+    return _batch_pipeline._process_prepared(document, query, prepared)
+
+
+def _consecutive_runs(numbers: List[int]) -> Iterator[List[int]]:
+    """
+    Split a sorted list of integers into runs of consecutive values.
+    
+    Args:
+        numbers: Sorted integers
+    
+    Yields:
+        Lists of consecutive integers
+    """
+    run = []
+    for number in numbers:
+        if run and number != run[-1] + 1:
+            yield run
+            run = []
+        run.append(number)
+    
+    if run:
+        yield run
+
+
+def _pack_documents(documents: Iterable[str], unit_chars: int) -> Iterator[List[str]]:
+    """
+    Group consecutive documents into work units of about unit_chars.
+    
+    Args:
+        documents: Documents, in input order
+        unit_chars: Target characters per unit; larger documents get a
+            unit of their own
+    
+    Yields:
+        Lists of consecutive documents
+    """
+    unit = []
+    unit_size = 0
+    for document in documents:
+        if unit and unit_size + len(document) > unit_chars:
+            yield unit
+            unit = []
+            unit_size = 0
+        unit.append(document)
+        unit_size += len(document)
+    
+    if unit:
+        yield unit
@@ -0,0 +1,142 @@
+"""
+Stage Profiling for the SignalCore Pipeline
+
+This module records wall time, CPU time and (optionally) tracemalloc peak
+memory for each named stage of a pipeline run. Stages can nest and can run
+many times (e.g. once per chunk); repeated stages are accumulated.
+
+Profiling is opt-in. When it is off the pipeline uses NULL_PROFILER, whose
+stage() returns one shared no-op context manager, so the instrumented code
+paths cost a single `with` statement each.
+"""
+
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from typing import Callable, ContextManager, Dict, Iterator, List
+
+# Called with (stage name, that run's record) each time a stage finishes
+StageHook = Callable[[str, Dict[str, float]], None]
+
+
+class StageProfiler:
+    """
+    Collects per-stage timing and memory records for one pipeline run.
+    """
+
+    enabled = True
+
+    def __init__(self, memory: bool = True, hook: StageHook = None):
+        """
+        Args:
+            memory: Also record tracemalloc peak memory per stage. Tracing
+                is started for the run if it is not already on.
+            hook: Optional callback invoked as each stage finishes
+        """
+        self.memory = memory
+        self.hook = hook
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self._frames: List[Dict[str, float]] = []
+        self._started_tracing = False
+
+    def start(self) -> None:
+        """Begin the run, starting tracemalloc if memory is profiled."""
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def stop(self) -> None:
+        """End the run, stopping tracemalloc if start() turned it on."""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        Measure one run of a stage.
+
+        Args:
+            name: Stage name; dotted names (e.g. 'prune.score') mark sub-steps
+        """
+        tracing = self.memory and tracemalloc.is_tracing()
+        frame = {'peak': 0, 'base': 0}
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            # Keep the enclosing stage's peak before resetting the counter
+            if self._frames:
+                self._frames[-1]['peak'] = max(self._frames[-1]['peak'], peak)
+            tracemalloc.reset_peak()
+            frame['base'] = current
+        self._frames.append(frame)
+
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            self._frames.pop()
+
+            peak_bytes = 0
+            if tracing:
+                frame['peak'] = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+                peak_bytes = frame['peak'] - frame['base']
+                if self._frames:
+                    self._frames[-1]['peak'] = max(self._frames[-1]['peak'], frame['peak'])
+
+            self._record(name, wall, cpu, peak_bytes)
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        """
+        Accumulated records of every stage run so far.
+
+        Returns:
+            Stage name -> {calls, wall_ms, cpu_ms, peak_kb}
+        """
+        return {name: dict(record) for name, record in self.stages.items()}
+
+    def _record(self, name: str, wall: float, cpu: float, peak_bytes: int) -> None:
+        """
+        Accumulate one stage run and notify the hook.
+
+        Args:
+            name: Stage name
+            wall: Wall-clock seconds
+            cpu: Process CPU seconds
+            peak_bytes: Peak traced memory above the level at stage start
+        """
+        record = self.stages.setdefault(name, {'calls': 0, 'wall_ms': 0.0, 'cpu_ms': 0.0, 'peak_kb': 0.0})
+        record['calls'] += 1
+        record['wall_ms'] += wall * 1000
+        record['cpu_ms'] += cpu * 1000
+        record['peak_kb'] = max(record['peak_kb'], peak_bytes / 1024)
+
+        if self.hook is not None:
+            self.hook(name, {'wall_ms': wall * 1000, 'cpu_ms': cpu * 1000, 'peak_kb': peak_bytes / 1024})
+
+
+class NullProfiler:
+    """
+    Profiler used when profiling is off; every stage is a shared no-op.
+    """
+
+    enabled = False
+
+    _NULL_STAGE = nullcontext()
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+    def stage(self, name: str) -> ContextManager[None]:
+        return self._NULL_STAGE
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        return {}
+
+
+NULL_PROFILER = NullProfiler()
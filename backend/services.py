@@ -0,0 +1,351 @@
+"""
+Shared Server State for SignalCore
+
+Both servers (app.py with Flask, asgi.py) answer questions with the same
+pipeline, LLM client and document store, configured from environment
+variables. This module holds that state and the helpers both servers use.
+
+Nothing expensive happens at import. The pipeline and the LLM client are
+built on first use in each process (get_pipeline(), get_llm_client()),
+and the modules they need, including the LLM backend's SDK, are imported
+only then. A forked worker drops the LLM client it inherited and builds
+its own, since network connections cannot be shared across processes.
+
+Preload mode (SIGNALCORE_PRELOAD=1, for a server that forks its workers
+from one preloaded parent, e.g. gunicorn --preload) builds and warms up the
+pipeline in the parent. Workers then start with it ready and share its
+memory copy-on-write; gc.freeze() keeps the garbage collector from
+touching, and so copying, those pages.
+
+How long importing, building and preloading took in this process is
+recorded in startup_times and reported by startup_report().
+"""
+
+import time
+
+_import_started = time.perf_counter()
+
+import gc
+import json
+import os
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional
+from dotenv import load_dotenv
+from backend.documents import DocumentStore
+
+if TYPE_CHECKING:
+    from backend.corpus import CorpusIndex
+    from backend.llm_client import LLMClient
+    from backend.pipeline import SignalCorePipeline
+
+
+# Load environment variables from .env file
+project_root = Path(__file__).parent.parent
+load_dotenv(project_root / '.env')
+
+# Uploaded documents, referenced by ID instead of being sent with every
+# question; evicted by total size and after a period without use
+document_store = DocumentStore(
+    max_bytes=int(os.getenv("SIGNALCORE_DOCUMENT_STORE_MB", "256")) * 1024 * 1024,
+    ttl=float(os.getenv("SIGNALCORE_DOCUMENT_TTL", "3600"))
+)
+max_document_bytes = int(os.getenv("SIGNALCORE_MAX_DOCUMENT_MB", "64")) * 1024 * 1024
+
+# Seconds spent on each startup step in this process
+startup_times: Dict[str, float] = {}
+
+# Objects built on first use, by name
+_state: Dict[str, Any] = {}
+_lock = threading.Lock()
+_preloaded = False
+
+# A short document that runs every pipeline stage once when preloading
+WARMUP_DOCUMENT = (
+    "SignalCore splits documents into sentences. Each sentence is scored for uniqueness. "
+    "Chunks group related sentences together. The pruner keeps the most informative sentences. "
+    "Questions rank sentences by relevance as well."
+)
+
+
+def get_pipeline() -> 'SignalCorePipeline':
+    """
+    The pipeline, built on first use.
+    
+    Returns:
+        The shared SignalCorePipeline
+    """
+    return _get('pipeline', _build_pipeline)
+
+
+def get_llm_client() -> 'LLMClient':
+    """
+    This process's LLM client, built on first use.
+    
+    Returns:
+        The shared LLMClient
+    """
+    return _get('llm_client', _build_llm_client)
+
+
+def get_corpus_index() -> Optional['CorpusIndex']:
+    """
+    The corpus index, opened on first use.
+    
+    Returns:
+        The CorpusIndex, or None if corpus mode is not enabled
+    """
+    if not os.getenv("SIGNALCORE_CORPUS_PATH"):
+        return None
+    return _get('corpus_index', _build_corpus_index)
+
+
+def preload() -> None:
+    """
+    Build and warm up the pipeline before worker processes are forked.
+    
+    The LLM backend's modules are imported too, but the client itself is
+    left for each worker to build.
+    """
+    global _preloaded
+    started = time.perf_counter()
+    
+    get_pipeline().process(WARMUP_DOCUMENT, "Which sentences does the pruner keep?")
+    if os.getenv("SIGNALCORE_LLM_BACKEND", "gemini") == "gemini":
+        import google.generativeai  # noqa: F401
+    
+    # Objects alive now are never freed, so the collector need not visit
+    # (and write to) them in the forked workers
+    gc.collect()
+    gc.freeze()
+    
+    _preloaded = True
+    startup_times['preload_seconds'] = time.perf_counter() - started
+
+
+def startup_report() -> Dict[str, Any]:
+    """
+    Startup timings of this process.
+    
+    Returns:
+        JSON-serializable dict with the process ID, whether the pipeline was
+        preloaded, and the seconds each startup step took
+    """
+    return {"pid": os.getpid(), "preloaded": _preloaded, **startup_times}
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count tokens with the configured tokenizer (SIGNALCORE_TOKENIZER).
+    
+    Args:
+        text: The text to count tokens for
+    
+    Returns:
+        Token count
+    """
+    from backend.algorithms.tokens import get_tokenizer
+    return get_tokenizer(os.getenv("SIGNALCORE_TOKENIZER") or "heuristic").count(text)
+
+
+def sse_event(event: str, data: dict) -> str:
+    """
+    Format one Server-Sent Event with a JSON payload.
+    
+    Args:
+        event: Event name
+        data: JSON-serializable payload
+    
+    Returns:
+        The event as text, terminated by a blank line
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def request_document(data: dict) -> Optional[str]:
+    """
+    Document a query request refers to: inline text or an uploaded document.
+    
+    Args:
+        data: Request JSON with either document or document_id
+    
+    Returns:
+        The document text ('' if neither is given), or None if document_id
+        is unknown or has expired
+    """
+    document_id = data.get('document_id')
+    if document_id:
+        return document_store.get(document_id)
+    return data.get('document', '')
+
+
+def optimized_result(response: str, metrics: dict, llm_cached: bool = False) -> dict:
+    """
+    Response JSON of an optimized test from the LLM answer and pipeline metrics.
+    
+    Args:
+        response: LLM's answer
+        metrics: Metrics returned by the pipeline
+        llm_cached: Whether the answer came from the LLM response cache
+    
+    Returns:
+        JSON-serializable result, as documented for /api/test-optimized
+    """
+    return {
+        "response": response,
+        "llm_cached": llm_cached,
+        "original_tokens": metrics["original_tokens"],
+        "optimized_tokens": metrics["optimized_tokens"],
+        "reduction_percentage": metrics["reduction_percentage"],
+        "cache_hits": metrics.get("cache_hits", 0),
+        "cache_misses": metrics.get("cache_misses", 0),
+        "boilerplate_removed": metrics.get("boilerplate_removed", 0)
+    }
+
+
+def _get(name: str, build: Callable[[], Any]) -> Any:
+    """
+    Get a shared object, building it once per process on first use.
+    
+    Args:
+        name: Name of the object
+        build: Builds the object
+    
+    Returns:
+        The object
+    """
+    value = _state.get(name)
+    if value is None:
+        with _lock:
+            value = _state.get(name)
+            if value is None:
+                started = time.perf_counter()
+                value = _state[name] = build()
+                startup_times[f'{name}_seconds'] = time.perf_counter() - started
+    return value
+
+
+def _after_fork() -> None:
+    """Reset per-process state in a forked child."""
+    global _lock
+    # The parent may have held the lock while forking
+    _lock = threading.Lock()
+    _state.pop('llm_client', None)
+    startup_times.pop('llm_client_seconds', None)
+
+
+def _build_pipeline() -> 'SignalCorePipeline':
+    """
+    Build the pipeline from the environment.
+    
+    Returns:
+        A SignalCorePipeline with result caching and the configured options
+    """
+    from backend.boilerplate import BoilerplateIndex
+    from backend.cache import PipelineCache
+    from backend.pipeline import SignalCorePipeline
+    
+    # Cache pipeline results, and each document's question-independent
+    # work, so repeated questions about the same document skip the chunk +
+    # prune pass
+    pipeline_cache = PipelineCache(
+        max_bytes=int(os.getenv("SIGNALCORE_CACHE_MB", "64")) * 1024 * 1024,
+        path=os.getenv("SIGNALCORE_CACHE_PATH") or None,
+        disk_max_bytes=int(os.getenv("SIGNALCORE_CACHE_DISK_MB", "1024")) * 1024 * 1024,
+        document_bytes=int(os.getenv("SIGNALCORE_CACHE_DOCUMENTS_MB", "256")) * 1024 * 1024
+    )
+    
+    # Optional cross-document boilerplate index, persisted in a sketch file
+    boilerplate_path = os.getenv("SIGNALCORE_BOILERPLATE_PATH")
+    boilerplate_index = None
+    if boilerplate_path:
+        boilerplate_index = BoilerplateIndex(
+            path=boilerplate_path,
+            max_fraction=float(os.getenv("SIGNALCORE_BOILERPLATE_FRACTION", "0.5"))
+        )
+    
+    # Query-aware pruning keeps the answer at much lower retention, so the
+    # per-chunk extraction ratio can be lowered (e.g. 0.1)
+    extraction_ratio = os.getenv("SIGNALCORE_EXTRACTION_RATIO")
+    
+    # Share of document-wide rarity blended into sentence scoring (0.0 to 1.0)
+    global_weight = os.getenv("SIGNALCORE_GLOBAL_WEIGHT")
+    
+    return SignalCorePipeline(
+        cache=pipeline_cache,
+        boilerplate=boilerplate_index,
+        extraction_ratio=float(extraction_ratio) if extraction_ratio else None,
+        global_weight=float(global_weight) if global_weight else None,
+        tokenizer=os.getenv("SIGNALCORE_TOKENIZER") or "heuristic"
+    )
+
+
+def _build_llm_client() -> 'LLMClient':
+    """
+    Build the LLM client from the environment.
+    
+    Returns:
+        An LLMClient with the configured backend, cache and transport
+    """
+    from backend.cache import ResponseCache
+    from backend.llm_backends import create_backend
+    from backend.llm_client import LLMClient
+    from backend.transport import LLMTransport
+    
+    # LLM backend: Gemini (needs GEMINI_API_KEY), or the offline local
+    # stand-in for load tests and benchmarks without network access
+    llm_backend_name = os.getenv("SIGNALCORE_LLM_BACKEND", "gemini")
+    if llm_backend_name == "local":
+        llm_backend = create_backend(
+            "local",
+            latency=float(os.getenv("SIGNALCORE_LOCAL_LATENCY", "0")),
+            piece_latency=float(os.getenv("SIGNALCORE_LOCAL_PIECE_LATENCY", "0"))
+        )
+    else:
+        llm_backend = create_backend(
+            llm_backend_name,
+            api_key=os.getenv("GEMINI_API_KEY"),
+            model_name=os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+        )
+    
+    # Cache LLM answers, so a repeated question about the same context (or
+    # an identical request already in flight) does not call the API again
+    llm_cache = ResponseCache(
+        max_bytes=int(os.getenv("SIGNALCORE_LLM_CACHE_MB", "16")) * 1024 * 1024,
+        path=os.getenv("SIGNALCORE_LLM_CACHE_PATH") or None,
+        ttl=float(os.getenv("SIGNALCORE_LLM_CACHE_TTL", "86400")),
+        disk_max_bytes=int(os.getenv("SIGNALCORE_LLM_CACHE_DISK_MB", "256")) * 1024 * 1024
+    )
+    
+    # Concurrent API calls, optional request / prompt token quotas per
+    # minute, and retries of rate-limited or failed calls
+    requests_per_minute = os.getenv("SIGNALCORE_LLM_RPM")
+    tokens_per_minute = os.getenv("SIGNALCORE_LLM_TPM")
+    llm_transport = LLMTransport(
+        max_concurrency=int(os.getenv("SIGNALCORE_LLM_CONCURRENCY", "64")),
+        requests_per_minute=float(requests_per_minute) if requests_per_minute else None,
+        tokens_per_minute=float(tokens_per_minute) if tokens_per_minute else None,
+        max_retries=int(os.getenv("SIGNALCORE_LLM_RETRIES", "3"))
+    )
+    
+    return LLMClient(cache=llm_cache, transport=llm_transport, backend=llm_backend)
+
+
+def _build_corpus_index() -> 'CorpusIndex':
+    """
+    Open the corpus index named by SIGNALCORE_CORPUS_PATH.
+    
+    Returns:
+        The CorpusIndex
+    """
+    from backend.corpus import CorpusIndex
+    return CorpusIndex(os.getenv("SIGNALCORE_CORPUS_PATH"))
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+startup_times['services_import_seconds'] = time.perf_counter() - _import_started
+
+if os.getenv("SIGNALCORE_PRELOAD", "") in ("1", "true"):
+    preload()
@@ -0,0 +1,310 @@
+"""
+LLM Call Transport for SignalCore
+
+Every call to the model API goes through an LLMTransport, which bounds how
+many calls run at once, spaces them out to stay under the API quota, and
+retries transient failures (rate limiting, overload, timeouts) with
+exponential backoff. Failures that retrying cannot fix (e.g. an invalid
+request) are raised at once.
+
+The quota is enforced with token buckets: one for requests per minute and
+one for (estimated) prompt tokens per minute. Each call reserves its cost
+up front and waits until the bucket has refilled enough to cover it, so
+callers queue in order instead of all retrying at once.
+
+The transport only sees zero-argument functions that make one call, so it
+works with any backend, including a local fake.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from typing import AsyncIterator, Awaitable, Callable, Iterator, TypeVar
+
+
+T = TypeVar('T')
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket that refills continuously.
+    
+    A reservation may overdraw the bucket; the caller then waits until the
+    deficit has refilled. Later callers queue behind it.
+    """
+    
+    def __init__(self, rate: float, capacity: float = None):
+        """
+        Args:
+            rate: Tokens added per second
+            capacity: Most tokens the bucket holds, i.e. the largest burst
+                (defaults to one second of refill)
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def reserve(self, tokens: float = 1.0) -> float:
+        """
+        Take tokens from the bucket.
+        
+        Args:
+            tokens: Cost of the operation
+        
+        Returns:
+            Seconds to wait before the operation may start
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            return max(0.0, -self._tokens / self.rate)
+    
+    def acquire(self, tokens: float = 1.0) -> None:
+        """
+        Take tokens, sleeping until they are available.
+        
+        Args:
+            tokens: Cost of the operation
+        """
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+    
+    async def acquire_async(self, tokens: float = 1.0) -> None:
+        """
+        Take tokens, waiting without blocking the event loop.
+        
+        Args:
+            tokens: Cost of the operation
+        """
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class LLMTransport:
+    """
+    Concurrency limit, rate limiting and retries around model API calls.
+    
+    Threads and coroutines have separate concurrency limits (a thread
+    semaphore cannot be awaited); the rate limits are shared.
+    """
+    
+    # HTTP status codes worth retrying: timeout, rate limited, server errors
+    TRANSIENT_STATUS = frozenset({408, 429, 500, 502, 503, 504})
+    
+    def __init__(self, max_concurrency: int = 8, requests_per_minute: float = None,
+                 tokens_per_minute: float = None, max_retries: int = 3,
+                 backoff: float = 0.5, max_backoff: float = 16.0):
+        """
+        Args:
+            max_concurrency: Calls in progress at once (per threads, and per
+                event loop)
+            requests_per_minute: Request quota (unlimited if None)
+            tokens_per_minute: Prompt token quota (unlimited if None)
+            max_retries: Retries after the first attempt of a call
+            backoff: Upper bound of the first retry delay in seconds; it
+                doubles with every retry
+            max_backoff: Largest retry delay in seconds
+        """
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        
+        # Buckets hold a few seconds of quota, so bursts stay small
+        self.requests = TokenBucket(requests_per_minute / 60.0, max(1.0, requests_per_minute / 20.0)) \
+            if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute / 60.0, tokens_per_minute / 20.0) \
+            if tokens_per_minute else None
+        
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._async_slots: asyncio.Semaphore = None
+        
+        # Retries made so far, across all calls
+        self.retries = 0
+    
+    def call(self, function: Callable[[], T], cost: float = 0.0) -> T:
+        """
+        Run one API call, retrying it on transient failures.
+        
+        Args:
+            function: Makes the call and returns its result
+            cost: Estimated prompt tokens, charged against tokens_per_minute
+        
+        Returns:
+            The function's result
+        """
+        attempt = 0
+        while True:
+            self._acquire(cost)
+            try:
+                with self._slots:
+                    return function()
+            except Exception as e:
+                if attempt >= self.max_retries or not self.is_transient(e):
+                    raise
+            self.retries += 1
+            time.sleep(self._delay(attempt))
+            attempt += 1
+    
+    async def call_async(self, function: Callable[[], Awaitable[T]], cost: float = 0.0) -> T:
+        """
+        Run one API call without blocking the event loop, retrying it on
+        transient failures.
+        
+        Args:
+            function: Returns an awaitable of the call's result
+            cost: Estimated prompt tokens, charged against tokens_per_minute
+        
+        Returns:
+            The call's result
+        """
+        attempt = 0
+        while True:
+            await self._acquire_async(cost)
+            try:
+                async with self._get_async_slots():
+                    return await function()
+            except Exception as e:
+                if attempt >= self.max_retries or not self.is_transient(e):
+                    raise
+            self.retries += 1
+            await asyncio.sleep(self._delay(attempt))
+            attempt += 1
+    
+    def stream(self, function: Callable[[], Iterator[T]], cost: float = 0.0) -> Iterator[T]:
+        """
+        Run one streaming API call, holding a slot until the stream ends.
+        
+        A failure before the first item is retried like call(); after that
+        the items already yielded cannot be taken back, so it is raised.
+        
+        Args:
+            function: Starts the call and returns an iterator over its items
+            cost: Estimated prompt tokens, charged against tokens_per_minute
+        
+        Yields:
+            The stream's items
+        """
+        attempt = 0
+        while True:
+            self._acquire(cost)
+            started = False
+            try:
+                with self._slots:
+                    for item in function():
+                        started = True
+                        yield item
+                return
+            except Exception as e:
+                if started or attempt >= self.max_retries or not self.is_transient(e):
+                    raise
+            self.retries += 1
+            time.sleep(self._delay(attempt))
+            attempt += 1
+    
+    async def stream_async(self, function: Callable[[], AsyncIterator[T]], cost: float = 0.0) -> AsyncIterator[T]:
+        """
+        Run one streaming API call without blocking the event loop, holding
+        a slot until the stream ends.
+        
+        Args:
+            function: Starts the call and returns an async iterator over
+                its items
+            cost: Estimated prompt tokens, charged against tokens_per_minute
+        
+        Yields:
+            The stream's items
+        """
+        attempt = 0
+        while True:
+            await self._acquire_async(cost)
+            started = False
+            try:
+                async with self._get_async_slots():
+                    async for item in function():
+                        started = True
+                        yield item
+                return
+            except Exception as e:
+                if started or attempt >= self.max_retries or not self.is_transient(e):
+                    raise
+            self.retries += 1
+            await asyncio.sleep(self._delay(attempt))
+            attempt += 1
+    
+    @classmethod
+    def is_transient(cls, error: Exception) -> bool:
+        """
+        Whether a failed call may succeed if retried.
+        
+        API errors carry their HTTP status as `code` (google.api_core does
+        this); connection problems and timeouts are always transient.
+        
+        Args:
+            error: The exception the call raised
+        
+        Returns:
+            True if the call should be retried
+        """
+        if isinstance(error, (ConnectionError, TimeoutError, asyncio.TimeoutError)):
+            return True
+        code = getattr(error, 'code', None)
+        return isinstance(code, int) and code in cls.TRANSIENT_STATUS
+    
+    def _acquire(self, cost: float) -> None:
+        """
+        Wait for quota for one call.
+        
+        Args:
+            cost: Estimated prompt tokens
+        """
+        if self.requests is not None:
+            self.requests.acquire()
+        if self.tokens is not None and cost:
+            self.tokens.acquire(cost)
+    
+    async def _acquire_async(self, cost: float) -> None:
+        """
+        Wait for quota for one call without blocking the event loop.
+        
+        Args:
+            cost: Estimated prompt tokens
+        """
+        if self.requests is not None:
+            await self.requests.acquire_async()
+        if self.tokens is not None and cost:
+            await self.tokens.acquire_async(cost)
+    
+    def _get_async_slots(self) -> asyncio.Semaphore:
+        """
+        Create the coroutine semaphore on first use, inside the event loop.
+        
+        Returns:
+            The semaphore bounding concurrent async calls
+        """
+        if self._async_slots is None:
+            self._async_slots = asyncio.Semaphore(self.max_concurrency)
+        return self._async_slots
+    
+    def _delay(self, attempt: int) -> float:
+        """
+        Backoff before a retry, with full jitter so that callers that failed
+        together do not retry together.
+        
+        Args:
+            attempt: Number of the attempt that just failed, from 0
+        
+        Returns:
+            Seconds to wait
+        """
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
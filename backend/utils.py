@@ -2,6 +2,9 @@
 Utility functions for SignalCore pipeline.
 """
 
+from backend.algorithms.sentences import split_sentences
+
+
 def inject_needle(haystack: str, needle: str, depth_percentage: int) -> str:
     """
     Inject needle at specified depth (0-100%) in haystack.
@@ -17,32 +20,19 @@ def inject_needle(haystack: str, needle: str, depth_percentage: int) -> str:
     Returns:
         Document with needle injected at the specified position
     """
-    import re
-    
     # Split haystack into sentences
-    sentences = re.split(r'([.!?])\s+', haystack)
-    
-    # Reconstruct sentences with their punctuation
-    full_sentences = []
-    i = 0
-    while i < len(sentences):
-        if i + 1 < len(sentences) and sentences[i + 1] in '.!?':
-            full_sentences.append(sentences[i] + sentences[i + 1])
-            i += 2
-        else:
-            if sentences[i].strip():
-                full_sentences.append(sentences[i])
-            i += 1
+    index = split_sentences(haystack)
     
     # Calculate injection point based on depth percentage
-    injection_point = int(len(full_sentences) * (depth_percentage / 100))
+    injection_point = min(int(len(index) * (depth_percentage / 100)), len(index))
     
     # Ensure needle ends with punctuation
     if not needle.endswith(('.', '!', '?')):
         needle = needle + '.'
     
     # Insert needle at calculated position
-    full_sentences.insert(injection_point, needle)
+    before = index.join(range(injection_point))
+    after = index.join(range(injection_point, len(index)))
     
     # Return combined document
-    return ' '.join(full_sentences)
+    return ' '.join([part for part in (before, needle, after) if part])
@@ -6,10 +6,14 @@ const documentInput = document.getElementById('document');
 const queryInput = document.getElementById('query');
 const btnNaive = document.getElementById('btn-naive');
 const btnOptimized = document.getElementById('btn-optimized');
+const btnCompare = document.getElementById('btn-compare');
 const loadingDiv = document.getElementById('loading');
 const naiveResultDiv = document.getElementById('naive-result');
 const optimizedResultDiv = document.getElementById('optimized-result');
 
+// Last uploaded document: the text it was made from and its server-side ID
+let uploadedDocument = { text: null, id: null };
+
 // Loading indicator functions
 function showLoading() {
     loadingDiv.style.display = 'block';
@@ -82,31 +86,113 @@ function escapeHtml(text) {
     return div.innerHTML;
 }
 
-// Test Naive RAG
-async function testNaive() {
-    if (!validateInputs()) {
-        return;
+// Upload the document once (gzip-compressed where the browser supports it)
+// and refer to it by ID until the text changes
+async function documentReference() {
+    const text = documentInput.value;
+
+    if (uploadedDocument.text !== text) {
+        const headers = { 'Content-Type': 'text/plain; charset=utf-8' };
+        let body = new Blob([text]);
+        if (typeof CompressionStream !== 'undefined') {
+            body = await new Response(body.stream().pipeThrough(new CompressionStream('gzip'))).blob();
+            headers['Content-Encoding'] = 'gzip';
+        }
+
+        const response = await fetch(`${API_BASE}/api/documents`, {
+            method: 'POST',
+            headers: headers,
+            body: body
+        });
+
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+
+        const data = await response.json();
+        uploadedDocument = { text: text, id: data.document_id };
     }
 
-    showLoading();
+    return { document_id: uploadedDocument.id };
+}
 
-    try {
-        const response = await fetch(`${API_BASE}/api/test-naive`, {
+// POST a question about the uploaded document, uploading it again if the
+// server has evicted it; returns the successful response
+async function fetchQuery(path) {
+    for (let attempt = 0; attempt < 2; attempt++) {
+        const response = await fetch(`${API_BASE}${path}`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
             },
             body: JSON.stringify({
-                document: documentInput.value,
+                ...await documentReference(),
                 query: queryInput.value
             })
         });
 
+        if (response.status === 404 && attempt === 0) {
+            uploadedDocument = { text: null, id: null };
+            continue;
+        }
+
         if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
 
-        const data = await response.json();
+        return response;
+    }
+}
+
+// POST a question and parse the JSON result
+async function postQuery(path) {
+    const response = await fetchQuery(path);
+    return response.json();
+}
+
+// POST a question to a Server-Sent Events endpoint and call
+// onEvent(name, data) for each event as it arrives
+async function streamQuery(path, onEvent) {
+    const response = await fetchQuery(path);
+    const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) {
+            break;
+        }
+
+        // Events are separated by a blank line; keep any partial event
+        buffer += value;
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+
+        for (const event of events) {
+            let name = 'message';
+            let data = '';
+            for (const line of event.split('\n')) {
+                if (line.startsWith('event: ')) {
+                    name = line.slice(7);
+                } else if (line.startsWith('data: ')) {
+                    data += line.slice(6);
+                }
+            }
+            onEvent(name, JSON.parse(data || '{}'));
+        }
+    }
+}
+
+// Test Naive RAG
+async function testNaive() {
+    if (!validateInputs()) {
+        return;
+    }
+
+    showLoading();
+
+    try {
+        const data = await postQuery('/api/test-naive');
         displayNaiveResult(data);
     } catch (error) {
         console.error('Error querying full document:', error);
@@ -130,23 +216,21 @@ async function testOptimized() {
     showLoading();
 
     try {
-        const response = await fetch(`${API_BASE}/api/test-optimized`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({
-                document: documentInput.value,
-                query: queryInput.value
-            })
+        // Metrics arrive first; the answer is rendered as it streams in
+        let answer = null;
+        let text = '';
+        await streamQuery('/api/test-optimized/stream', (event, data) => {
+            if (event === 'metrics') {
+                displayOptimizedResult({ ...data, response: '' });
+                answer = optimizedResultDiv.querySelector('.response p');
+                hideLoading();
+            } else if (event === 'token') {
+                text += data.text;
+                answer.textContent = text;
+            } else if (event === 'error') {
+                throw new Error(data.error);
+            }
         });
-
-        if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
-        }
-
-        const data = await response.json();
-        displayOptimizedResult(data);
     } catch (error) {
         console.error('Error querying optimized document:', error);
         const resultContent = optimizedResultDiv.querySelector('.result-content');
@@ -160,6 +244,35 @@ async function testOptimized() {
     }
 }
 
+// Compare both approaches with one upload; the backend queries the LLM
+// for both answers concurrently
+async function testCompare() {
+    if (!validateInputs()) {
+        return;
+    }
+
+    showLoading();
+
+    try {
+        const data = await postQuery('/api/compare');
+        displayNaiveResult(data.naive);
+        displayOptimizedResult(data.optimized);
+    } catch (error) {
+        console.error('Error comparing documents:', error);
+        for (const resultDiv of [naiveResultDiv, optimizedResultDiv]) {
+            const resultContent = resultDiv.querySelector('.result-content');
+            resultContent.innerHTML = `
+                <div class="error">
+                    <p><strong>Error:</strong> Failed to process request. Please check if the backend server is running.</p>
+                </div>
+            `;
+        }
+    } finally {
+        hideLoading();
+    }
+}
+
 // Add event listeners
 btnNaive.addEventListener('click', testNaive);
 btnOptimized.addEventListener('click', testOptimized);
+btnCompare.addEventListener('click', testCompare);
@@ -0,0 +1,138 @@
+"""
+Test doubles for the LLM stack: a backend that plays back scripted
+outcomes instead of calling a model, and a clock that only moves when
+slept on.
+"""
+
+import re
+from typing import AsyncIterator, Iterator, List, Union
+from backend.llm_backends import LLMBackend
+
+
+class StatusError(Exception):
+    """API error carrying an HTTP status as `code`, as google.api_core raises."""
+    
+    def __init__(self, code: int):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+# What one call does: return (or stream) a text, raise an exception, or,
+# for streams, yield pieces and then possibly raise
+Outcome = Union[str, Exception, List[Union[str, Exception]]]
+
+
+class ScriptedBackend(LLMBackend):
+    """
+    Backend that answers each call with the next outcome of a script.
+    
+    Every prompt is recorded, so tests can check how many calls were made
+    and what was asked.
+    """
+    
+    model_name = 'scripted'
+    
+    def __init__(self, *outcomes: Outcome):
+        """
+        Args:
+            *outcomes: One outcome per expected call, in order
+        """
+        self.outcomes = list(outcomes)
+        self.prompts: List[str] = []
+    
+    @property
+    def calls(self) -> int:
+        """Number of calls made."""
+        return len(self.prompts)
+    
+    def generate(self, prompt: str) -> str:
+        return _result(self._next(prompt))
+    
+    async def generate_async(self, prompt: str) -> str:
+        return _result(self._next(prompt))
+    
+    def stream(self, prompt: str) -> Iterator[str]:
+        # The call is made when the stream is started, as with a real API
+        pieces = _pieces(self._next(prompt))
+        
+        def iterate() -> Iterator[str]:
+            for piece in pieces:
+                if isinstance(piece, Exception):
+                    raise piece
+                yield piece
+        return iterate()
+    
+    def stream_async(self, prompt: str) -> AsyncIterator[str]:
+        pieces = _pieces(self._next(prompt))
+        
+        async def iterate() -> AsyncIterator[str]:
+            for piece in pieces:
+                if isinstance(piece, Exception):
+                    raise piece
+                yield piece
+        return iterate()
+    
+    def _next(self, prompt: str) -> Outcome:
+        """
+        Record a call and take its outcome from the script.
+        
+        Args:
+            prompt: Prompt of the call
+        
+        Returns:
+            The call's outcome
+        """
+        self.prompts.append(prompt)
+        if not self.outcomes:
+            raise AssertionError(f"Unexpected call {self.calls}: the script has no outcomes left")
+        return self.outcomes.pop(0)
+
+
+class FakeClock:
+    """
+    Stand-in for the time module: monotonic() only advances when sleep()
+    is called, and every sleep is recorded.
+    """
+    
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps: List[float] = []
+    
+    def monotonic(self) -> float:
+        return self.now
+    
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def _result(outcome: Outcome) -> str:
+    """
+    Resolve a non-streamed outcome.
+    
+    Args:
+        outcome: Text or exception
+    
+    Returns:
+        The text (an exception is raised)
+    """
+    if isinstance(outcome, Exception):
+        raise outcome
+    return outcome
+
+
+def _pieces(outcome: Outcome) -> List[Union[str, Exception]]:
+    """
+    Streamed pieces of an outcome: a text is split after its words.
+    
+    Args:
+        outcome: Text, exception, or list of pieces
+    
+    Returns:
+        Pieces and exceptions, in order
+    """
+    if isinstance(outcome, list):
+        return outcome
+    if isinstance(outcome, Exception):
+        return [outcome]
+    return re.findall(r'\S+\s*', outcome)
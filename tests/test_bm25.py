@@ -0,0 +1,91 @@
+"""
+Tests for BM25 query relevance and query-aware pruning.
+"""
+
+import pytest
+from backend.algorithms.bm25 import BM25Index
+from backend.algorithms.pruner import SentencePruner
+from backend.algorithms.sentences import split_sentences
+from backend.algorithms.vocabulary import SentenceTerms
+from backend.cache import PipelineCache
+from backend.pipeline import SignalCorePipeline
+
+FILLER = [
+    "The river runs past the old mill in the valley.",
+    "What the farmers grow is sold at the market on Sundays.",
+    "The bridge is painted green every spring.",
+    "A small school stands next to the church.",
+    "The bakery opens early and is busy all morning.",
+    "Walkers follow the path up to the ridge.",
+    "The library is open until late on Thursdays.",
+]
+
+NEEDLES = [
+    "The secret code is FJORD2024.",
+    "Nobody else knows the secret code.",
+    "Write the secret code on the card.",
+]
+
+
+def index_terms(text: str):
+    """Sentence index and term ids of a text."""
+    index = split_sentences(text)
+    return index, SentenceTerms.from_index(index)
+
+
+def test_relevance_ignores_stopwords():
+    _, terms = index_terms(" ".join(FILLER + NEEDLES[:1]))
+    bm25 = BM25Index(terms)
+    
+    # "What", "is" and "the" occur everywhere; only "secret" and "code" count
+    assert bm25.relevance("What is the secret code?") == {7: 1.0}
+    assert bm25.relevance("What is the?") == {}
+
+
+def test_relevance_ignores_terms_in_most_sentences():
+    _, terms = index_terms("Rain fell on the farm. Rain fell on the town. Rain fell on the sea. The sun came out.")
+    bm25 = BM25Index(terms)
+    
+    assert bm25.relevance("rain") == {}
+    assert bm25.relevance("rain sun") == {3: 1.0}
+
+
+def test_relevance_matches_across_punctuation():
+    _, terms = index_terms("Deploy the code. Nothing here matters.")
+    
+    assert BM25Index(terms).relevance("Which CODE?") == {0: 1.0}
+
+
+def test_non_matching_sentences_are_not_scored(monkeypatch):
+    index, terms = index_terms(" ".join(FILLER + NEEDLES))
+    relevance = BM25Index(terms).relevance("What is the secret code?")
+    assert sorted(relevance) == [7, 8, 9]
+    
+    scored = []
+    score_sentences = SentencePruner._score_sentences
+    
+    def recording(self, terms, sentences, *args, **kwargs):
+        sentences = list(sentences)
+        scored.extend(sentences)
+        return score_sentences(self, terms, sentences, *args, **kwargs)
+    
+    monkeypatch.setattr(SentencePruner, '_score_sentences', recording)
+    selected = SentencePruner().select_terms(terms, [(0, len(index))], relevance=relevance)
+    
+    assert selected == [[7, 8, 9]]
+    assert sorted(scored) == [7, 8, 9]
+
+
+@pytest.mark.parametrize('options', [{}, {'scorer': 'vectorized'}, {'token_budget': 20}])
+def test_cached_questions_reuse_the_document(options):
+    document = " ".join(FILLER + NEEDLES + FILLER)
+    pipeline = SignalCorePipeline(cache=PipelineCache(), **options)
+    uncached = SignalCorePipeline(**options)
+    
+    for query in ["What is the secret code?", "When does the library close?"]:
+        optimized_context, metrics = pipeline.process(document, query)
+        del metrics["cache_hits"], metrics["cache_misses"]
+        assert (optimized_context, metrics) == uncached.process(document, query)
+    
+    # The second question found the document prepared by the first
+    assert (pipeline.cache.hits, pipeline.cache.misses) == (1, 1)
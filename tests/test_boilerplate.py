@@ -0,0 +1,144 @@
+"""
+Tests for the cross-document boilerplate index and its building blocks.
+"""
+
+import pickle
+import random
+import pytest
+from backend.algorithms.sentences import split_sentences
+from backend.boilerplate import BoilerplateIndex, CountMinSketch, DocumentSet
+from backend.cache import PipelineCache
+from backend.pipeline import SignalCorePipeline
+
+FOOTER = "This message is confidential and intended only for its recipient."
+
+TOPICS = ["river", "market", "bridge", "school", "bakery", "ridge", "library", "harbour", "orchard", "castle"]
+
+
+def make_document(number: int) -> str:
+    """A document with its own sentences followed by the shared footer."""
+    topic = TOPICS[number % len(TOPICS)]
+    return (f"Report {number} covers the {topic}. The {topic} had {number} visitors this week. "
+            f"Staff at the {topic} counted them twice. {FOOTER}")
+
+
+def test_sketch_never_undercounts():
+    rng = random.Random(0)
+    sketch = CountMinSketch(width=64, depth=3)
+    counts = {}
+    for _ in range(2000):
+        key = rng.getrandbits(64) if rng.random() < 0.5 else rng.choice([1, 2, 3]) << 40
+        sketch.add(key)
+        counts[key] = counts.get(key, 0) + 1
+    
+    assert all(sketch.estimate(key) >= count for key, count in counts.items())
+
+
+def test_sketch_counts_exactly_without_collisions():
+    sketch = CountMinSketch(width=1 << 16, depth=4)
+    for key, times in [(11, 3), (2 ** 63 + 5, 1), (42 << 32, 7)]:
+        for _ in range(times):
+            sketch.add(key)
+    
+    assert [sketch.estimate(key) for key in [11, 2 ** 63 + 5, 42 << 32, 99]] == [3, 1, 7, 0]
+
+
+def test_sketch_file_persists(tmp_path):
+    path = str(tmp_path / 'sketch')
+    sketch = CountMinSketch(width=1024, depth=2, path=path)
+    sketch.add(7)
+    sketch.add(7)
+    sketch.increment_total()
+    sketch.close()
+    
+    # Reopened with other dimensions: the file's own layout wins
+    reopened = CountMinSketch(width=16, depth=8, path=path)
+    assert (reopened.width, reopened.depth, reopened.total) == (1024, 2, 1)
+    assert reopened.estimate(7) == 2
+    reopened.close()
+
+
+def test_sketch_rejects_other_files(tmp_path):
+    path = tmp_path / 'other'
+    path.write_bytes(b'not a sketch' * 10)
+    
+    with pytest.raises(ValueError):
+        CountMinSketch(path=str(path))
+
+
+def test_in_memory_sketch_pickles_as_copy():
+    sketch = CountMinSketch(width=256, depth=2)
+    sketch.add(5)
+    
+    copy = pickle.loads(pickle.dumps(sketch))
+    copy.add(5)
+    assert (sketch.estimate(5), copy.estimate(5)) == (1, 2)
+
+
+@pytest.mark.parametrize('on_disk', [False, True])
+def test_document_set_adds_once(on_disk, tmp_path):
+    path = str(tmp_path / 'documents') if on_disk else None
+    documents = DocumentSet(path)
+    
+    assert documents.add(2 ** 64 - 1) is True
+    assert documents.add(2 ** 64 - 1) is False
+    assert documents.add(12345) is True
+    
+    copy = pickle.loads(pickle.dumps(documents))
+    assert copy.add(12345) is False
+    assert copy.add(777) is True
+    # A file-backed set is shared with its copies; an in-memory one is not
+    assert documents.add(777) is not on_disk
+
+
+def test_boilerplate_dropped_after_enough_documents():
+    index = BoilerplateIndex(max_fraction=0.5, min_documents=5, width=1 << 12)
+    
+    for number in range(5):
+        # Nothing is judged before min_documents documents were seen
+        assert index.update(split_sentences(make_document(number))) == [0, 1, 2, 3]
+    
+    assert index.update(split_sentences(make_document(5))) == [0, 1, 2]
+    assert index.documents == 6
+
+
+def test_repeated_document_is_recorded_once():
+    index = BoilerplateIndex(max_fraction=0.5, min_documents=5, width=1 << 12)
+    document = split_sentences(make_document(0))
+    
+    for _ in range(5):
+        index.update(document)
+    assert index.documents == 1
+    
+    # Counted once, the repeated document's own sentences are not boilerplate
+    for number in range(1, 5):
+        index.update(split_sentences(make_document(number)))
+    assert index.update(document) == [0, 1, 2]
+
+
+def test_file_backed_index_persists(tmp_path):
+    path = str(tmp_path / 'boilerplate')
+    index = BoilerplateIndex(path, max_fraction=0.5, min_documents=3, width=1 << 12)
+    for number in range(3):
+        index.update(split_sentences(make_document(number)))
+    index.close()
+    
+    reopened = BoilerplateIndex(path, max_fraction=0.5, min_documents=3, width=1 << 12)
+    assert reopened.documents == 3
+    assert reopened.update(split_sentences(make_document(0))) == [0, 1, 2]
+    assert reopened.documents == 3
+    reopened.close()
+
+
+def test_pipeline_drops_boilerplate_and_skips_the_cache():
+    pipeline = SignalCorePipeline(boilerplate=BoilerplateIndex(min_documents=3, width=1 << 12),
+                                  cache=PipelineCache(), extraction_ratio=1.0)
+    assert pipeline.cache is None
+    
+    for number in range(3):
+        optimized_context, _ = pipeline.process(make_document(number))
+        assert FOOTER in optimized_context
+    
+    optimized_context, metrics = pipeline.process(make_document(3))
+    assert FOOTER not in optimized_context
+    assert metrics["boilerplate_removed"] == 1
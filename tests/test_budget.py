@@ -0,0 +1,98 @@
+"""
+Tests for token-budget mode: global top-k selection across chunks.
+"""
+
+import random
+import pytest
+from backend.algorithms.pruner import SentencePruner
+from backend.pipeline import SignalCorePipeline
+
+
+def reference_budget(scores, spans, costs, budget, min_per_chunk):
+    """Straightforward version of select_budget: sort everything, then fill greedily."""
+    sentences = [i for lo, hi in spans for i in range(lo, hi)]
+    keep = set()
+    remaining = budget
+    
+    required = []
+    start = 0
+    for lo, hi in spans:
+        best = sorted(range(start, start + hi - lo), key=lambda k: (-scores[k], k))
+        required.extend(best[:min_per_chunk])
+        start += hi - lo
+    
+    ranked = sorted(required, key=lambda k: (-scores[k], k))
+    ranked += sorted(set(range(len(sentences))) - set(required), key=lambda k: (-scores[k], k))
+    for k in ranked:
+        if costs[sentences[k]] <= remaining:
+            keep.add(k)
+            remaining -= costs[sentences[k]]
+    
+    selected = []
+    start = 0
+    for lo, hi in spans:
+        selected.append([lo + k for k in range(hi - lo) if start + k in keep])
+        start += hi - lo
+    return selected
+
+
+def random_case(seed: int):
+    """Spans, scores (with ties) and costs of a random document."""
+    rng = random.Random(seed)
+    spans = []
+    lo = 0
+    for _ in range(rng.randint(1, 12)):
+        hi = lo + rng.randint(1, 15)
+        spans.append((lo, hi))
+        lo = hi
+    scores = [rng.choice([0.1, 0.2, 0.5, 0.8, 1.0]) * rng.randint(1, 3) for _ in range(lo)]
+    costs = [rng.randint(1, 30) for _ in range(lo)]
+    return spans, scores, costs
+
+
+@pytest.mark.parametrize('seed', range(30))
+@pytest.mark.parametrize('min_per_chunk', [0, 1, 2])
+def test_budget_matches_reference(seed, min_per_chunk):
+    spans, scores, costs = random_case(seed)
+    budget = random.Random(seed).randint(0, sum(costs))
+    
+    selected = SentencePruner().select_budget(scores, spans, costs, budget, min_per_chunk)
+    
+    assert selected == reference_budget(scores, spans, costs, budget, min_per_chunk)
+    assert sum(costs[i] for chunk in selected for i in chunk) <= budget
+
+
+def test_every_chunk_keeps_its_best_sentence():
+    spans = [(0, 3), (3, 6), (6, 9)]
+    # The last chunk scores lowest everywhere, but still keeps its best sentence
+    scores = [0.9, 0.8, 0.7, 0.95, 0.85, 0.75, 0.1, 0.3, 0.2]
+    costs = [10] * 9
+    
+    pruner = SentencePruner()
+    assert pruner.select_budget(scores, spans, costs, 40, 1) == [[0], [3, 4], [7]]
+    assert pruner.select_budget(scores, spans, costs, 40, 0) == [[0, 1], [3, 4], []]
+
+
+def test_minimum_gives_way_to_budget():
+    spans = [(0, 2), (2, 4)]
+    scores = [0.5, 0.4, 0.9, 0.1]
+    costs = [50, 5, 20, 5]
+    
+    # The first chunk's best sentence does not fit; cheaper ones fill the rest
+    assert SentencePruner().select_budget(scores, spans, costs, 30, 1) == [[1], [2, 3]]
+    assert SentencePruner().select_budget(scores, spans, costs, 0, 1) == [[], []]
+
+
+def test_pipeline_budget_keeps_the_needle():
+    filler = ["The river runs past the old mill in the valley.",
+              "The bridge is painted green every spring.",
+              "A small school stands next to the church."]
+    sentences = filler * 40
+    sentences.insert(70, "The secret code is FJORD2024.")
+    document = " ".join(sentences)
+    
+    pipeline = SignalCorePipeline(token_budget=60, min_chunk_size=40, max_chunk_size=120)
+    optimized_context, metrics = pipeline.process(document, "What is the secret code?")
+    
+    assert "FJORD2024" in optimized_context
+    assert metrics["optimized_tokens"] < metrics["original_tokens"] / 4
@@ -0,0 +1,74 @@
+"""
+Tests for streaming chunking over file objects and memory-mapped inputs.
+"""
+
+import io
+import mmap
+import random
+import pytest
+from backend.algorithms.chunker import SemanticChunker
+from backend.pipeline import SignalCorePipeline
+
+SENTENCES = [
+    "The river runs past the old mill in the valley.",
+    "Prices at the café rose by 5% — again!",
+    "Is the bridge painted green every spring?",
+    "Dr. Smith opened the school next to the church.",
+    "The bakery opens early and is busy all morning.",
+    "Walkers follow the path up to the ridge… slowly.",
+]
+
+
+def make_document(sentences: int, seed: int = 0) -> str:
+    """Random sentences with varied spacing, including non-ASCII text."""
+    rng = random.Random(seed)
+    return "".join(rng.choice(SENTENCES) + rng.choice([" ", "  ", "\n", "\n\n"]) for _ in range(sentences))
+
+
+@pytest.fixture
+def small_reads(monkeypatch):
+    """Read sources a few characters at a time, splitting sentences and characters."""
+    monkeypatch.setattr('backend.algorithms.chunker.READ_BUFFER_SIZE', 7)
+
+
+@pytest.mark.parametrize('kind', ['text', 'binary', 'path', 'mmap'])
+def test_streamed_chunks_match_chunk(kind, small_reads, tmp_path):
+    document = make_document(300)
+    path = tmp_path / 'document.txt'
+    path.write_bytes(document.encode('utf-8'))
+    chunker = SemanticChunker(min_chunk_size=40, max_chunk_size=120)
+    expected = chunker.chunk(document)
+    assert len(expected) > 5
+    
+    if kind == 'text':
+        chunks = list(chunker.iter_chunks(io.StringIO(document)))
+    elif kind == 'binary':
+        chunks = list(chunker.iter_chunks(io.BytesIO(document.encode('utf-8'))))
+    elif kind == 'path':
+        chunks = list(chunker.iter_chunks(str(path)))
+    else:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            chunks = list(chunker.iter_chunks(mapped))
+    
+    assert chunks == expected
+
+
+def test_empty_source_has_no_chunks():
+    assert list(SemanticChunker().iter_chunks(io.StringIO(""))) == []
+
+
+@pytest.mark.parametrize('options', [{}, {'scorer': 'vectorized'}, {'extraction_ratio': 0.1}])
+def test_process_stream_matches_process(options, small_reads):
+    document = make_document(500, seed=1)
+    pipeline = SignalCorePipeline(min_chunk_size=40, max_chunk_size=120, **options)
+    
+    streamed = "\n\n".join(pipeline.process_stream(io.StringIO(document)))
+    assert streamed == pipeline.process(document)[0]
+
+
+@pytest.mark.parametrize('options', [{'token_budget': 100}, {'global_weight': 0.5}])
+def test_process_stream_rejects_document_wide_settings(options):
+    pipeline = SignalCorePipeline(**options)
+    
+    with pytest.raises(ValueError):
+        list(pipeline.process_stream(io.StringIO(make_document(10))))
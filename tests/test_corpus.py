@@ -0,0 +1,129 @@
+"""
+Tests for the persistent corpus retrieval index.
+"""
+
+import math
+import random
+from collections import Counter
+import pytest
+from backend.algorithms.bm25 import normalize
+from backend.algorithms.vocabulary import tokenize
+from backend.corpus import CorpusIndex
+from backend.pipeline import SignalCorePipeline
+
+WORDS = ("river mill valley market bridge school church bakery path ridge library harbour orchard castle "
+         "ferry tower garden meadow forest lake").split()
+
+
+def make_documents(count: int, seed: int = 0):
+    """Short random documents over a small vocabulary, each one chunk."""
+    rng = random.Random(seed)
+    return [" ".join(" ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 12))).capitalize() + "."
+                     for _ in range(rng.randint(2, 6))) + f" Document {number}."
+            for number in range(count)]
+
+
+def reference_search(corpus: CorpusIndex, query: str, top_k: int):
+    """BM25 over every chunk's text, without the inverted index."""
+    chunks = [[normalize(word) for word in tokenize(text)] for text in corpus.fetch(list(range(len(corpus))))]
+    frequencies = [Counter([word for word in words if word]) for words in chunks]
+    average_length = sum(len(words) for words in chunks) / len(chunks)
+    
+    # Terms in most chunks are skipped, unless the query has nothing rarer
+    query_terms = {term: sum(1 for counts in frequencies if term in counts)
+                   for term in dict.fromkeys(normalize(word) for word in tokenize(query)) if term}
+    query_terms = {term: df for term, df in query_terms.items() if df}
+    max_df = max(CorpusIndex.MAX_DF_FRACTION * len(chunks), CorpusIndex.BLOCK_SIZE)
+    scored_terms = {term: df for term, df in query_terms.items() if df <= max_df}
+    if not scored_terms and query_terms:
+        rarest = min(query_terms, key=query_terms.get)
+        scored_terms = {rarest: query_terms[rarest]}
+    
+    scores = {}
+    for term, df in scored_terms.items():
+        idf = math.log(1.0 + (len(chunks) - df + 0.5) / (df + 0.5))
+        for chunk_id, counts in enumerate(frequencies):
+            tf = counts.get(term, 0)
+            if tf:
+                length_norm = 1.0 - CorpusIndex.B + CorpusIndex.B * len(chunks[chunk_id]) / average_length
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (CorpusIndex.K1 + 1) / (
+                    tf + CorpusIndex.K1 * length_norm)
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:top_k]
+
+
+@pytest.fixture
+def corpus(tmp_path, monkeypatch):
+    """Corpus with small posting blocks, so terms span several blocks."""
+    monkeypatch.setattr(CorpusIndex, 'BLOCK_SIZE', 8)
+    return CorpusIndex(str(tmp_path / 'corpus.db'))
+
+
+def test_ingest_skips_known_documents(corpus):
+    documents = make_documents(10)
+    
+    ids = corpus.add_documents(documents)
+    assert len(set(ids)) == 10
+    assert (corpus.documents, len(corpus)) == (10, 10)
+    
+    # Known documents keep their IDs and add no chunks
+    more = corpus.add_documents(documents[:3] + make_documents(2, seed=1))
+    assert more[:3] == ids[:3]
+    assert (corpus.documents, len(corpus)) == (12, 12)
+    assert corpus.add_document(documents[0]) == ids[0]
+
+
+@pytest.mark.parametrize('query', ["castle", "ferry tower", "lake meadow garden forest", "Document 7?"])
+def test_search_matches_brute_force_bm25(corpus, query):
+    # Several ingest calls, so postings are appended to existing blocks
+    for seed in range(4):
+        corpus.add_documents(make_documents(15, seed))
+    
+    results = corpus.search(query, top_k=5)
+    expected = reference_search(corpus, query, top_k=5)
+    
+    assert [chunk_id for chunk_id, _ in results] == [chunk_id for chunk_id, _ in expected]
+    assert [score for _, score in results] == pytest.approx([score for _, score in expected])
+
+
+def test_postings_round_trip_across_blocks(corpus):
+    for seed in range(3):
+        corpus.add_documents(make_documents(20, seed))
+    texts = corpus.fetch(list(range(len(corpus))))
+    connection = corpus._connect()
+    
+    for term in ["river", "harbour", "document"]:
+        ids, frequencies = corpus._read_postings(connection, term)
+        counts = [Counter(normalize(word) for word in tokenize(text))[term] for text in texts]
+        assert ids.tolist() == [chunk_id for chunk_id, count in enumerate(counts) if count]
+        assert frequencies.tolist() == [count for count in counts if count]
+
+
+def test_search_edge_cases(corpus):
+    assert corpus.search("river") == []
+    
+    corpus.add_documents(make_documents(5))
+    assert corpus.search("submarine") == []
+    assert corpus.search("river", top_k=0) == []
+    assert corpus.fetch([3, 0]) == [make_documents(5)[3], make_documents(5)[0]]
+
+
+def test_index_persists(tmp_path):
+    path = str(tmp_path / 'corpus.db')
+    CorpusIndex(path).add_documents(make_documents(10))
+    
+    reopened = CorpusIndex(path)
+    assert reopened.documents == 10
+    assert reopened.search("Document 4", top_k=1)[0][0] == 4
+
+
+def test_process_corpus_prunes_retrieved_chunks(corpus):
+    needle = "The secret code is FJORD2024."
+    documents = make_documents(30)
+    documents[17] = documents[17] + " " + needle
+    corpus.add_documents(documents)
+    
+    optimized_context, metrics = SignalCorePipeline().process_corpus(corpus, "What is the secret code?", top_k=3)
+    
+    assert needle in optimized_context
+    assert metrics["corpus_chunks"] == 30
+    assert metrics["retrieved_chunks"] == 1
@@ -0,0 +1,95 @@
+"""
+Tests for near-duplicate sentence elimination with MinHash/LSH.
+"""
+
+import pytest
+from backend.algorithms.dedup import NearDuplicateFilter
+from backend.algorithms.sentences import split_sentences
+from backend.algorithms.vocabulary import SentenceTerms
+from backend.pipeline import SignalCorePipeline
+
+LONG = ("The committee approved the new budget for the harbour district after a long debate "
+        "about road repairs, school funding and the future of the ferry service.")
+REWORDED = ("The committee approved the new budget for the harbour district after a long debate "
+            "about road repairs, school funding and the future of the bus service.")
+OTHERS = [
+    "Heavy rain flooded the lower fields twice this spring.",
+    "The museum will open a new wing for modern sculpture next year.",
+    "Local bakers sold out of bread before noon on market day.",
+]
+
+
+def sentence_terms(sentences):
+    """Term ids of sentences joined into one document."""
+    return SentenceTerms.from_index(split_sentences(" ".join(sentences)))
+
+
+def test_exact_duplicates_keep_first_occurrence():
+    sentences = [OTHERS[0], LONG, OTHERS[1], LONG, OTHERS[2], LONG]
+    
+    assert NearDuplicateFilter(0.8).keep(sentence_terms(sentences)) == [0, 1, 2, 4]
+
+
+def test_reworded_sentence_is_a_near_duplicate():
+    terms = sentence_terms([LONG, OTHERS[0], REWORDED])
+    
+    assert NearDuplicateFilter(0.7).keep(terms) == [0, 1]
+    # Stricter than the two sentences' similarity: both stay
+    assert NearDuplicateFilter(1.0).keep(terms) == [0, 1, 2]
+
+
+def test_distinct_sentences_are_all_kept():
+    terms = sentence_terms(OTHERS + [LONG])
+    
+    assert NearDuplicateFilter(0.5).keep(terms) == [0, 1, 2, 3]
+
+
+def test_signatures_estimate_jaccard_similarity():
+    terms = sentence_terms([LONG, REWORDED])
+    dedup = NearDuplicateFilter(0.8, num_perm=512)
+    
+    def shingles(i):
+        words = terms.ids[terms.offsets[i]:terms.offsets[i + 1]]
+        return {tuple(words[k:k + dedup.shingle_size]) for k in range(len(words) - dedup.shingle_size + 1)}
+    
+    first, second = shingles(0), shingles(1)
+    jaccard = len(first & second) / len(first | second)
+    signatures = dedup.signatures(terms)
+    estimate = (signatures[0] == signatures[1]).mean()
+    
+    assert estimate == pytest.approx(jaccard, abs=0.1)
+    # Same document, same signatures
+    assert (dedup.signatures(terms) == signatures).all()
+
+
+def test_short_and_empty_sentences():
+    terms = sentence_terms(["Yes.", "Yes.", "No.", "...", "..."])
+    
+    assert NearDuplicateFilter(0.8).keep(terms) == [0, 2, 3]
+    assert NearDuplicateFilter(0.8).keep(sentence_terms([])) == []
+
+
+@pytest.mark.parametrize('threshold', [0.3, 0.5, 0.8, 0.9])
+def test_band_layout_fits_threshold(threshold):
+    bands, rows = NearDuplicateFilter._band_layout(threshold, NearDuplicateFilter.NUM_PERM)
+    
+    assert bands * rows == NearDuplicateFilter.NUM_PERM
+    assert (1.0 / bands) ** (1.0 / rows) <= threshold
+
+
+def test_threshold_must_be_a_similarity():
+    with pytest.raises(ValueError):
+        NearDuplicateFilter(0.0)
+    with pytest.raises(ValueError):
+        NearDuplicateFilter(1.5)
+
+
+def test_pipeline_removes_duplicates_before_pruning():
+    document = " ".join(OTHERS + [LONG] * 5 + [REWORDED])
+    pipeline = SignalCorePipeline(dedup_threshold=0.7, extraction_ratio=1.0)
+    
+    optimized_context, metrics = pipeline.process(document)
+    
+    assert metrics["duplicates_removed"] == 5
+    assert optimized_context.count("committee") == 1
+    assert all(sentence in optimized_context for sentence in OTHERS)
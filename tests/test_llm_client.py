@@ -0,0 +1,115 @@
+"""
+Tests for LLMClient: multi-question calls, caching and failures.
+"""
+
+import threading
+import time
+import pytest
+from backend.cache import ResponseCache
+from backend.llm_client import LLMClient, _split_answers
+from backend.transport import LLMTransport
+from tests.fakes import ScriptedBackend, StatusError
+
+
+def make_client(backend: ScriptedBackend, cache: ResponseCache = None) -> LLMClient:
+    """Client over a fake backend, retrying without delay."""
+    return LLMClient(backend=backend, cache=cache, transport=LLMTransport(max_retries=2, backoff=0.0))
+
+
+def test_query_many_splits_one_reply():
+    backend = ScriptedBackend("Answer 1: Paris\nAnswer 2: 42\nAnswer 3: blue")
+    client = make_client(backend)
+    
+    assert client.query_many("context", ["Capital?", "Number?", "Colour?"]) == ["Paris", "42", "blue"]
+    assert backend.calls == 1
+    assert "1. Capital?\n2. Number?\n3. Colour?" in backend.prompts[0]
+
+
+def test_query_many_asks_missing_answers_on_their_own():
+    backend = ScriptedBackend("Answer 1: Paris\nAnswer 3:", "42", "blue")
+    client = make_client(backend)
+    
+    assert client.query_many("context", ["Capital?", "Number?", "Colour?"]) == ["Paris", "42", "blue"]
+    assert backend.calls == 3
+    assert backend.prompts[1].endswith("Question: Number?\n\nAnswer:")
+    assert backend.prompts[2].endswith("Question: Colour?\n\nAnswer:")
+
+
+def test_query_many_reuses_and_fills_the_cache():
+    cache = ResponseCache()
+    backend = ScriptedBackend("Paris", "Answer 1: 42\nAnswer 2: blue")
+    client = make_client(backend, cache)
+    
+    assert client.query("context", "Capital?") == "Paris"
+    assert client.query_many("context", ["Capital?", "Number?", "Colour?"]) == ["Paris", "42", "blue"]
+    assert "1. Number?\n2. Colour?" in backend.prompts[1]
+    
+    # Every answer is cached now, under its own question
+    assert client.query_many("context", ["Colour?", "Number?"]) == ["blue", "42"]
+    assert client.query_cached("context", "Number?") == ("42", True)
+    assert backend.calls == 2
+
+
+def test_query_many_retries_transient_errors():
+    backend = ScriptedBackend(StatusError(503), "Answer 1: Paris\nAnswer 2: 42")
+    client = make_client(backend)
+    
+    assert client.query_many("context", ["Capital?", "Number?"]) == ["Paris", "42"]
+    assert backend.calls == 2
+
+
+def test_query_many_reports_failures_without_caching_them():
+    cache = ResponseCache()
+    backend = ScriptedBackend(StatusError(400), StatusError(400), "42")
+    client = make_client(backend, cache)
+    
+    assert client.query_many("context", ["Capital?", "Number?"]) == ["API Error", "42"]
+    assert backend.calls == 3
+    assert client.query_cached("context", "Number?") == ("42", True)
+    assert cache.get(ResponseCache.key(backend.model_name, "context", "Capital?")) is None
+
+
+@pytest.mark.parametrize('reply, expected', [
+    ("Answer 1: a\nAnswer 2: b", ["a", "b"]),
+    ("**Answer 1:** a\n\n## Answer 2. b\nstill b", ["a", "b\nstill b"]),
+    ("answer 2) b\nANSWER 1: a", ["a", "b"]),
+    ("Answer 1: a\nAnswer 1: again\nAnswer 7: out of range", ["a", None]),
+    ("Answer 1:\nAnswer 2: b", [None, "b"]),
+    ("No numbered answers at all", [None, None]),
+])
+def test_split_answers(reply, expected):
+    assert _split_answers(reply, 2) == expected
+
+
+def test_failed_call_fails_every_waiting_request():
+    class SlowBackend(ScriptedBackend):
+        def generate(self, prompt: str) -> str:
+            time.sleep(0.5)
+            return super().generate(prompt)
+    
+    backend = SlowBackend(StatusError(400))
+    client = make_client(backend)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(client.query_cached("context", "Capital?")))
+               for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert results == [("API Error", False)] * 3
+    assert backend.calls == 1
+
+
+def test_stream_failure_is_raised_after_its_text():
+    backend = ScriptedBackend(["The answer ", StatusError(500)])
+    client = make_client(backend, ResponseCache())
+    texts, cached = client.query_stream_cached("context", "Capital?")
+    
+    pieces = []
+    with pytest.raises(StatusError):
+        for text in texts:
+            pieces.append(text)
+    assert pieces == ["The answer "]
+    assert not cached
+    assert client.cache.get(ResponseCache.key(backend.model_name, "context", "Capital?")) is None
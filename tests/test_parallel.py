@@ -0,0 +1,68 @@
+"""
+Tests that thread and process pruning return exactly what serial pruning does.
+"""
+
+import random
+import pytest
+from backend.parallel import PruningExecutor
+from backend.pipeline import SignalCorePipeline
+
+SENTENCES = [
+    "The river runs past the old mill in the valley.",
+    "What the farmers grow is sold at the market on Sundays.",
+    "The bridge is painted green every spring.",
+    "A small school stands next to the church.",
+    "The bakery opens early and is busy all morning.",
+    "Walkers follow the path up to the ridge.",
+    "The library is open until late on Thursdays.",
+    "The secret code is FJORD2024.",
+]
+
+QUERY = "What is the secret code?"
+
+
+def make_document(sentences: int, seed: int = 0) -> str:
+    """Haystack sentences in random order, each with a random word added."""
+    rng = random.Random(seed)
+    words = " ".join(SENTENCES).split()
+    return " ".join(rng.choice(SENTENCES)[:-1] + " " + rng.choice(words).strip('.') + "."
+                    for _ in range(sentences))
+
+
+OPTIONS = [
+    {},
+    {'scorer': 'vectorized'},
+    {'global_weight': 0.5},
+    {'scorer': 'vectorized', 'global_weight': 0.5},
+    {'token_budget': 400},
+]
+
+
+@pytest.mark.parametrize('execution', ['thread', 'process'])
+@pytest.mark.parametrize('options', OPTIONS)
+def test_parallel_matches_serial(execution, options):
+    document = make_document(600)
+    serial = SignalCorePipeline(min_chunk_size=40, max_chunk_size=120, **options)
+    
+    with SignalCorePipeline(execution=execution, workers=2, min_chunk_size=40, max_chunk_size=120,
+                            **options) as parallel:
+        for query in [None, QUERY]:
+            assert parallel.process(document, query) == serial.process(document, query)
+        
+        # The chunks really were fanned out
+        assert parallel.executor._pool is not None
+
+
+def test_batches_cover_spans_in_order():
+    spans = [(i, i + 1) for i in range(11)]
+    executor = PruningExecutor(SignalCorePipeline().pruner, mode='thread', workers=2)
+    
+    batches = executor._batches(spans)
+    assert len(batches) == 2 * PruningExecutor.BATCHES_PER_WORKER
+    assert [span for batch in batches for span in batch] == spans
+    assert executor._batches([]) == [[]]
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        SignalCorePipeline(execution='gpu')
@@ -0,0 +1,147 @@
+"""
+Tests for LLMTransport: retries with backoff, and quota waits.
+"""
+
+import asyncio
+import pytest
+from backend import transport as transport_module
+from backend.transport import LLMTransport, TokenBucket
+from tests.fakes import FakeClock, ScriptedBackend, StatusError
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    """Run the transport on a fake clock, so waits are recorded, not slept."""
+    fake = FakeClock()
+    monkeypatch.setattr(transport_module, 'time', fake)
+    return fake
+
+
+def test_transient_errors_are_retried(clock):
+    backend = ScriptedBackend(ConnectionError("reset"), StatusError(503), TimeoutError(), StatusError(429), "ok")
+    transport = LLMTransport(max_retries=4, backoff=0.5)
+    
+    assert transport.call(lambda: backend.generate("prompt")) == "ok"
+    assert backend.calls == 5
+    assert transport.retries == 4
+    assert len(clock.sleeps) == 4
+
+
+def test_retries_stop_after_max_retries(clock):
+    backend = ScriptedBackend(*[StatusError(500)] * 3)
+    transport = LLMTransport(max_retries=2)
+    
+    with pytest.raises(StatusError):
+        transport.call(lambda: backend.generate("prompt"))
+    assert backend.calls == 3
+    assert transport.retries == 2
+
+
+@pytest.mark.parametrize('error', [ValueError("invalid request"), StatusError(400), StatusError(403)])
+def test_non_transient_errors_are_raised_at_once(clock, error):
+    backend = ScriptedBackend(error)
+    transport = LLMTransport(max_retries=3)
+    
+    with pytest.raises(type(error)) as raised:
+        transport.call(lambda: backend.generate("prompt"))
+    assert raised.value is error
+    assert backend.calls == 1
+    assert transport.retries == 0
+    assert clock.sleeps == []
+
+
+def test_backoff_doubles_up_to_max_backoff(clock, monkeypatch):
+    # Jitter at its upper bound shows the backoff ceiling of each retry
+    monkeypatch.setattr(transport_module.random, 'uniform', lambda low, high: high)
+    backend = ScriptedBackend(*[StatusError(503)] * 5, "ok")
+    transport = LLMTransport(max_retries=5, backoff=0.5, max_backoff=3.0)
+    
+    assert transport.call(lambda: backend.generate("prompt")) == "ok"
+    assert clock.sleeps == [0.5, 1.0, 2.0, 3.0, 3.0]
+
+
+def test_backoff_is_jittered_below_the_ceiling(clock):
+    backend = ScriptedBackend(*[StatusError(503)] * 3, "ok")
+    transport = LLMTransport(max_retries=3, backoff=0.5)
+    
+    transport.call(lambda: backend.generate("prompt"))
+    assert all(0.0 <= delay <= 0.5 * 2 ** attempt for attempt, delay in enumerate(clock.sleeps))
+
+
+def test_async_call_retries_transient_errors():
+    backend = ScriptedBackend(StatusError(502), ConnectionError("reset"), "ok")
+    transport = LLMTransport(max_retries=3, backoff=0.0)
+    
+    assert asyncio.run(transport.call_async(lambda: backend.generate_async("prompt"))) == "ok"
+    assert backend.calls == 3
+
+
+def test_async_call_raises_non_transient_errors():
+    backend = ScriptedBackend(StatusError(401))
+    transport = LLMTransport(max_retries=3, backoff=0.0)
+    
+    with pytest.raises(StatusError):
+        asyncio.run(transport.call_async(lambda: backend.generate_async("prompt")))
+    assert backend.calls == 1
+
+
+def test_stream_is_retried_only_before_its_first_item(clock):
+    backend = ScriptedBackend(StatusError(503), ["Hello ", "world"], ["partial ", StatusError(503)])
+    transport = LLMTransport(max_retries=3)
+    
+    assert list(transport.stream(lambda: backend.stream("prompt"))) == ["Hello ", "world"]
+    assert backend.calls == 2
+    
+    # Items already yielded cannot be taken back, so a later failure is raised
+    pieces = []
+    with pytest.raises(StatusError):
+        for piece in transport.stream(lambda: backend.stream("prompt")):
+            pieces.append(piece)
+    assert pieces == ["partial "]
+    assert backend.calls == 3
+
+
+def test_token_bucket_waits_for_refill(clock):
+    bucket = TokenBucket(rate=2.0, capacity=2.0)
+    
+    # The full bucket covers a burst of two; each further token is half a
+    # second of refill behind the last
+    assert [bucket.reserve() for _ in range(4)] == [0.0, 0.0, 0.5, 1.0]
+    
+    clock.sleep(1.0)
+    assert bucket.reserve() == 0.5
+
+
+def test_token_bucket_refill_is_capped_at_capacity(clock):
+    bucket = TokenBucket(rate=1.0, capacity=2.0)
+    bucket.reserve(2.0)
+    
+    clock.sleep(60.0)
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 1.0]
+
+
+def test_requests_per_minute_spaces_calls(clock):
+    backend = ScriptedBackend(*["ok"] * 6)
+    transport = LLMTransport(requests_per_minute=60)
+    started = []
+    
+    def call() -> str:
+        started.append(clock.now)
+        return backend.generate("prompt")
+    
+    for _ in range(6):
+        transport.call(call)
+    
+    # A burst of three (three seconds of quota), then one call per second
+    assert [at - started[0] for at in started] == [0.0, 0.0, 0.0, 1.0, 2.0, 3.0]
+
+
+def test_tokens_per_minute_waits_for_large_prompts(clock):
+    backend = ScriptedBackend("ok", "ok")
+    transport = LLMTransport(tokens_per_minute=600)
+    
+    # The bucket holds 30 tokens and refills 10 per second
+    transport.call(lambda: backend.generate("prompt"), cost=30)
+    assert clock.sleeps == []
+    transport.call(lambda: backend.generate("prompt"), cost=20)
+    assert clock.sleeps == [2.0]
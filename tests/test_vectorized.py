@@ -0,0 +1,85 @@
+"""
+Tests that the NumPy scoring backend matches the Counter backend.
+"""
+
+import random
+import pytest
+from backend.algorithms.bm25 import BM25Index
+from backend.algorithms.chunker import SemanticChunker
+from backend.algorithms.pruner import SentencePruner
+from backend.algorithms.sentences import split_sentences
+from backend.algorithms.vectorized import VectorizedScorer
+from backend.algorithms.vocabulary import SentenceTerms, TermStatistics
+
+WORDS = ("river mill valley market bridge school church bakery path ridge library secret code card "
+         "farmer green spring morning late early busy small old open").split()
+
+
+def make_document(sentences: int, seed: int = 0) -> str:
+    """Random sentences of 3 to 20 words over a small vocabulary."""
+    rng = random.Random(seed)
+    return " ".join(" ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 20))).capitalize() + "."
+                    for _ in range(sentences))
+
+
+def document_terms(sentences: int, seed: int = 0):
+    """Term ids and chunk spans of a random document."""
+    index = split_sentences(make_document(sentences, seed))
+    spans = SemanticChunker(min_chunk_size=50, max_chunk_size=200).chunk_spans(index)
+    return SentenceTerms.from_index(index), spans
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+@pytest.mark.parametrize('global_weight', [0.0, 0.4])
+def test_vectorized_scores_match_counter(seed, global_weight):
+    terms, spans = document_terms(400, seed)
+    statistics = TermStatistics.from_spans(terms, spans)
+    relevance = BM25Index(terms).relevance("secret code card")
+    assert relevance
+    
+    for query in [None, relevance]:
+        expected = SentencePruner(global_weight=global_weight).score_terms(terms, spans, relevance=query,
+                                                                           statistics=statistics)
+        pruner = SentencePruner(scorer='vectorized', global_weight=global_weight)
+        assert pruner.score_terms(terms, spans, relevance=query, statistics=statistics) == expected
+        assert (pruner.select_terms(terms, spans, relevance=query, statistics=statistics) ==
+                SentencePruner(global_weight=global_weight).select_terms(terms, spans, relevance=query,
+                                                                         statistics=statistics))
+
+
+def test_sparse_centroids_match_dense(monkeypatch):
+    terms, spans = document_terms(300)
+    dense = SentencePruner(scorer='vectorized').score_terms(terms, spans)
+    
+    # Never use the dense chunk-by-term table
+    monkeypatch.setattr(VectorizedScorer, 'DENSE_CELLS_PER_WORD', 0)
+    assert SentencePruner(scorer='vectorized').score_terms(terms, spans) == dense
+
+
+def test_similarity_matches_counter(monkeypatch):
+    monkeypatch.setattr(SentencePruner, 'SIMILARITY_WEIGHT', 0.5)
+    terms, spans = document_terms(300)
+    
+    expected = SentencePruner().score_terms(terms, spans)
+    for cells in [VectorizedScorer.DENSE_CELLS_PER_WORD, 0]:
+        monkeypatch.setattr(VectorizedScorer, 'DENSE_CELLS_PER_WORD', cells)
+        assert SentencePruner(scorer='vectorized').score_terms(terms, spans) == pytest.approx(expected)
+
+
+def test_relevance_outside_scored_spans_is_ignored():
+    terms, spans = document_terms(100)
+    subset = spans[1:2]
+    lo, hi = subset[0]
+    relevance = {0: 1.0, lo: 0.5, hi - 1: 0.25, hi: 1.0}
+    
+    expected = SentencePruner().score_terms(terms, subset, relevance=relevance)
+    assert SentencePruner(scorer='vectorized').score_terms(terms, subset, relevance=relevance) == expected
+
+
+def test_empty_and_wordless_spans():
+    terms = SentenceTerms.from_index(split_sentences("... !!! Word. ?"))
+    pruner = SentencePruner(scorer='vectorized')
+    
+    assert pruner.score_terms(terms, []) == []
+    spans = [(0, len(terms.offsets) - 1)]
+    assert pruner.score_terms(terms, spans) == SentencePruner().score_terms(terms, spans)